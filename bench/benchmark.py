@@ -0,0 +1,91 @@
+# Benchmark of hanacleaner against the fake HANA of bench/fakehana.py, e.g.
+#   python3 benchmark.py --scale 0.01 --json result.json
+#   python3 benchmark.py --scale 0.01 --baseline result.json   (exits with 1 if a task got slower than --tolerance)
+# Each scenario gets a new fake system with its data set, and runs one house keeping task in its own
+# hanacleaner, with -it and -ij, so that the peak memory of the timing json belongs to that task only.
+import sys, os, json, glob, shutil, argparse, subprocess, time
+import datasets
+
+bench = os.path.dirname(os.path.abspath(__file__))
+hanacleaner = os.path.join(os.path.dirname(bench), "hanacleaner.py")
+
+scenarios = [   # [name, flags of hanacleaner, data set with the given scale]
+    ["backup catalog", "-be 5 -bd 30", lambda directory, scale: datasets.backup_catalog(directory, int(1000000 * scale))],
+    ["backup catalog -br", "-be 5 -bd 30 -br true", lambda directory, scale: datasets.backup_catalog(directory, int(1000000 * scale))],
+    ["trace files", "-tf 30", lambda directory, scale: datasets.trace_files(directory, int(200000 * scale))],
+    ["events", "-eh 30 -eu 30", lambda directory, scale: datasets.events(directory, int(50000 * scale))],
+    ["alerts", "-ar 30", lambda directory, scale: datasets.alerts(directory, int(1000000 * scale))],
+    ["hdbcons", "-hr 30", lambda directory, scale: datasets.hdbcons(directory, int(10000000000 * scale))],
+    ["lob reorg", "-lobf 50 -lobl BENCH", lambda directory, scale: datasets.lob_columns(directory, int(10000 * scale))]]
+
+def run(name, flags, dataset, scale, work):   # {task: {seconds, subprocesses, rows, bytes, peak_memory_mb, peak_subprocess_memory_mb}, "wall_seconds": ...}
+    directory = os.path.join(work, name.replace(" ", "_").replace("-", ""))
+    shutil.rmtree(directory, ignore_errors = True)
+    datasets.create_system(directory)
+    dataset(directory, scale)
+    output = os.path.join(directory, "output")
+    environment = dict(os.environ, FAKEHANA = directory, HOME = os.path.join(directory, "home"), SAPSYSTEMNAME = datasets.sid)
+    command = [sys.executable, hanacleaner, "-k", datasets.key, "-hx", os.path.join(bench, "bin"), "-oi", "0", "-it", "20", "-ij", "true", "-op", output, "-so", "false"] + flags.split()
+    start = time.time()
+    process = subprocess.run(command, env = environment, stdout = subprocess.PIPE, stderr = subprocess.STDOUT, text = True)
+    wallSeconds = time.time() - start
+    timings = glob.glob(os.path.join(output, "hanacleaner_timing_*.json"))
+    if process.returncode != 0 or not timings:
+        print("ERROR: hanacleaner "+" ".join(command[2:])+" failed for the scenario "+name+", see the log in "+output)
+        sys.exit(1)
+    with open(timings[0]) as f:
+        tasks = json.load(f)["tasks"]
+    result = {"wall_seconds": round(wallSeconds, 3)}
+    for task in tasks:
+        if task["task"] != "clean_output":   # -or runs in each scenario
+            result[task["task"]] = {"seconds": round(task["seconds"], 3), "subprocesses": task["subprocesses"], "rows": task["rows"], "bytes": task["bytes"],
+                                    "peak_memory_mb": task["peak_memory_so_far_mb"], "peak_subprocess_memory_mb": task["peak_subprocess_memory_so_far_mb"]}
+    return result
+
+def regressions(results, baseline, tolerance):   # tasks that are more than tolerance slower, or use more subprocesses, than in the baseline
+    found = []
+    for name, result in results.items():
+        for task, measure in result.items():
+            before = baseline.get(name, {}).get(task)
+            if task == "wall_seconds" or not before:
+                continue
+            if measure["seconds"] > before["seconds"] * (1 + tolerance) and measure["seconds"] - before["seconds"] > 0.1:
+                found.append(name+", "+task+": "+str(before["seconds"])+" --> "+str(measure["seconds"])+" seconds")
+            if measure["subprocesses"] > before["subprocesses"]:
+                found.append(name+", "+task+": "+str(before["subprocesses"])+" --> "+str(measure["subprocesses"])+" subprocesses")
+    return found
+
+def main():
+    parser = argparse.ArgumentParser(description = "benchmark of hanacleaner against a fake HANA")
+    parser.add_argument("--scale", type = float, default = 0.01, help = "share of the full data sets, 1 is e.g. one million backup catalog entries (default 0.01)")
+    parser.add_argument("--work", default = os.path.join(bench, "work"), help = "directory of the fake systems (default bench/work)")
+    parser.add_argument("--only", action = "append", default = [], help = "run only this scenario, can be repeated")
+    parser.add_argument("--json", default = "", help = "write the results to this file, e.g. as the next baseline")
+    parser.add_argument("--baseline", default = "", help = "results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type = float, default = 0.2, help = "allowed slow down compared to the baseline (default 0.2)")
+    arguments = parser.parse_args()
+    results = {}
+    print("Scenario                 Task                      Seconds   Subprocesses  Peak [MB]  Peak Subprocess [MB]")
+    for [name, flags, dataset] in scenarios:
+        if arguments.only and not name in arguments.only:
+            continue
+        results[name] = run(name, flags, dataset, arguments.scale, arguments.work)
+        for task, measure in results[name].items():
+            if task != "wall_seconds":
+                print("{:<25}{:<26}{:<10}{:<14}{:<11}{}".format(name, task, measure["seconds"], measure["subprocesses"], measure["peak_memory_mb"], measure["peak_subprocess_memory_mb"]))
+    if arguments.json:
+        with open(arguments.json, "w") as f:
+            json.dump({"scale": arguments.scale, "results": results}, f, indent = 1)
+    if arguments.baseline:
+        with open(arguments.baseline) as f:
+            baseline = json.load(f)
+        if baseline["scale"] != arguments.scale:
+            print("ERROR: the baseline was run with --scale "+str(baseline["scale"]))
+            sys.exit(1)
+        found = regressions(results, baseline["results"], arguments.tolerance)
+        for regression in found:
+            print("REGRESSION: "+regression)
+        sys.exit(1 if found else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+# Fake HANA systems for bench/fakehana.py, with the data sets of the benchmark, e.g.
+#   python3 datasets.py /tmp/fake 0.01   (a system with 1% of the full data sets)
+# The full data sets are one million backup catalog entries, 200,000 trace files, 50,000 events,
+# one million alerts and 10 GB of hdbcons files.
+import sys, os, json, socket, sqlite3
+from datetime import datetime, timedelta
+import fakehana
+
+sid = "BEN"
+instance = "00"
+key = "BENCHKEY"
+
+def host():   # as hanacleaner finds it, the first part of hostname
+    return socket.gethostname().split('.')[0]
+
+def paths(directory):   # the directories of the cd aliases of <sid>adm
+    hdb = os.path.join(directory, "usr", "sap", sid, "HDB"+instance)
+    return {"cdhdb": hdb,
+            "cdtrace": os.path.join(hdb, host(), "trace"),
+            "cdglo": os.path.join(directory, "usr", "sap", sid, "SYS", "global"),
+            "cdpy": os.path.join(hdb, "exe", "python_support")}
+
+def create_system(directory):   # $FAKEHANA, the home of <sid>adm is directory/home
+    aliases = paths(directory)
+    for path in list(aliases.values()) + [os.path.join(directory, "home"), os.path.join(aliases["cdglo"], "sapcontrol", "snapshots")]:
+        os.makedirs(path, exist_ok = True)
+    with open(os.path.join(directory, "home", ".bash_profile"), "w") as f:
+        f.write("".join("alias "+alias+"='cd "+path+"'\n" for alias, path in sorted(aliases.items())))
+    config = {"sid": sid, "instance": instance, "host": host(), "traceDirectory": aliases["cdtrace"], "replicationMode": "none",
+              "userstore": {key: {"env": host()+":3"+instance+"13", "user": "HANACLEANER", "database": "SYSTEMDB"}},
+              "processes": [["hdbdaemon", "HDB Daemon", "GREEN"], ["hdbnameserver", "HDB Nameserver", "GREEN"], ["hdbindexserver", "HDB Indexserver-"+sid, "GREEN"], ["hdbcompileserver", "HDB Compileserver", "GREEN"]]}
+    with open(os.path.join(directory, "fakehana.json"), "w") as f:
+        json.dump(config, f, indent = 1)
+    with connect(directory) as connection:
+        fakehana.create_views(connection)
+        connection.execute("INSERT INTO M_SYSTEM_OVERVIEW VALUES ('System', 'Version', '', '2.00.059.00.1636361839')")
+        connection.execute("INSERT INTO M_SYSTEM_OVERVIEW VALUES ('System Replication', 'Mode', '', 'NONE')")
+        connection.execute("INSERT INTO M_HOST_INFORMATION VALUES (?, 'sid', ?)", [host(), sid])
+        connection.execute("INSERT INTO M_DATABASE VALUES (?, 'SYSTEMDB', ?, '2026-01-01 00:00:00', '2.00.059.00.1636361839', 'CUSTOM')", [sid, host()])
+        connection.execute("INSERT INTO M_DATABASES VALUES ('SYSTEMDB', 'SystemDB-"+sid+"-"+instance+"', 'YES')")
+        connection.execute("INSERT INTO M_LANDSCAPE_HOST_CONFIGURATION VALUES (?, 'yes', 'ok', 'master 1', 'master', 'worker', 'master')", [host()])
+
+def connect(directory):
+    return sqlite3.connect(os.path.join(directory, "SYSTEMDB.db"))
+
+def spread(i, n, days):   # the i:th of n timestamps, evenly from days ago until now
+    return (datetime.now() - timedelta(days = days) + timedelta(seconds = days * 86400.0 * i / max(n, 1))).strftime("%Y-%m-%d %H:%M:%S")
+
+def backup_catalog(directory, n = 1000000, days = 365):   # mostly log backups, a complete data backup each day
+    dataBackupEvery = max(1, n // days)
+    with connect(directory) as connection:
+        connection.executemany("INSERT INTO M_BACKUP_CATALOG VALUES (?, ?, ?, ?, ?, 'successful', '')",
+            ((i, "complete data backup" if i % dataBackupEvery == 1 else "log backup", i, spread(i, n, days), spread(i, n, days)) for i in range(1, n + 1)))
+
+def trace_files(directory, n = 200000, days = 60):   # small files in cdtrace and their rows in M_TRACEFILES, with the same modification times
+    trace = paths(directory)["cdtrace"]
+    rows = []
+    for i in range(n):
+        fileName = "indexserver_"+host()+".30003."+str(i).zfill(6)+".trc"
+        mtime = spread(i, n, days)
+        with open(os.path.join(trace, fileName), "w") as f:
+            f.write("["+str(i)+"]{-1}[-1/-1] "+mtime+".000000 i Basis  TraceContext.cpp(00001) : benchmark trace entry\n")
+        seconds = datetime.strptime(mtime, "%Y-%m-%d %H:%M:%S").timestamp()
+        os.utime(os.path.join(trace, fileName), (seconds, seconds))
+        rows.append([host(), fileName, 100, mtime])
+    with connect(directory) as connection:
+        connection.executemany("INSERT INTO M_TRACEFILES VALUES (?, ?, ?, ?)", rows)
+
+def events(directory, n = 50000, days = 60):   # every tenth is INFO, every second is HANDLED
+    with connect(directory) as connection:
+        connection.executemany("INSERT INTO M_EVENTS VALUES (?, 30003, ?, ?, ?, 'FALSE', ?, 'benchmark event')",
+            ((host(), i, "INFO" if i % 10 == 0 else "ERROR", "HANDLED" if i % 2 == 0 else "NEW", spread(i, n, days)) for i in range(1, n + 1)))
+
+def alerts(directory, n = 1000000, days = 60):
+    with connect(directory) as connection:
+        connection.executemany("INSERT INTO STATISTICS_ALERTS_BASE VALUES (?, ?, ?, ?, 'benchmark alert')",
+            ((spread(i, n, days), i % 200, spread(i, n, days), 1 + i % 5) for i in range(n)))
+
+def hdbcons(directory, totalBytes = 10000000000, fileBytes = 1000000000, days = 60):   # files of at most fileBytes in cdtrace, one dated line after the other
+    trace = paths(directory)["cdtrace"]
+    nFiles = max(1, -(-totalBytes // fileBytes))
+    for i in range(nFiles):
+        size = min(fileBytes, totalBytes - i * fileBytes)
+        lineLength = len("2026-01-01 00:00:00.000 ... benchmark hdbcons output of one of the services, with a date at the start\n")
+        nLines = max(1, size // lineLength)
+        with open(os.path.join(trace, "indexserver_"+host()+".30003."+str(i).zfill(3)+"_hdbcons.trc"), "w") as f:
+            f.write("hdbcons output of the benchmark\n")
+            for j in range(nLines):
+                f.write(spread(j, nLines, days)+".000 ... benchmark hdbcons output of one of the services, with a date at the start\n")
+
+def lob_columns(directory, n = 10000):   # every fourth column is fragmented, every second table is a row table
+    with connect(directory) as connection:
+        connection.executemany("INSERT INTO M_TABLE_LOB_STATISTICS VALUES ('BENCH', ?, 'DATA', ?, ?, 1000000, 100)",
+            (("TABLE_"+str(i // 4), "PACKED" if i % 16 == 3 else "FILE", 3000000 if i % 4 == 0 else 1000000) for i in range(n)))
+        connection.executemany("INSERT INTO TABLES VALUES ('BENCH', ?, ?, ?)",
+            (("TABLE_"+str(i), "ROW" if i % 2 == 1 else "COLUMN", "FALSE" if i % 2 == 1 else "TRUE") for i in range(-(-n // 4))))
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print("usage: python3 datasets.py <directory> <scale>, scale 1 is the full data sets")
+        sys.exit(1)
+    [directory, scale] = [sys.argv[1], float(sys.argv[2])]
+    create_system(directory)
+    backup_catalog(directory, int(1000000 * scale))
+    trace_files(directory, int(200000 * scale))
+    events(directory, int(50000 * scale))
+    alerts(directory, int(1000000 * scale))
+    hdbcons(directory, int(10000000000 * scale))
+    lob_columns(directory, int(10000 * scale))
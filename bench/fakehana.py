@@ -0,0 +1,259 @@
+# A stand-in for SAP HANA, to test and benchmark hanacleaner without a HANA system.
+# hdbsql, hdbuserstore, sapcontrol and hdbnsutil in bench/bin call the functions below.
+# The monitoring views that hanacleaner reads, e.g. M_TRACEFILES, M_BACKUP_CATALOG, M_EVENTS,
+# M_CS_TABLES and M_TABLE_LOB_STATISTICS, are tables in one SQLite file per database. The file
+# system lives in the directory $FAKEHANA, created by datasets.create_system().
+# Statements that SQLite understands run there. The HANA statements that hanacleaner needs are
+# emulated, e.g. ALTER SYSTEM REMOVE TRACES and BACKUP CATALOG DELETE. All other DDL is only
+# recorded. Every statement that is not a select is written to FAKEHANA_STATEMENTS.
+import sys, os, re, json, sqlite3
+from datetime import datetime, timedelta
+
+views = {   # view --> columns, the ones hanacleaner reads, SYS. and _SYS_STATISTICS. are left out
+    "DUMMY": "DUMMY TEXT",
+    "M_SYSTEM_OVERVIEW": "SECTION TEXT, NAME TEXT, STATUS TEXT, VALUE TEXT",
+    "M_DATABASE": "SYSTEM_ID TEXT, DATABASE_NAME TEXT, HOST TEXT, START_TIME TEXT, VERSION TEXT, USAGE TEXT",
+    "M_DATABASES": "DATABASE_NAME TEXT, DESCRIPTION TEXT, ACTIVE_STATUS TEXT",
+    "M_HOST_INFORMATION": "HOST TEXT, KEY TEXT, VALUE TEXT",
+    "M_LANDSCAPE_HOST_CONFIGURATION": "HOST TEXT, HOST_ACTIVE TEXT, HOST_STATUS TEXT, NAMESERVER_CONFIG_ROLE TEXT, NAMESERVER_ACTUAL_ROLE TEXT, INDEXSERVER_CONFIG_ROLE TEXT, INDEXSERVER_ACTUAL_ROLE TEXT",
+    "M_BACKUP_CATALOG": "ENTRY_ID INTEGER PRIMARY KEY, ENTRY_TYPE_NAME TEXT, BACKUP_ID INTEGER, SYS_START_TIME TEXT, SYS_END_TIME TEXT, STATE_NAME TEXT, COMMENT TEXT",
+    "M_TRACEFILES": "HOST TEXT, FILE_NAME TEXT, FILE_SIZE INTEGER, FILE_MTIME TEXT",
+    "M_EVENTS": "HOST TEXT, PORT INTEGER, ID INTEGER, TYPE TEXT, STATE TEXT, ACKNOWLEDGED TEXT, CREATE_TIME TEXT, TEXT TEXT",
+    "STATISTICS_ALERTS_BASE": "SNAPSHOT_ID TEXT, ALERT_ID INTEGER, ALERT_TIMESTAMP TEXT, ALERT_RATING INTEGER, ALERT_DETAILS TEXT",
+    "HOST_OBJECT_LOCK_STATISTICS_BASE": "SERVER_TIMESTAMP TEXT, HOST TEXT, PORT INTEGER, OBJECT_NAME TEXT, LOCK_WAIT_COUNT INTEGER",
+    "STATISTICS_EMAIL_PROCESSING": "SNAPSHOT_ID TEXT, ID INTEGER, STATUS TEXT, RETRY_COUNT INTEGER",
+    "AUDIT_LOG": "TIMESTAMP TEXT, HOST TEXT, PORT INTEGER, EVENT_STATUS TEXT, EVENT_ACTION TEXT, STATEMENT_STRING TEXT",
+    "M_LOG_SEGMENTS": "HOST TEXT, PORT INTEGER, VOLUME_ID INTEGER, SEGMENT_ID INTEGER, STATE TEXT, TOTAL_SIZE INTEGER",
+    "M_TABLE_LOB_STATISTICS": "SCHEMA_NAME TEXT, TABLE_NAME TEXT, COLUMN_NAME TEXT, LOB_STORAGE_TYPE TEXT, DISK_SIZE INTEGER, BINARY_SIZE INTEGER, LOB_COUNT INTEGER",
+    "TABLES": "SCHEMA_NAME TEXT, TABLE_NAME TEXT, TABLE_TYPE TEXT, IS_COLUMN_TABLE TEXT",
+    "M_CS_TABLES": "HOST TEXT, PORT INTEGER, SCHEMA_NAME TEXT, TABLE_NAME TEXT, PART_ID INTEGER, RECORD_COUNT INTEGER, RAW_RECORD_COUNT_IN_MAIN INTEGER, MEMORY_SIZE_IN_TOTAL INTEGER, ESTIMATED_MAX_MEMORY_SIZE_IN_TOTAL INTEGER, LAST_COMPRESSED_RECORD_COUNT INTEGER",
+    "M_CS_COLUMNS": "SCHEMA_NAME TEXT, TABLE_NAME TEXT, PART_ID INTEGER, COLUMN_NAME TEXT, COUNT INTEGER, DISTINCT_COUNT INTEGER, INDEX_TYPE TEXT, COMPRESSION_TYPE TEXT, MEMORY_SIZE_IN_TOTAL INTEGER",
+    "M_CS_ALL_COLUMNS": "SCHEMA_NAME TEXT, TABLE_NAME TEXT, PART_ID INTEGER, COLUMN_NAME TEXT, INTERNAL_ATTRIBUTE_TYPE TEXT, COUNT INTEGER, DISTINCT_COUNT INTEGER, INDEX_TYPE TEXT, COMPRESSION_TYPE TEXT, MEMORY_SIZE_IN_TOTAL INTEGER",
+    "M_HOST_RESOURCE_UTILIZATION": "HOST TEXT, TOTAL_CPU_USER_TIME INTEGER, TOTAL_CPU_SYSTEM_TIME INTEGER, TOTAL_CPU_WIO_TIME INTEGER, TOTAL_CPU_IDLE_TIME INTEGER, ALLOCATION_LIMIT INTEGER",
+    "M_SERVICE_MEMORY": "HOST TEXT, PORT INTEGER, SERVICE_NAME TEXT, TOTAL_MEMORY_USED_SIZE INTEGER",
+    "M_SESSION_CONTEXT": "HOST TEXT, PORT INTEGER, CONNECTION_ID INTEGER, KEY TEXT, VALUE TEXT",
+    "M_JOB_PROGRESS": "HOST TEXT, PORT INTEGER, JOB_NAME TEXT, CURRENT_PROGRESS INTEGER, MAX_PROGRESS INTEGER",
+    "WORKLOAD_MAPPINGS": "WORKLOAD_MAPPING_NAME TEXT, WORKLOAD_CLASS_NAME TEXT",
+    "FAKEHANA_STATEMENTS": "TIME TEXT, STATEMENT TEXT, EMULATED INTEGER"}   # what hanacleaner sent, e.g. the DDL that is not emulated
+
+schemas = re.compile(r'(?i)(?<![\w.])"?(SYS|_SYS_STATISTICS|_SYS_REPO|PUBLIC)"?\.')   # all views are in one schema of the SQLite file
+
+class HanaError(Exception):   # printed like hdbsql prints an error of HANA, e.g. * 259: invalid table name
+    def __init__(self, code, message):
+        Exception.__init__(self, "* "+str(code)+": "+message+" SQLSTATE: HY000")
+        self.code = code
+
+def system_directory():
+    directory = os.environ.get("FAKEHANA", "")
+    if not directory or not os.path.isfile(os.path.join(directory, "fakehana.json")):
+        sys.stderr.write("* -10709: Connection failed (RTE:[89006] the fake HANA system $FAKEHANA="+directory+" does not exist, see bench/datasets.py)\n")
+        sys.exit(1)
+    return directory
+
+def configuration():
+    with open(os.path.join(system_directory(), "fakehana.json")) as f:
+        return json.load(f)
+
+def trace_directory(config, database):   # the files of M_TRACEFILES of this database, as cdtrace of hanacleaner finds them
+    if database and database != "SYSTEMDB":
+        return os.path.join(config["traceDirectory"], "DB_"+database)
+    return config["traceDirectory"]
+
+def timestamp(value):
+    return datetime.strptime(str(value)[0:19], "%Y-%m-%d %H:%M:%S")
+
+def connect(database):
+    fileName = os.path.join(system_directory(), (database or "SYSTEMDB")+".db")
+    if not os.path.isfile(fileName):
+        raise HanaError(-10709, "Connection failed (RTE:[89008] database "+database+" not found)")
+    connection = sqlite3.connect(fileName, timeout = 600)   # e.g. several hdbsql of -tl at the same time
+    connection.create_function("ADD_DAYS", 2, lambda value, days: (timestamp(value) + timedelta(days = days)).strftime("%Y-%m-%d %H:%M:%S") if value is not None else None)
+    connection.create_function("ADD_SECONDS", 2, lambda value, seconds: (timestamp(value) + timedelta(seconds = seconds)).strftime("%Y-%m-%d %H:%M:%S") if value is not None else None)
+    connection.create_function("SECONDS_BETWEEN", 2, lambda first, second: int((timestamp(second) - timestamp(first)).total_seconds()))
+    connection.create_function("DAYS_BETWEEN", 2, lambda first, second: (timestamp(second) - timestamp(first)).days)
+    connection.create_function("TO_DECIMAL", -1, lambda value, *precision: round(float(value), precision[1]) if value is not None and len(precision) == 2 else value)
+    connection.create_function("TO_VARCHAR", -1, lambda value, *form: str(value) if value is not None else None)
+    connection.create_function("TO_TIMESTAMP", -1, lambda value, *form: value)
+    return connection
+
+def create_views(connection):
+    for view, columns in views.items():
+        connection.execute("CREATE TABLE IF NOT EXISTS "+view+" ("+columns+")")
+    if not connection.execute("SELECT COUNT(*) FROM DUMMY").fetchone()[0]:
+        connection.execute("INSERT INTO DUMMY VALUES ('X')")
+
+def to_sqlite(sql):   # the HANA dialect of hanacleaner's selects, deletes and updates for SQLite
+    sql = schemas.sub("", sql.strip().rstrip(";"))
+    sql = re.sub(r"(?i)\bCURRENT_TIMESTAMP\b|\bNOW\(\)", "datetime('now', 'localtime')", sql)
+    sql = re.sub(r"(?i)\bCURRENT_DATE\b", "date('now', 'localtime')", sql)
+    top = re.match(r"(?is)^select\s+top\s+(\d+)\s+(.*)$", sql)
+    if top:
+        sql = "select "+top.group(2)+" LIMIT "+top.group(1)
+    return sql
+
+def literals(text):
+    return [literal.replace("''", "'") for literal in re.findall(r"'((?:[^']|'')*)'", text)]
+
+def record(connection, sql, emulated):
+    connection.execute("INSERT INTO FAKEHANA_STATEMENTS VALUES (?, ?, ?)", [datetime.now().strftime("%Y-%m-%d %H:%M:%S"), sql, 1 if emulated else 0])
+
+def remove_traces(connection, config, database, arguments):   # ALTER SYSTEM REMOVE TRACES ('<host>', '<file>', ...)
+    [host, files] = [arguments[0], arguments[1:]]
+    for fileName in files:
+        connection.execute("DELETE FROM M_TRACEFILES WHERE HOST = ? AND FILE_NAME = ?", [host, fileName])
+        path = os.path.join(trace_directory(config, database), fileName)
+        if host == config["host"] and os.path.isfile(path):
+            os.remove(path)
+
+def delete_backups_before(connection, backupId):   # BACKUP CATALOG DELETE ALL BEFORE BACKUP_ID <id>, everything that started before this data backup
+    boundary = connection.execute("SELECT SYS_START_TIME, ENTRY_TYPE_NAME FROM M_BACKUP_CATALOG WHERE BACKUP_ID = ? OR ENTRY_ID = ?", [backupId, backupId]).fetchone()
+    if not boundary or boundary[1] not in ["complete data backup", "data snapshot"]:
+        raise HanaError(448, "recovery could not be completed: backup id "+str(backupId)+" is not a data backup")
+    connection.execute("DELETE FROM M_BACKUP_CATALOG WHERE SYS_START_TIME < ?", [boundary[0]])
+
+def event_key(sql):   # ALTER SYSTEM ... EVENT '<host>:<port>' <id>
+    match = re.search(r"'([^':]+):(\d+)'\s+(\d+)", sql)
+    if not match:
+        raise HanaError(257, "sql syntax error: incorrect syntax near \"EVENT\"")
+    return [match.group(1), int(match.group(2)), int(match.group(3))]
+
+def emulate(connection, config, database, sql):   # True if this HANA statement is emulated, False if it is only recorded
+    words = " ".join(sql.split()).upper()
+    if words.startswith("ALTER SYSTEM REMOVE TRACES"):
+        remove_traces(connection, config, database, literals(sql))
+    elif re.match(r"^BACKUP CATALOG DELETE (FOR \S+ )?ALL BEFORE BACKUP_ID \d+", words):
+        delete_backups_before(connection, int(re.search(r"BACKUP_ID (\d+)", words).group(1)))
+    elif words.startswith("ALTER SYSTEM SET EVENT ACKNOWLEDGED"):
+        connection.execute("UPDATE M_EVENTS SET ACKNOWLEDGED = 'TRUE' WHERE HOST = ? AND PORT = ? AND ID = ?", event_key(sql))
+    elif words.startswith("ALTER SYSTEM SET EVENT HANDLED"):
+        connection.execute("UPDATE M_EVENTS SET STATE = 'HANDLED' WHERE HOST = ? AND PORT = ? AND ID = ?", event_key(sql))
+    elif words.startswith("ALTER SYSTEM DELETE HANDLED EVENT"):
+        connection.execute("DELETE FROM M_EVENTS WHERE HOST = ? AND PORT = ? AND ID = ? AND STATE = 'HANDLED'", event_key(sql))
+    elif re.match(r'^ALTER TABLE "[^"]+"\."[^"]+" LOB REORGANIZE', words):   # the columns are not fragmented anymore
+        [schema, table] = re.findall(r'"([^"]+)"', sql)[0:2]
+        for column in re.findall(r'"([^"]+)"', sql[sql.upper().index("REORGANIZE"):]):
+            connection.execute("UPDATE M_TABLE_LOB_STATISTICS SET DISK_SIZE = BINARY_SIZE WHERE SCHEMA_NAME = ? AND TABLE_NAME = ? AND COLUMN_NAME = ?", [schema, table, column])
+    elif words.startswith("ALTER SYSTEM RECLAIM LOG"):
+        connection.execute("DELETE FROM M_LOG_SEGMENTS WHERE STATE = 'Free'")
+    else:
+        return False
+    return True
+
+def execute(connection, config, database, sql):   # [column names, rows] of a query, [None, None] otherwise
+    words = " ".join(sql.split()).upper()
+    try:
+        if re.match(r"^(SELECT|WITH)\b", words):
+            cursor = connection.execute(to_sqlite(sql))
+            return [[column[0] for column in cursor.description], cursor]
+        if re.match(r"^(DELETE|INSERT|UPDATE)\b", words) and not " WITH PARAMETERS" in words:
+            connection.execute(to_sqlite(sql))
+            record(connection, sql, True)
+        else:
+            record(connection, sql, emulate(connection, config, database, sql))
+        connection.commit()
+        return [None, None]
+    except sqlite3.OperationalError as e:
+        if "no such table" in str(e):
+            raise HanaError(259, "invalid table name:  Could not find table/view "+str(e).split(":")[-1].strip()+" in schema SYS")
+        raise HanaError(257, "sql syntax error: "+str(e))
+
+def value(field):
+    return "?" if field is None else str(field)
+
+def hdbsql(argv):   # hdbsql [-j] [-A] [-a] [-x] [-Q] [-U <key>] [-d <database>] [-Z <option>] [-c <separator>] [-I <file>] ["<statement>"]
+    options = {"-c": ";", "-I": "", "-U": "", "-d": ""}
+    flags = set()
+    statements = []
+    i = 0
+    while i < len(argv):
+        if argv[i] in ["-U", "-d", "-Z", "-c", "-I", "-n", "-i", "-u", "-p", "-o", "-sslprovider"]:
+            options[argv[i]] = argv[i + 1] if i + 1 < len(argv) else ""
+            i += 2
+        elif argv[i].startswith("-") and len(argv[i]) > 1 and not " " in argv[i]:
+            flags.add(argv[i])
+            i += 1
+        else:
+            statements.append(argv[i])
+            i += 1
+    config = configuration()
+    key = config["userstore"].get(options["-U"]) if options["-U"] else {"database": "SYSTEMDB"}
+    if key is None:
+        sys.stderr.write("* -10104: Invalid value for KEY ("+options["-U"]+")\n")
+        sys.exit(1)
+    database = options["-d"] or key.get("database") or "SYSTEMDB"
+    if options["-I"]:
+        with open(options["-I"]) as f:
+            statements += [statement for statement in f.read().split(options["-c"]) if statement.strip()]
+    out = sys.stdout
+    try:
+        connection = connect(database)
+        for sql in statements:
+            [columns, rows] = execute(connection, config, database, sql)
+            if columns is None:
+                continue
+            if "-Q" in flags:   # each column on its own line
+                for row in rows:
+                    for field in row:
+                        out.write(value(field)+"\n")
+                continue
+            if not "-a" in flags:
+                out.write("| "+" | ".join(columns)+" |\n")
+                out.write("| "+" | ".join("-" * len(column) for column in columns)+" |\n")
+            for row in rows:   # streamed, e.g. one million entries of M_BACKUP_CATALOG
+                out.write("| "+" | ".join(value(field) for field in row)+" |\n")
+    except HanaError as e:
+        out.flush()
+        sys.stderr.write(str(e)+"\n")
+        sys.exit(1)
+
+def hdbuserstore(argv):   # hdbuserstore LIST [<key>], SET <key> <host:port>[@<database>] <user> <password>, DELETE <key>
+    config = configuration()
+    command = argv[0].upper() if argv else "LIST"
+    if command == "LIST":
+        for key in argv[1:] or sorted(config["userstore"]):
+            if not key in config["userstore"]:
+                print("KEY "+key+" NOT FOUND")
+                continue
+            entry = config["userstore"][key]
+            print("KEY "+key)
+            print("  ENV : "+entry["env"])
+            print("  USER: "+entry["user"])
+            if entry.get("database"):
+                print("  DATABASE: "+entry["database"])
+        print("Operation succeed.")
+    elif command == "SET" and len(argv) >= 4:
+        [env, database] = (argv[2].split("@") + [""])[0:2]
+        config["userstore"][argv[1]] = {"env": env, "user": argv[3], "database": database}
+    elif command == "DELETE" and len(argv) == 2:
+        config["userstore"].pop(argv[1], None)
+    else:
+        sys.stderr.write("Invalid command line arguments\n")
+        sys.exit(1)
+    if command != "LIST":
+        with open(os.path.join(system_directory(), "fakehana.json"), "w") as f:
+            json.dump(config, f, indent = 1)
+        print("Operation succeed.")
+
+def sapcontrol(argv):   # sapcontrol -nr <instance> -function GetProcessList, the services of fakehana.json
+    config = configuration()
+    if not "GetProcessList" in argv:
+        sys.stderr.write("FAIL: only GetProcessList is served by the fake HANA\n")
+        sys.exit(1)
+    print("\n"+datetime.now().strftime("%d.%m.%Y %H:%M:%S")+"\nGetProcessList\nOK\nname, description, dispstatus, textstatus, starttime, elapsedtime, pid")
+    for [name, description, status] in config["processes"]:
+        print(name+", "+description+", "+status+", "+("Running" if status == "GREEN" else "Stopped")+", 2026 01 01 00:00:00, 100:00:00, 1000")
+    sys.exit(3 if all(process[2] == "GREEN" for process in config["processes"]) else 4)
+
+def hdbnsutil(argv):   # hdbnsutil -sr_state, the replication mode of fakehana.json
+    config = configuration()
+    if not "-sr_state" in argv:
+        sys.stderr.write("only -sr_state is served by the fake HANA\n")
+        sys.exit(1)
+    mode = config.get("replicationMode", "none")
+    print("\nSystem Replication State\n~~~~~~~~~~~~~~~~~~~~~~~~\n\nonline: true\n\nmode: "+mode)
+    if mode != "none" and mode != "primary":
+        print("active primary site: 1")
+    print("done.")
+
+def whoami(argv):   # <sid>adm, so that cdalias of hanacleaner reads the aliases of the benchmark HOME instead of su - <sid>adm as root
+    print(configuration()["sid"].lower()+"adm")
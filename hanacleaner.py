@@ -5,6 +5,21 @@ import sys, os, time, subprocess, re
 from difflib import Differ
 import signal
 import fnmatch
+import threading
+import tempfile
+import gzip, shutil
+import hashlib
+import multiprocessing
+import json
+import http.server
+import cProfile
+import resource
+import sqlite3
+import uuid
+import io, contextlib, shlex
+import urllib.request
+from xml.etree import ElementTree
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 
 def printHelp():
     print("                                                                                                                                   ")    
@@ -31,7 +46,10 @@ def printHelp():
     print("         BACKUP CATALOG DELETE BACKUP_ID <id> COMPLETE (see SQL reference for more info), default: false                           ")
     print(" -bo     output catalog [true/false], displays backup catalog before and after the cleanup, default: false                         ")
     print(" -br     output removed catalog entries [true/false], displays backup catalog entries that were removed, default: false            ")
-    print("         Note: Please do not use -bo and -br if your catalog is huge (>10000) entries.                                             ")
+    print("         Note: With -op the catalog before and after the cleanup is written to compressed files (see -bz) in the -op directory,    ")
+    print("         instead of to the log. The catalog is streamed, so -bo and -br also work for catalogs with millions of entries.           ")
+    print(" -bz     catalog file compression [gzip/zstd], compression of the backup catalog files written by -bo and -br, zstd requires       ")
+    print("         the python module zstandard,                                                                        default: gzip         ")
     print(" -bn     output number deleted log backup entries [true/false], prints out how many log backup entries were deleted from the       ")
     print("         backup catalog, it is only needed to change this to false in case of extremely huge backup catalogs,   default: true      ")
     print("         ----  TRACE FILES  ----                                                                                                   ")
@@ -49,11 +67,14 @@ def printHelp():
     print("         i.e. ALTER SYSTEM CLEAR TRACES ... WITH BACKUP, see SQL Ref., default: false                                              ")
     print("         NOTE: Some small, unnecessary files, like .stat (SAP Note 2370780), might be deleted by WITH BACKUP --> the numbers might ")
     print("         not seem to fit                                                                                                           ") #internal incident 2180309626
-    print(" -tbd    directory for the trace backups, full path of the directory to where the back up (see -tcb) of the trace files            ")
+    print(" -tbd    directory for the trace backups, full path of the directory to where the back up (see -tcb and -tz) of the trace files    ")
     print("         are moved (for housekeeping of moved files, see ANY FILES below),     default: '' (they stay in the original directory)   ")
     print(" -tmo    time out for move [seconds], the move, requested by the -tbd flag, must wait until the compression, requested by the -tcb ")
     print("         flag, is finished. This can take some seconds. If it is not finished before the time out, specified by the -tmo flag,     ")
     print("         the move will not happen, default: 30 seconds                                                                             ")
+    print(" -tz     trace compression [gzip/zstd], the trace files that -tf removes are first compressed by hanacleaner into -tbd, by one     ")
+    print("         process per CPU core, and only removed if the compressed file decompresses to the same SHA-256 (zstd needs the python     ")
+    print("         module zstandard, with -ha this is also done on the other hosts),               default: '' (removed without a copy)      ")
     print(" -tf     retention days for trace files [days], trace files, in all hosts, that are older than this number of days are removed     ")
     print("         (except for the currently opened trace files)                                                                             ")
     print("         Only files with these strings in the filenames are taken into account (please let me know if I should add some):          ")
@@ -122,6 +143,10 @@ def printHelp():
     print("         service is started: ALTER SYSTEM RECLAIM DATAVOLUME '<host>:<port>' 120 DEFRAGMENT,        default: -1 (not used)         ")
     print("         Note: If you use System Replication see Q19 in SAP Note 1999880.                                                          ")
     print(" -fo     output fragmentation [true/false], displays data volume statistics before and after defragmentation, default: false       ")
+    print(" -fn     number of parallel defragmentations, this many data volumes are defragmented at the same time, but never two on the       ")
+    print("         same host or on the same storage path, progress is polled from M_JOB_PROGRESS (shown with -fo),      default: 1           ")
+    print(" -ft     defragmentation time budget [minutes], no new defragmentation is started after this many minutes, defragmentations        ")
+    print("         already running are not interrupted, the most fragmented data volumes are started first,     default: -1 (no budget)      ")
     print("         ---- LOB REORG (only COLUMN store tables) ----                                                                            ")
     print(" -lobf   max allowed fragmentation for an LOB [%], an LOB column with higher percentage of fragmentation, i.e. (physical size -    ")
     print("         binary size)/physical size, will be reorganized, default: -1 (not used)                                                   ")
@@ -132,6 +157,10 @@ def printHelp():
     print(" -lobn   too many LOBs [millions], if an LOB column has too many LOB objects, it will be reorganized, default: -1 (not used)       ")
     print(" -lobw   write LOBs [true/false], print the LOBs before and after the lob reorg, default: false                                    ")
     print(" -lobl   LOB location [list of schemas], comma seperated list of schemas that are considered for -lobf, -lobs, and -lobn           ")
+    print(" -lobc   number of parallel LOB reorgs, this many tables are lob-reorganized at the same time, all LOB columns of one table are    ")
+    print("         reorganized with one statement,                                                                          default: 1       ")
+    print(" -lobt   end of maintenance window [HH:MM], no new LOB reorg is started after this time of the day, LOB reorgs already running     ")
+    print("         are not interrupted,                                                                         default: '' (no deadline)    ")
     print("         ----  MULTIPLE ROW STORE TABLE CONTAINERS   ----                                                                          ")
     print(" -rc     row store containers cleanup [true/false], switch to clean up multiple row store table containers, default: false         ")
     print("         Note: Unfortunately there is NO nice way to give privileges to the DB User to be allowed to do this. Either you can       ")
@@ -159,6 +188,17 @@ def printHelp():
     print(" -cp     per partition [true/false], switch to consider flags above per partition instead of per column, default: false            ")
     print(" -cm     merge before compress [true/false], switch to perform a delta merge on the tables before compression, default: false      ")
     print(" -co     output compressed tables [true/false], switch to print all tables that were compression re-optimized, default: false      ")
+    print(" -cn     number of parallel compressions, this many tables are compression re-optimized at the same time, the tables with the      ")
+    print("         largest estimated memory size and UDIV quota are re-optimized first,                                      default: 1      ")
+    print(" -cl     load limit [%], before the compression re-optimization of the next table is started, the CPU and memory utilization       ")
+    print("         of all hosts are checked, if any is above this limit hanacleaner waits (max 1 hour), default: -1 (not checked)            ")
+    print(" -cg     min gain [MB], a table is only compression re-optimized if its expected memory saving is at least this large, the         ")
+    print("         expected saving is estimated from the share of duplicates in DEFAULT compressed columns, the memory of SPARSE/PREFIXED    ")
+    print("         columns with BLOCK index and the UDIV quota,                                                 default: -1 (not used)       ")
+    print("         Note: With -es false a ranked plan with the expected saving of all candidate tables is printed, so the payoff can be      ")
+    print("         seen before any compression re-optimization is executed                                                                   ")
+    print(" -ct     total budget [GB], the sum of the estimated max memory size of all tables that are compression re-optimized in one run    ")
+    print("         is not allowed to exceed this budget, the tables with the largest expected saving are chosen first, default: -1 (no limit)")
     print("         ---- VIRTUAL TABLE STATISTICS CREATION ----                                                                               ")
     print(" -vs     create statistics for virtual tables [true/false], switch to create optimization statistics for those virtual tables      ")
     print("         that are missing statistics according to SAP Note 1872652 (Note: could cause expenive operations),    default: false      ")
@@ -202,6 +242,12 @@ def printHelp():
     print("         ---- INTERVALL  ----                                                                                                      ")
     print(" -hci    hana cleaner interval [days], number days that hanacleaner waits before it restarts, default: -1 (exits after 1 cycle)    ")
     print("         NOTE: Do NOT use if you run hanacleaner in a cron job!                                                                    ")
+    print(" -hcc    metadata cache [days], with -hci the key info, HANA version and hosts are only looked up again after this many days,      ")
+    print("         or if the key could not connect, or if the HANA version changed,                               default: -1 (not used)     ")
+    print(" -hca    adaptive intervals [hours], min,max e.g. 1,168, with -hci the trace file, alert, backup catalog and event cleanups run    ")
+    print("         again when they would reach their -ol limit with the growth measured since their previous run, but not more often than    ")
+    print("         min and not less often than max, the other tasks still run every -hci, hanacleaner wakes up when the next task is due,    ")
+    print("         default: '' (not used, all tasks run every -hci)                                                                          ")
     print("         ---- INPUT  ----                                                                                                          ")
     print(" -ff     flag file(s), a comma seperated list of full paths to files that contain input flags, each flag in a new line, all lines  ")
     print("         in the files that do not start with a flag (a minus) are considered comments, default: '' (not used)                      ")
@@ -209,14 +255,53 @@ def printHelp():
     print("         ---- EXECUTE  ----                                                                                                        ")
     print(" -es     execute sql [true/false], execute all crucial housekeeping tasks (useful to turn off for investigation with -os=true,     ")
     print("         a.k.a. chicken mode :)  default: true                                                                                     ")
+    print(" -tl     task limits, max number of house keeping tasks of one database that run at the same time per resource class, as           ")
+    print("         sql light,sql heavy,filesystem, e.g. 2,1,2, independent tasks then run at the same time (defragmentation waits for the    ")
+    print("         tasks that free pages, -hr and -gr wait for the trace and dump cleanups, -vnr waits for -vs and -dsr for -vnr), the       ")
+    print("         summary keeps the order of this help, default: '' (one task at a time)                                                    ")
+    print(" -wc     workload classes, the workload classes of the sql light, sql heavy and filesystem tasks, e.g. HC_LIGHT,HC_HEAVY,HC_LIGHT, ")
+    print("         the classes, with their statement memory and thread limits and priority, are created by an administrator, hanacleaner     ")
+    print("         creates the workload mappings HANACLEANER_SQL_LIGHT, ..._SQL_HEAVY and ..._FILESYSTEM on the session variable             ")
+    print("         APPLICATION (needs WORKLOAD ADMIN, else they have to be created by an administrator), default: '' (not used)              ")
+    print(" -st     statement timeout [seconds], a cleanup statement that runs longer is cancelled on the server (ALTER SYSTEM CANCEL         ")
+    print("         SESSION from a second connection), its task is stopped and hanacleaner continues with the next task, only the cleanup    ")
+    print("         statements (e.g. DELETE, ALTER TABLE, RECLAIM) are watched, not the selects that find what to clean,                      ")
+    print("         default: -1 (not used)                                                                                                    ")
+    print(" -tt     task timeout [minutes], the cleanup statements of a task are cancelled the same way when the task has run this long,      ")
+    print("         e.g. a defragmentation or a LOB reorg, and no further statements of it are started,               default: -1 (not used)  ")
+    print(" -rt     retries [number], a cleanup statement that failed with a lock wait timeout, deadlock, busy resource or lost connection    ")
+    print("         is tried again this many times, after 10, 20, 40, ... (at most 300) seconds,                              default: 0      ")
+    print(" -fc     failure continue [true/false], if a house keeping task fails, e.g. with an sql error, it is recorded in the summary and   ")
+    print("         hanacleaner continues with the next task (instead of exiting), hanacleaner then exits with 2 if any task failed or        ")
+    print("         timed out (-st, -tt), default: false                                                                                      ")
     print("         ---- OUTPUT  ----                                                                                                         ")
     print(" -os     output sql [true/false], prints all crucial housekeeping tasks (useful for debugging with -es=false), default: false      ")
     print(" -op     output path, full literal path of the folder for the output logs (will be created if not there), default = '' (not used)  ")
     print("         Note: if you include %SID in the output path, it will automatically be replaced with the actually SID of your system      ")
     print(" -of     output prefix, adds a string to the output file, default: ''   (not used)                                                 ")
-    print(" -or     output retention days, logs in the paths specified with -op are only saved for this number of days, default: -1 (not used)")
+    print(" -or     output retention days, logs, backup catalog snapshots (-bo) and profiles (-pr) in the path specified with -op are   ")
+    print("         only saved for this number of days, default: -1 (not used)                                                           ")
     print(" -oc     output configuration [true/false], logs all parameters set by the flags and where the flags were set, i.e. what flag file ")
     print("         (one of the files listed in -ff) or if it was set via a flag specified on the command line, default = false               ")
+    print(" -it     instrumentation [number], after each cycle this many slowest house keeping tasks and statements are logged, with          ")
+    print("         wall time, number of subprocesses, rows and bytes,                                                default: -1 (not used)  ")
+    print(" -ij     instrumentation json [true/false], also writes all timings of the cycle to hanacleaner_timing_<time>.json in the -op      ")
+    print("         directory (or the current directory if -op is not used), requires -it,                           default: false           ")
+    print(" -md     metrics directory, after each cycle an OpenMetrics textfile per SID and database, e.g. hanacleaner_<SID>_<KEY>.prom,      ")
+    print("         with the results and durations of the house keeping tasks is written here, e.g. for the node_exporter textfile            ")
+    print("         collector,                                                                                      default: '' (not used)    ")
+    print(" -mp     metrics port, the same metrics are served on http://<host>:<port>/ as long as hanacleaner runs, i.e. useful with -hci,    ")
+    print("         the metrics of the last cycle of every key and database are shown,                             default: -1 (not used)     ")
+    print(" -ma     metrics address, the address that -mp listens on, e.g. 0.0.0.0 for all interfaces (the metrics are not protected),        ")
+    print("         (-ma is only used with -mp),                                                           default: 127.0.0.1 (only this host)")
+    print(" -pr     profiling [true/false], each house keeping task is profiled with cProfile into a .pstats file, and the whole run is       ")
+    print("         sampled into a .collapsed file per cycle (for flame graphs), both in the -op directory,             default: false        ")
+    print(" -oh     output history [true/false], the results of all house keeping tasks, with the number of entries or files found before     ")
+    print("         and removed, are added to hanacleaner_history.db (SQLite) in the -op directory, from this the growth of the trace files,  ")
+    print("         alerts, backup catalog and events is forecasted with  python hanacleaner.py --report  (with the same -op),  default: false")
+    print(" -ol     output limits, the number of trace files, alerts, backup catalog entries and events that --report forecasts the day       ")
+    print("         they are reached at, from the growth per day found in the -oh history, also the targets of -hca,                          ")
+    print("         default: 10000,1000000,100000,10000                                                                                       ")
     print(" -so     standard out switch [true/false], switch to write to standard out, default:  true                                         ")
     print("         ---- INSTANCE ONLINE CHECK ----                                                                                           ")
     print(" -oi     online test interval [seconds], < 0: HANACleaner does not check if online or secondary,           default: -1 (not used)  ")
@@ -224,6 +309,10 @@ def printHelp():
     print("                                         > 0: time it waits before it checks if DB is online and primary again                     ")
     print("                                              Note: For the > 0 option it might be necessary to use cron with the lock option      ")
     print("                                                    See the HANASitter & CRON slide in the HANASitter pdf                          ")
+    print(" -ou     sapcontrol url, SOAP endpoint of sapstartsrv used by the online check, if it cannot be reached the sapcontrol             ")
+    print("         executable is used instead,                                         default: '' (http://localhost:5<instance>13)          ")
+    print(" -ot     online check cache [seconds], results of the online, primary and master checks are reused for this many seconds,          ")
+    print("         e.g. for all databases of -dbs, the checks are always repeated after an -oi break,           default: -1 (not used)       ")
     print(" -hc     hana cockpit [true/false], set true if this hana is the hana running hana cockpit (i.e. only a SystemDB), and if you      ")
     print("         have set -oi >= 0                                                                                default: false           ")
     print("         ---- SERVER FULL CHECK ----                                                                                               ")
@@ -237,14 +326,22 @@ def printHelp():
     print("         it is necessary that you check for disk full situation manually! default: true                                            ")
     print("         ----  SSL  ----                                                                                                           ")   
     print(" -ssl    turns on ssl certificate [true/false], makes it possible to use SAP HANA Cleaner despite SSL, default: false              ")
+    print(" -hx     tools path, a directory that is searched first for hdbsql, hdbuserstore, sapcontrol and hdbnsutil, e.g. to run            ")
+    print("         hanacleaner against a stand-in of HANA when testing or benchmarking (together with -ou and -it), default: '' (PATH)       ")
     print("         ----  HOST  ----                                                                                                          ")
     print(" -vlh    virtual local host, if hanacleaner runs on a virtual host this has to be specified, default: '' (physical host is assumed)")
+    print(" -ha     host agents, the command that starts  python hanacleaner.py --agent  on the host %HOST of a scale-out system, so that -dr,")
+    print("         -hr, -gr and the move to -tbd also clean there, at the same time and with the results per host in the summary, e.g.       ")
+    print("         \"ssh %HOST python /hana/shared/hanacleaner.py --agent\" (ssh decides who may start an agent), default: '' (not used)       ")
     print("         ----  USER KEY  ----                                                                                                      ")     
     print(" -k      DB user key, this one has to be maintained in hdbuserstore, i.e. as <sid>adm do                                           ")               
     print("         > hdbuserstore SET <DB USER KEY> <ENV> <USERNAME> <PASSWORD>                     , default: SYSTEMKEY                     ")
     print("         It could also be a list of comma seperated userkeys (useful in MDC environments), e.g.: SYSTEMKEY,TENANT1KEY,TENANT2KEY   ")
     print("         Note: hdbuserstore has some restrictions in allowed passwords. Always test with                                           ")
     print("                               hdbsql -U <key> -j -A \"select * from dummy\"                                                       ")
+    print(" -kp     keys in parallel, number of the keys of -k that are cleaned at the same time, e.g. one key per SID on this host, they     ")
+    print("         share the metadata cache (-hcc), -tl is then the limit of all keys together, e.g. -tl 2,1,1 for one filesystem task on    ")
+    print("         the host at a time, and each key logs into its own daily log file (with the key in its name), default: 1 (one by one)     ")
     print(" -dbs    DB key, this can be a list of databases accessed from the system defined by -k (-k can only be one key if -dbs is used)   ")               
     print("         Note: Users with same name and password have to be maintained in all databases   , default: ''  (not used)                ")
     print("         It is possible to specify  -dbs all  to execute hanacleaner on all active databases, then -k must point to SYSTEMDB       ")
@@ -335,16 +432,16 @@ class SQLManager:
         self.key = dbuserkey
         self.db = DATABASE
         self.log = log_sql
+        self.hdbsql_string = hdbsql_string
+        self.connection = " -U " + self.key
         if len(DATABASE) > 1:
-            self.hdbsql_jAU = hdbsql_string + " -j -A -U " + self.key + " -d " + self.db
-            self.hdbsql_jAxU = hdbsql_string + " -j -A -x -U " + self.key + " -d " + self.db
-            self.hdbsql_jAaxU = hdbsql_string + " -j -A -a -x -U " + self.key + " -d " + self.db
-            self.hdbsql_jAQaxU = hdbsql_string + " -j -A -Q -a -x -U " + self.key + " -d " + self.db
-        else:
-            self.hdbsql_jAU = hdbsql_string + " -j -A -U " + self.key
-            self.hdbsql_jAxU = hdbsql_string + " -j -A -x -U " + self.key
-            self.hdbsql_jAaxU = hdbsql_string + " -j -A -a -x -U " + self.key
-            self.hdbsql_jAQaxU = hdbsql_string + " -j -A -Q -a -x -U " + self.key
+            self.connection += " -d " + self.db
+    def hdbsql(self, options):   # the session is mapped to the workload class of the task that is running in this thread (-wc), and can be cancelled (-st, -tt)
+        return self.hdbsql_string + workloads.connect_option() + watchdog.connect_option() + options + self.connection
+    hdbsql_jAU = property(lambda self: self.hdbsql(" -j -A"))
+    hdbsql_jAxU = property(lambda self: self.hdbsql(" -j -A -x"))
+    hdbsql_jAaxU = property(lambda self: self.hdbsql(" -j -A -a -x"))
+    hdbsql_jAQaxU = property(lambda self: self.hdbsql(" -j -A -Q -a -x"))
 
 class LogManager:
     def __init__(self, log_path, out_prefix, print_to_std, emailSender):
@@ -354,6 +451,29 @@ class LogManager:
             self.out_prefix = self.out_prefix + "_"
         self.print_to_std = print_to_std
         self.emailSender = emailSender
+        self.lock = threading.Lock()   # some house keeping tasks run statements in parallel threads that all log
+
+class MetadataCache:   # values that rarely change, e.g. HANA version and hosts, kept across -hci cycles
+    def __init__(self, ttl):
+        self.ttl = ttl   # seconds, < 0: nothing is cached
+        self.entries = {}   # (what, dbuserkey, ...) --> [value, time it was looked up]
+        self.lock = threading.Lock()
+    def get(self, key, lookup, on_change = None):
+        with self.lock:
+            entry = self.entries.get(key)
+        if self.ttl >= 0 and entry and time.time() - entry[1] < self.ttl:
+            return entry[0]
+        value = lookup()
+        with self.lock:
+            self.entries[key] = [value, time.time()]
+        if on_change and entry and entry[0] != value:
+            on_change()
+        return value
+    def invalidate(self, dbuserkey, keep = None):   # forgets everything looked up with this key, e.g. if it could not connect
+        with self.lock:
+            for key in list(self.entries):
+                if key[1] == dbuserkey and key != keep:
+                    del self.entries[key]
 
 class EmailSender:
     def __init__(self, receiverEmails, emailClient, senderEmail, mailServer, SID):
@@ -395,27 +515,740 @@ class VTCheck:
         printstring += "-----------------------------------------------------------------"
         print(printstring)
 
+class LoadGuard:   # checks CPU and memory headroom of all hosts before a heavy house keeping statement is started
+    def __init__(self, loadLimit, sqlman, logman):
+        self.limit = loadLimit      # [%], < 0 --> no check
+        self.sqlman = sqlman
+        self.logman = logman
+        self.cpuTimes = {}          # host --> [busy cpu time, idle cpu time] of the previous sample
+        self.sampleTime = None
+        self.maxWait = 3600         # [seconds], give up if the system stays busy for this long
+    def sample(self):
+        sql = "select R.HOST, R.TOTAL_CPU_USER_TIME + R.TOTAL_CPU_SYSTEM_TIME + R.TOTAL_CPU_WIO_TIME, R.TOTAL_CPU_IDLE_TIME, TO_DECIMAL(100 * M.USED_MEMORY / NULLIF(R.ALLOCATION_LIMIT, 0), 10, 2) from SYS.M_HOST_RESOURCE_UTILIZATION R inner join (select HOST, sum(TOTAL_MEMORY_USED_SIZE) as USED_MEMORY from SYS.M_SERVICE_MEMORY group by HOST) M on R.HOST = M.HOST"
+        errorlog = "WARNING: Could not check the CPU and memory utilization from SYS.M_HOST_RESOURCE_UTILIZATION and SYS.M_SERVICE_MEMORY, so the load will not be checked."
+        [out, succeeded] = try_execute_sql(sql, errorlog, self.sqlman, self.logman, exit_on_fail = False, always_execute = True)
+        if not succeeded:
+            self.limit = -1
+            return [0, 0]
+        hosts = [host.strip('\n').strip('|').split('|') for host in out.splitlines(1)]
+        hosts = [[elem.strip(' ') for elem in host] for host in hosts]
+        hosts = [host for host in hosts if len(host) == 4 and is_integer(host[1]) and is_integer(host[2])]
+        maxCpu = 0
+        maxMem = max([float(host[3]) for host in hosts if is_number(host[3])] + [0])
+        for host in hosts:
+            if host[0] in self.cpuTimes:
+                busy = int(host[1]) - self.cpuTimes[host[0]][0]
+                idle = int(host[2]) - self.cpuTimes[host[0]][1]
+                if busy + idle > 0:
+                    maxCpu = max(maxCpu, 100.0 * busy / (busy + idle))
+            self.cpuTimes[host[0]] = [int(host[1]), int(host[2])]
+        self.sampleTime = time.time()
+        return [maxCpu, maxMem]
+    def utilization(self):
+        if self.sampleTime is None or time.time() - self.sampleTime > 30:   # the CPU times are accumulated, so a recent previous sample is needed
+            self.sample()
+            time.sleep(1)
+        return self.sample()
+    def wait_for_headroom(self):
+        if self.limit < 0 or not self.sqlman.execute:
+            return True
+        waited = 0
+        backoff = 10
+        [cpu, mem] = self.utilization()
+        while self.limit >= 0 and (cpu > self.limit or mem > self.limit):
+            if waited >= self.maxWait:
+                return False
+            log("The system is busy (max CPU "+str(round(cpu, 1))+" %, max memory "+str(round(mem, 1))+" %, limit "+str(self.limit)+" %), will wait "+str(backoff)+" seconds.", self.logman)
+            time.sleep(backoff)
+            waited += backoff
+            backoff = min(2 * backoff, 300)
+            [cpu, mem] = self.utilization()
+        return True
+
+class TaskGraph:   # the house keeping tasks of one database with their dependencies and resource classes, independent tasks run at the same time (-tl)
+    resourceClasses = ["sql_light", "sql_heavy", "filesystem"]
+    def __init__(self, limits):
+        self.limits = dict(zip(self.resourceClasses, limits))   # resource class --> max number of running tasks, {} --> one task at a time in the order they were added
+        self.tasks = []   # [name, resource class, names of the tasks to wait for, function that returns the summary as [[message, also in email]], probe, function that returns the summary if the probe found nothing to do]
+    def add(self, name, resourceClass, function, after = [], probe = "", idle = None):   # probe is a cheap select that returns 0 if the task would not change anything
+        if not intervals.due(name):
+            self.note("    ("+name+" was not done since it is not due before "+intervals.next_run(name)+" (-hca))")
+            return
+        self.tasks.append([name, resourceClass, after, function, probe, idle])
+        workloads.taskClasses[name] = resourceClass
+    def note(self, message):   # a task that is not done, its message still comes at its place in the summary
+        self.tasks.append(["", None, [], lambda: [[message, False]], "", None])
+    def skip_idle_tasks(self, sqlman, logman):   # all probes are run before any task is started, a task with nothing to do becomes a note with its idle summary
+        idleTasks = []
+        for task in self.tasks:
+            if task[4]:
+                errorlog = "The probe of "+task[0]+" failed, so "+task[0]+" will be done anyway."
+                [out, succeeded] = try_execute_sql(task[4], errorlog, sqlman, logman, exit_on_fail = False, always_execute = True)
+                if succeeded and out.strip("\n").strip("|").strip(" ") == "0":
+                    idleTasks.append(task[0])
+                    metrics.task_done(task[0], [], 0, 0, False)   # nothing was removed
+                    history.task_done(task[0], 0, 0, False)
+                    task[1:4] = [None, [], task[5]]
+        if idleTasks:
+            log("The probes found nothing to do for "+", ".join(idleTasks)+", skipped", logman)
+    def call(self, task):   # a task that ran out of time (-st, -tt), or failed (-fc), is reported in the summary, and the next task is started
+        slot = fleet.slots.get(task[1])   # -kp: the -tl limit is shared with the tasks of the other keys
+        if slot:
+            slot.acquire()
+        watchdog.start_task(task[0])
+        try:
+            return task[3]()
+        except StatementTimeout as e:
+            failures.record(task[0], str(e))
+            return [["TIMEOUT: "+task[0]+" was stopped, "+str(e), True]]
+        except Exception as e:
+            if not failures.isolate:
+                raise
+            failures.record(task[0], str(e) or type(e).__name__)
+            return [["FAILURE: "+task[0]+" failed and was skipped (-fc): "+(str(e).strip("\n").split("\n")[0] or type(e).__name__), True]]
+        finally:
+            watchdog.end_task(task[0])
+            if slot:
+                slot.release()
+    def summarize(self, messages, logman):
+        emailmessage = ""
+        for [message, email] in messages:
+            log(message, logman)
+            if email:
+                emailmessage += message+"\n"
+        return emailmessage
+    def run(self, sqlman, logman):   # returns the email summary, the summary is logged in the order the tasks were added, no matter in which order they finished
+        self.skip_idle_tasks(sqlman, logman)
+        if not self.limits:
+            return "".join(self.summarize(self.call(task), logman) for task in self.tasks)
+        names = [task[0] for task in self.tasks]
+        futures = {}   # index of a started task --> future, None for notes
+        finished = lambda i: i in futures and (futures[i] is None or futures[i].done())
+        executor = ThreadPoolExecutor(max_workers = sum(self.limits.values()))
+        emailmessage = ""
+        nSummarized = 0
+        try:
+            while nSummarized < len(self.tasks):
+                for i, [name, resourceClass, after, function, probe, idle] in enumerate(self.tasks):
+                    if i in futures or not all(finished(names.index(dependency)) for dependency in after if dependency in names):
+                        continue
+                    if resourceClass is None:
+                        futures[i] = None
+                    elif len([j for j in futures if self.tasks[j][1] == resourceClass and not finished(j)]) < self.limits[resourceClass]:
+                        futures[i] = executor.submit(instrumentation.bind(self.call), self.tasks[i])
+                while nSummarized < len(self.tasks) and finished(nSummarized):
+                    emailmessage += self.summarize(self.tasks[nSummarized][3]() if futures[nSummarized] is None else futures[nSummarized].result(), logman)
+                    nSummarized += 1
+                running = [future for future in futures.values() if future is not None and not future.done()]
+                if running:
+                    wait(running, return_when = FIRST_COMPLETED)
+        finally:
+            executor.shutdown()   # if a task failed, the running ones are allowed to finish, but no new are started
+        return emailmessage
+
+class FleetScheduler:   # -kp: the keys of -k, e.g. one per SID on this host, are cleaned at the same time in one process, with one metadata cache and the -tl limits for all of them together
+    def __init__(self):
+        self.parallelKeys = 1
+        self.slots = {}   # resource class --> semaphore with the -tl limit of the whole host, only with -kp
+        self.sids = {}    # key and database (instrumentation.context) --> SID, the keys can belong to different systems on this host
+    def configure(self, parallelKeys, limits):
+        self.parallelKeys = parallelKeys
+        if parallelKeys > 1:
+            self.slots = dict((resourceClass, threading.BoundedSemaphore(limit)) for resourceClass, limit in zip(TaskGraph.resourceClasses, limits))
+    def system_id(self, SID, sqlman, logman):   # the SID of the system of the key, else the SID of this OS user
+        [out, succeeded] = try_execute_sql("select SYSTEM_ID from SYS.M_DATABASE", "", sqlman, logman, exit_on_fail = False, always_execute = True)
+        out = out.strip("\n").strip("|").strip(" ")
+        return out if succeeded and out else SID
+    def logman(self, dbuserkey, logman):   # the keys that run at the same time each get their own daily log file
+        if self.parallelKeys <= 1:
+            return logman
+        keyLogman = LogManager(logman.path, logman.out_prefix+dbuserkey, logman.print_to_std, logman.emailSender)
+        keyLogman.lock = logman.lock   # the lines on standard out are not mixed
+        return keyLogman
+    def run(self, dbuserkeys, clean_key, logman):   # clean_key(dbuserkey, logman) for all keys, returns when all are done
+        if self.parallelKeys <= 1:
+            for dbuserkey in dbuserkeys:
+                clean_key(dbuserkey, logman)
+            return
+        with ThreadPoolExecutor(max_workers = self.parallelKeys, thread_name_prefix = "hanacleaner_key") as executor:
+            futures = [executor.submit(clean_key, dbuserkey, self.logman(dbuserkey, logman)) for dbuserkey in dbuserkeys]
+        for future in futures:
+            future.result()   # an error of a key is raised here, after the other keys are done
+
+fleet = FleetScheduler()
+
+class HostAgents:   # -ha: the file level house keeping tasks also run on the other hosts of a scale-out system, by a hanacleaner agent (--agent) there, started by a command, e.g. ssh
+    tasks = {"clean_dumps": ["days", "instance"],   # the only functions an agent runs, with the kinds of their arguments
+             "clean_hdbcons": ["days", "instance", "database"],
+             "clean_anyfile": ["days list", "paths", "words", "days"],
+             "move_archived_traces": ["files", "path", "database", "instance", "hosts"],
+             "archive_trace_files": ["files", "path", "compression", "database", "instance"]}
+    name = re.compile(r"^[A-Za-z0-9_.\-]+$")   # e.g. a host, or a part of a trace file name as in M_TRACEFILES
+    def __init__(self):
+        self.agent = ""       # command with %HOST that starts an agent on that host, '' --> only this host
+        self.localHost = ""
+    def configure(self, agent, localHost):
+        self.agent = agent
+        self.localHost = localHost
+    def enabled(self):
+        return bool(self.agent)
+    def call(self, host, task, args, sqlman):   # {"result", "log", "error"} from the agent on host
+        request = json.dumps({"task": task, "args": args, "execute": sqlman.execute, "log": sqlman.log})
+        start = time.time()
+        response = subprocess.run(self.agent.replace("%HOST", host), shell=True, input=request, capture_output=True, text=True, check=True).stdout
+        instrumentation.record("host agent on "+host+": "+task, time.time() - start, response)
+        return json.loads(response)
+    def fan_out(self, task, argsForHost, hosts, sqlman, logman):   # [[host, result]] from the agents on all other hosts, at the same time, the result is None if the agent failed
+        def call(host):
+            try:
+                response = self.call(host, task, argsForHost(host), sqlman)
+            except Exception as e:
+                response = {"result": None, "log": "", "error": (e.stderr if isinstance(e, subprocess.CalledProcessError) and e.stderr else str(e)).strip("\n")}
+            if response["log"]:
+                log(host+" (-ha):\n"+response["log"].rstrip("\n"), logman)
+            if response["error"]:
+                log("ERROR: The hanacleaner agent on "+host+" could not do "+task+" (-ha): "+response["error"], logman, True)
+                return None
+            if isinstance(MetricsExporter.taskMetrics.get(task), str):
+                metrics.add(MetricsExporter.taskMetrics[task], response["result"], [["host", host]])
+            return response["result"]
+        others = [host for host in hosts if host != self.localHost]
+        return run_parallel(others, call, max(len(others), 1))
+    def results(self, task, argsForHost, hostsLookup, sqlman, logman):   # [[host, result]] of the task on this host and, with -ha, on all other hosts at the same time
+        function = globals()[task]
+        if not self.enabled():
+            return [[self.localHost, function(*argsForHost(self.localHost), sqlman, logman)]]
+        executor = ThreadPoolExecutor(max_workers = 1)
+        remote = executor.submit(instrumentation.bind(self.fan_out), task, argsForHost, hostsLookup(), sqlman, logman)
+        try:
+            results = [[self.localHost, function(*argsForHost(self.localHost), sqlman, logman)]]
+        finally:   # also if this host failed, the agents are waited for
+            remoteResults = remote.result()
+            executor.shutdown()
+        return results + remoteResults
+    def everywhere(self, task, argsForHost, hostsLookup, sqlman, logman):   # returns [sum of the results, results per host for the summary, '' without -ha]
+        results = self.results(task, argsForHost, hostsLookup, sqlman, logman)
+        if not self.enabled():
+            return [results[0][1], ""]
+        total = sum(result for host, result in results if isinstance(result, (int, float)))
+        return [total, " on "+str(len(results))+" hosts ("+", ".join(host+": "+(str(result) if result is not None else "failed") for host, result in results)+")"]
+    def valid(self, kind, value):   # the agent only takes arguments that look like what the master sends, the directories of HANA it finds itself with cdalias
+        if kind == "days":
+            return is_integer(str(value))
+        if kind == "instance":
+            return isinstance(value, str) and re.match(r"^[0-9]{2}$", value) is not None
+        if kind == "database":
+            return isinstance(value, str) and (not value or self.name.match(value) is not None)
+        if kind == "compression":
+            return value in ["gzip", "zstd"]
+        if kind == "path":   # -tbd and -gd of the master
+            return isinstance(value, str) and value.startswith("/") and not ".." in value.split("/")
+        if kind == "files":   # as in M_TRACEFILES, e.g. DB_<tenant>/indexserver_<host>.30003.001.trc
+            return isinstance(value, list) and all(isinstance(file, str) and all(self.name.match(piece) and piece != ".." for piece in file.split("/")) for file in value)
+        if kind == "words":   # -gw of the master, part of a file name
+            return isinstance(value, list) and all(isinstance(word, str) and not "/" in word for word in value)
+        if kind in ["days list", "paths", "hosts"]:
+            return isinstance(value, list) and all(self.valid({"days list": "days", "paths": "path", "hosts": "database"}[kind], element) and element for element in value)
+        return False
+    def handle(self, request):   # on the agent, one request of the master
+        if request.get("task") not in self.tasks:
+            return {"result": None, "log": "", "error": str(request.get("task"))+" is not a task of a host agent"}
+        kinds = self.tasks[request["task"]]
+        args = request.get("args")
+        if not isinstance(args, list) or len(args) != len(kinds) or not all(self.valid(kind, arg) for kind, arg in zip(kinds, args)):
+            return {"result": None, "log": "", "error": "the arguments of "+request["task"]+" are not valid"}
+        sqlman = SQLManager(request.get("execute") is True, "", "", "", request.get("log") is True)   # the file level tasks run no sql
+        logman = LogManager("", "", True, None)
+        failures.isolate = True   # task_failed() stops the task, not the agent
+        out = io.StringIO()
+        result = None
+        error = ""
+        with contextlib.redirect_stdout(out):   # standard out of the agent is the answer to ssh
+            try:
+                result = instrumentation.run_as(request["task"], globals()[request["task"]], *(args + [sqlman, logman]))
+            except Exception as e:
+                error = str(e).strip("\n") or type(e).__name__
+        return {"result": result, "log": out.getvalue(), "error": error}
+    def serve(self):   # python hanacleaner.py --agent: one request from standard in, the answer on standard out
+        sys.stdout.write(json.dumps(self.handle(json.loads(sys.stdin.read()))))
+
+agents = HostAgents()
+
+class WorkloadClasses:   # -wc: the sessions of the tasks of each resource class get their own APPLICATION, that a workload mapping maps to a workload class
+    def __init__(self):
+        self.classes = {}       # resource class --> workload class
+        self.taskClasses = {}   # task --> resource class, from the task graph
+        self.mapped = set()     # (key, database) with checked workload mappings
+    def configure(self, workloadClasses):
+        self.classes = dict(zip(TaskGraph.resourceClasses, workloadClasses))
+    def application(self, resourceClass):
+        return "hanacleaner_"+resourceClass
+    def connect_option(self):
+        resourceClass = self.taskClasses.get(instrumentation.current_task())
+        if resourceClass in self.classes:
+            return ' -Z "SESSIONVARIABLE:APPLICATION='+self.application(resourceClass)+'"'
+        return ""
+    def create_mappings(self, sqlman, logman):   # once per key and database, needs the system privilege WORKLOAD ADMIN
+        if not self.classes or (sqlman.key, sqlman.db) in self.mapped:
+            return
+        self.mapped.add((sqlman.key, sqlman.db))
+        for resourceClass, workloadClass in self.classes.items():
+            mapping = "HANACLEANER_"+resourceClass.upper()
+            [current, succeeded] = try_execute_sql("select WORKLOAD_CLASS_NAME from SYS.WORKLOAD_MAPPINGS where WORKLOAD_MAPPING_NAME = '"+mapping+"'", "", sqlman, logman, exit_on_fail = False, always_execute = True)
+            current = current.strip("\n").strip("|").strip(" ")
+            if not succeeded or current == workloadClass:
+                continue
+            sql = ("ALTER" if current else "CREATE")+" WORKLOAD MAPPING \\\""+mapping+"\\\" WORKLOAD CLASS \\\""+workloadClass+"\\\" SET 'APPLICATION NAME' = '"+self.application(resourceClass)+"'"
+            errorlog = "\nWARNING: The user represented by the key "+sqlman.key+" could not map the "+resourceClass+" tasks to the workload class "+workloadClass+" (-wc). \nOne possible reason for this is insufficient privilege, \ne.g. lack of the system privilege WORKLOAD ADMIN, then an administrator can execute \n"+sql+"\nThe "+resourceClass+" tasks will run without this workload class until then."
+            try_execute_sql(sql, errorlog, sqlman, logman, exit_on_fail = False)
+
+workloads = WorkloadClasses()
+
+class StatementTimeout(Exception):   # a statement was cancelled since it ran longer than -st, or than what was left of -tt
+    pass
+
+class Watchdog:   # -st and -tt: a statement that runs out of time is cancelled on the server, from a second connection, and its task is stopped
+    def __init__(self):
+        self.statementTimeout = -1   # [seconds], < 0 --> no limit
+        self.taskTimeout = -1        # [seconds], < 0 --> no limit
+        self.local = threading.local()   # local.marker is the session variable of the statement that is prepared in this thread
+        self.deadlines = {}          # (key and database, task) --> time when it has to be done
+    def enabled(self):
+        return self.statementTimeout >= 0 or self.taskTimeout >= 0
+    def start_task(self, task):
+        if self.taskTimeout >= 0:
+            self.deadlines[(instrumentation.context, task)] = time.time() + self.taskTimeout
+    def end_task(self, task):
+        self.deadlines.pop((instrumentation.context, task), None)
+    def time_left(self):
+        limits = [self.statementTimeout] if self.statementTimeout >= 0 else []
+        task = (instrumentation.context, instrumentation.current_task())
+        if task in self.deadlines:
+            limits.append(self.deadlines[task] - time.time())
+        return min(limits) if limits else None
+    def prepare(self):   # before the hdbsql command is built, so that the session can be found
+        self.local.marker = uuid.uuid4().hex if self.enabled() else ""
+    def connect_option(self):
+        marker = getattr(self.local, "marker", "")
+        return ' -Z "SESSIONVARIABLE:HANACLEANER_STATEMENT='+marker+'"' if marker else ""
+    def run(self, cmd, statement, sqlman, logman):   # as subprocess.run(cmd, check = True), but raises StatementTimeout if it ran out of time
+        marker = getattr(self.local, "marker", "")
+        self.local.marker = ""
+        timeout = self.time_left()
+        if timeout is None:
+            return subprocess.run(cmd, shell=True, capture_output=True, text=True, check=True)
+        if timeout <= 0:
+            raise StatementTimeout("the task timeout (-tt) of "+str(self.taskTimeout // 60)+" minutes was reached before "+statement[0:100])
+        start = time.time()
+        process = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        try:
+            [out, err] = process.communicate(timeout = timeout)
+        except subprocess.TimeoutExpired:
+            self.cancel(marker, sqlman, logman)
+            try:
+                process.communicate(timeout = 60)   # the cancelled statement returns with an error
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.communicate()
+            raise StatementTimeout("a statement was cancelled after "+str(round(time.time() - start))+" seconds (-st "+str(self.statementTimeout)+", -tt "+(str(self.taskTimeout // 60) if self.taskTimeout >= 0 else "-1")+"): "+statement[0:100])
+        if process.returncode:
+            raise subprocess.CalledProcessError(process.returncode, cmd, out, err)
+        return subprocess.CompletedProcess(cmd, 0, out, err)
+    def cancel(self, marker, sqlman, logman):   # the control connection is not watched itself
+        connections = run_command(sqlman.hdbsql_jAaxU + " \"select CONNECTION_ID from SYS.M_SESSION_CONTEXT where KEY = 'HANACLEANER_STATEMENT' and VALUE = '"+marker+"'\"").splitlines()
+        for connection in [connection.strip('|').strip(' ') for connection in connections]:
+            if is_integer(connection):
+                log("TIMEOUT: Will now cancel the session "+connection+" of the task "+(instrumentation.current_task() or "(main)"), logman)
+                run_command(sqlman.hdbsql_jAaxU + " \"ALTER SYSTEM CANCEL SESSION '"+connection+"'\"")
+
+watchdog = Watchdog()
+
+class TaskFailure(Exception):   # raised instead of os._exit(1) in a house keeping task if -fc is used
+    pass
+
+class FailurePolicy:   # -rt: statements that failed with a retryable error are retried with exponential backoff, -fc: a failed task is recorded and the next task runs
+    retryableErrors = [131, 133, 146, -10709, -10807, -10108]   # lock wait timeout, deadlock, resource busy, connection failed, connection down, session reconnected
+    def __init__(self):
+        self.retries = 0
+        self.isolate = False
+        self.lock = threading.Lock()
+        self.failures = []   # [context, task, error] of the failed or timed out tasks
+    def retry(self, attempt, stderr, statement, logman):   # True after the backoff, if the statement should be tried again
+        codes = [int(code) for code in re.findall(r"\* (-?\d+):", stderr or "")]   # e.g. * 131: transaction rolled back by lock wait timeout
+        if attempt >= self.retries or not any(code in self.retryableErrors for code in codes):
+            return False
+        backoff = min(10 * 2**attempt, 300)
+        log("WARNING: "+statement[0:100]+" failed with the retryable error "+str(codes[0])+", will try again in "+str(backoff)+" seconds (-rt, "+str(attempt + 1)+" of "+str(self.retries)+")", logman)
+        time.sleep(backoff)
+        return True
+    def record(self, task, error):
+        with self.lock:
+            self.failures.append([instrumentation.context, task, error])
+    def exit_code(self):   # 0: all tasks succeeded, 2: some tasks failed or timed out, but hanacleaner continued (1 is still a fatal error)
+        return 2 if self.failures else 0
+
+failures = FailurePolicy()
+
+def task_failed(error = ""):   # instead of os._exit(1) in house keeping tasks, with -fc only the task is stopped
+    if failures.isolate and instrumentation.current_task():
+        raise TaskFailure(error)
+    os._exit(1)
+
+
+class Instrumentation:   # wall time, number of subprocesses, rows and bytes per house keeping task and per statement (-it)
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.local = threading.local()   # local.task is the house keeping task that is running in this thread, statements are counted for it
+        self.tasks = []       # [context, task, seconds, subprocesses, rows, bytes, peak memory of hanacleaner so far [MB], peak memory of a subprocess so far [MB]]
+        self.statements = []  # [context, task, statement, seconds, rows, bytes]
+    context = property(lambda self: getattr(self.local, "context", ""), lambda self, context: setattr(self.local, "context", context))   # key and database of the iteration that runs in this thread (-kp)
+    def record(self, statement, seconds, out):
+        out = out or ''
+        self.record_counts(statement, seconds, out.count('\n') + 1 if out else 0, len(out))
+    def record_counts(self, statement, seconds, nRows, nBytes):
+        if self.enabled:
+            with self.lock:
+                self.statements.append([self.context, self.current_task() or "(main)", statement, seconds, nRows, nBytes])
+    def run_task(self, name, function, *args, **kwargs):
+        if not self.enabled:
+            return self.run_as(name, function, *args, **kwargs)   # the running task is also needed by -wc
+        self.local.task = name
+        nStatementsBefore = len(self.statements)
+        start = time.time()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            with self.lock:
+                statements = [stmt for stmt in self.statements[nStatementsBefore:] if stmt[0] == self.context and stmt[1] == name]   # other tasks, also of other keys, can run at the same time (-tl, -kp)
+                self.tasks.append([self.context, name, time.time() - start, len(statements), sum(stmt[4] for stmt in statements), sum(stmt[5] for stmt in statements), resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // 1024])   # ru_maxrss is in KB on Linux, and the high-water mark since hanacleaner started, not of this task, for that run one task per hanacleaner (bench/benchmark.py)
+            self.local.task = ""
+    def current_task(self):
+        return getattr(self.local, "task", "")
+    def run_as(self, task, function, *args, **kwargs):   # in a thread of e.g. run_parallel, so that its statements count for the task that started it
+        self.local.task = task
+        try:
+            return function(*args, **kwargs)
+        finally:
+            self.local.task = ""
+    def bind(self, function):   # function for another thread, its statements count for the key, database and task of this thread
+        context = self.context
+        task = self.current_task()
+        def bound(*args, **kwargs):
+            self.context = context
+            return self.run_as(task, function, *args, **kwargs)
+        return bound
+    def report(self, topN, logman):
+        tasks = sorted(self.tasks, key = lambda task: task[2], reverse = True)[0:topN]
+        statements = sorted(self.statements, key = lambda stmt: stmt[3], reverse = True)[0:topN]
+        log("\nTOP "+str(topN)+" SLOWEST TASKS (-it):\n"+print_table(["Key and DB", "Task", "Seconds", "Subprocesses", "Rows", "Bytes", "Peak Memory So Far [MB]", "Peak Subprocess Memory So Far [MB]"], [task[0:2]+[round(task[2], 3)]+task[3:8] for task in tasks]), logman)
+        log("TOP "+str(topN)+" SLOWEST STATEMENTS (-it):\n"+print_table(["Key and DB", "Task", "Statement", "Seconds", "Rows", "Bytes"], [stmt[0:2]+[stmt[2][0:100]]+[round(stmt[3], 3)]+stmt[4:6] for stmt in statements]), logman)
+    def write_json(self, fileName):
+        with open(fileName, 'w') as f:
+            json.dump({"tasks": [dict(zip(["context", "task", "seconds", "subprocesses", "rows", "bytes", "peak_memory_so_far_mb", "peak_subprocess_memory_so_far_mb"], task)) for task in self.tasks],
+                       "statements": [dict(zip(["context", "task", "statement", "seconds", "rows", "bytes"], stmt)) for stmt in self.statements]}, f, indent = 1)
+    def reset(self):   # a new -hci cycle
+        with self.lock:
+            self.tasks = []
+            self.statements = []
+
+instrumentation = Instrumentation()
+
+class MetricsExporter:   # OpenMetrics textfile per SID and database after each cycle, for the node_exporter textfile collector (-md), or served on a port (-mp)
+    taskMetrics = {"clean_output": "hanacleaner_log_files_removed",
+                   "clean_backup_catalog": ["hanacleaner_backup_catalog_data_entries_removed", "hanacleaner_backup_catalog_log_entries_removed"],
+                   "clean_trace_files": "hanacleaner_trace_files_removed",
+                   "clean_dumps": "hanacleaner_dump_files_removed",
+                   "clean_hdbcons": "hanacleaner_hdbcons_rows_removed",
+                   "clean_anyfile": "hanacleaner_any_files_removed",
+                   "clean_alerts": "hanacleaner_alerts_removed",
+                   "clean_objlock": "hanacleaner_object_locks_removed",
+                   "clean_objhist": "hanacleaner_object_history_cleaned_megabytes",
+                   "reclaim_logsegments": "hanacleaner_log_segments_reclaimed",
+                   "clean_events": ["hanacleaner_handled_events_removed", "hanacleaner_events_removed", "hanacleaner_events_left", "hanacleaner_handled_events_left"],
+                   "clean_audit_logs": "hanacleaner_audit_log_entries_removed",
+                   "clean_pending_emails": "hanacleaner_pending_emails_removed",
+                   "reclaim_rs_containers": ["hanacleaner_row_store_tables_with_multiple_containers", "hanacleaner_row_store_containers_reclaimed"],
+                   "force_compression": ["hanacleaner_tables_compressed", "hanacleaner_compression_failures"],
+                   "create_vt_statistics": ["hanacleaner_virtual_tables", "hanacleaner_virtual_table_statistics_created"],
+                   "refresh_statistics": ["hanacleaner_data_statistics", "hanacleaner_data_statistics_refreshed"],
+                   "refresh_data_statistics": ["hanacleaner_data_statistics_by_age", "hanacleaner_data_statistics_by_age_refreshed"],
+                   "refresh_virtual_tables": "hanacleaner_virtual_table_mismatches_fixed",
+                   "refresh_ip_block": ["hanacleaner_ip_block_entries_added"],
+                   "clean_ini": "hanacleaner_ini_history_entries_removed"}
+    def __init__(self):
+        self.directory = ""
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.iterations = {}   # key and database (instrumentation.context) --> [[[label, value]] SID, key and database, [[name, labels, value]] samples] of the running iterations
+        self.pages = {}        # labels --> samples of the last finished iteration, for -mp
+    def configure(self, directory, port, address = "127.0.0.1"):
+        self.directory = directory
+        self.enabled = bool(directory) or port >= 0
+        if port >= 0:
+            exporter = self
+            class MetricsHandler(http.server.BaseHTTPRequestHandler):
+                def do_GET(self):
+                    with exporter.lock:
+                        body = exporter.render([sample for samples in exporter.pages.values() for sample in samples]).encode()
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/openmetrics-text; version=1.0.0; charset=utf-8')
+                    self.end_headers()
+                    self.wfile.write(body)
+                def log_message(self, format, *args):   # no access log on standard out
+                    pass
+            server = http.server.ThreadingHTTPServer((address, port), MetricsHandler)
+            threading.Thread(target = server.serve_forever, daemon = True).start()
+    def start(self, SID, dbuserkey, DATABASE):
+        with self.lock:
+            self.iterations[instrumentation.context] = [[["sid", SID], ["key", dbuserkey], ["database", DATABASE]], []]
+    def add(self, name, value, extraLabels = []):
+        if self.enabled and is_number(value):
+            with self.lock:
+                [labels, samples] = self.iterations[instrumentation.context]
+                samples.append([name, labels + extraLabels, float(value)])
+    def task_done(self, task, args, result, seconds, failed):
+        self.add("hanacleaner_task_duration_seconds", seconds, [["task", task]])
+        self.add("hanacleaner_task_failures", 1 if failed else 0, [["task", task]])
+        if failed:
+            return
+        if task == "defragment":   # [host, port, change] per data volume
+            for port in result:
+                self.add("hanacleaner_fragmentation_change_percent", port[2], [["host", port[0]], ["port", port[1]]])
+        elif task == "lob_reorg":   # one difference per used criterion
+            for flag, diff in zip([flag for flag, value in zip(["-lobf", "-lobs", "-lobn"], [args[0], args[2], args[3]]) if value != "-1"], result):
+                self.add("hanacleaner_lob_columns_fixed", diff, [["criterion", flag]])
+        elif task in self.taskMetrics:
+            names = self.taskMetrics[task]
+            if isinstance(names, list):
+                for name, value in zip(names, result):
+                    self.add(name, value)
+            else:
+                self.add(names, result)
+    def render(self, samples):
+        lines = []
+        for name in sorted(set(sample[0] for sample in samples)):
+            lines.append("# TYPE "+name+" gauge")
+            for sample in [sample for sample in samples if sample[0] == name]:
+                labels = ",".join(label[0]+'="'+str(label[1]).replace('\\', '\\\\').replace('"', '\\"')+'"' for label in sample[1])
+                lines.append(name+"{"+labels+"} "+repr(sample[2]))
+        return "\n".join(lines + ["# EOF"])+"\n"
+    def write(self):   # at the end of each iteration
+        if not self.enabled:
+            return
+        self.add("hanacleaner_last_run_timestamp_seconds", time.time())
+        with self.lock:
+            [labels, samples] = self.iterations.pop(instrumentation.context)
+            self.pages[tuple(label[1] for label in labels)] = samples
+        if self.directory:
+            fileName = self.directory+"/hanacleaner_"+"_".join(label[1] for label in labels if label[1])+".prom"
+            with open(fileName+".tmp", 'w') as f:
+                f.write(self.render(samples))
+            os.rename(fileName+".tmp", fileName)   # the textfile collector should never read a half written file
+
+metrics = MetricsExporter()
+
+class RunHistory:   # -oh: the results of all house keeping tasks in hanacleaner_history.db (SQLite) in the -op directory, --report forecasts the growth from it
+    artefacts = [["clean_trace_files", "Trace Files"], ["clean_alerts", "Alerts"], ["clean_backup_catalog", "Backup Catalog Entries"], ["clean_events", "Events"]]   # the order of the report and of -ol
+    removedFromResult = {"clean_backup_catalog": lambda result: result[0] + result[1],
+                         "clean_events": lambda result: result[1],
+                         "reclaim_rs_containers": lambda result: int(result[1]),
+                         "refresh_ip_block": lambda result: result[0]}   # the other tasks return just the number removed, or nothing that can be added up
+    def __init__(self):
+        self.fileName = ""
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.local = threading.local()   # local.before is the number of entries or files the running task found before it cleaned
+        self.labels = {}                 # key and database (instrumentation.context) --> SID, key and database of the running iterations
+    def configure(self, directory):
+        self.fileName = (directory if directory else ".")+"/hanacleaner_history.db"
+        if not self.enabled:   # only --report
+            return
+        with sqlite3.connect(self.fileName) as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS TASK_RUNS (SID TEXT, KEY TEXT, DATABASE TEXT, TIME REAL, TASK TEXT, REMOVED REAL, BEFORE REAL, SECONDS REAL, FAILED INTEGER, RESULT TEXT)")
+            connection.execute("CREATE INDEX IF NOT EXISTS TASK_RUNS_TASK ON TASK_RUNS (TASK, SID, KEY, DATABASE, TIME)")
+    def start(self, SID, dbuserkey, DATABASE):
+        self.labels[instrumentation.context] = [SID, dbuserkey, DATABASE]
+    def observe(self, before):   # called by a task when it has counted what is there before it cleans
+        self.local.before = before
+    def task_done(self, task, result, seconds, failed):
+        before = getattr(self.local, "before", None)
+        self.local.before = None
+        removed = None
+        if not failed:
+            removed = self.removedFromResult[task](result) if task in self.removedFromResult else result
+        removed = removed if isinstance(removed, (int, float, str)) and is_number(removed) else None   # e.g. defragment returns a list per data volume
+        labels = self.labels.get(instrumentation.context, ["", "", ""])
+        intervals.task_done(labels, task, before, removed)
+        if not self.enabled:
+            return
+        with self.lock, sqlite3.connect(self.fileName) as connection:
+            connection.execute("INSERT INTO TASK_RUNS VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", labels + [time.time(), task, removed, before, seconds, 1 if failed else 0, json.dumps(result, default = str)])
+    def growth(self, limits):   # [SID, key, database, artefact, runs, count now, growth per day, limit, when the limit is reached] per artefact with at least two runs
+        with sqlite3.connect(self.fileName) as connection:
+            runs = connection.execute("SELECT SID, KEY, DATABASE, TASK, TIME, BEFORE, COALESCE(REMOVED, 0) FROM TASK_RUNS WHERE FAILED = 0 AND BEFORE IS NOT NULL ORDER BY SID, KEY, DATABASE, TASK, TIME").fetchall()
+        forecasts = []
+        for [task, artefact], limit in zip(self.artefacts, limits):
+            for labels in sorted(set(tuple(run[0:3]) for run in runs if run[3] == task)):
+                artefactRuns = [run for run in runs if run[3] == task and tuple(run[0:3]) == labels]
+                if len(artefactRuns) < 2:
+                    continue
+                grown = sum(run[5] - (previous[5] - previous[6]) for previous, run in zip(artefactRuns[:-1], artefactRuns[1:]))   # what came in between two runs
+                days = (artefactRuns[-1][4] - artefactRuns[0][4]) / 86400.0
+                perDay = grown / days if days > 0 else 0
+                now = artefactRuns[-1][5] - artefactRuns[-1][6]
+                if now >= limit:
+                    reached = "already"
+                elif perDay <= 0:
+                    reached = "never"
+                else:
+                    reached = (datetime.fromtimestamp(artefactRuns[-1][4]) + timedelta(days = (limit - now) / perDay)).strftime("%Y-%m-%d")
+                forecasts.append(list(labels) + [artefact, len(artefactRuns), int(now), round(perDay, 1), limit, reached])
+        return forecasts
+    def report(self, limits):
+        if not os.path.isfile(self.fileName):
+            return "There is no run history in "+self.fileName+" yet, it is written by hanacleaner with -oh true."
+        forecasts = self.growth(limits)
+        if not forecasts:
+            return "There are not enough runs in "+self.fileName+" yet, at least two runs per key and database are needed for a forecast."
+        return "GROWTH FORECAST from "+self.fileName+" (--report):\n"+print_table(["SID", "Key", "DB", "Artefact", "Runs", "Now", "Growth per Day", "Limit (-ol)", "Limit Reached"], forecasts)
+
+history = RunHistory()
+
+class AdaptiveIntervals:   # -hca: the trace, alert, backup catalog and event cleanups run again when their growth since the previous run would reach the -ol limit, the other tasks every -hci
+    def __init__(self):
+        self.enabled = False
+        self.minSeconds = 0
+        self.maxSeconds = 0
+        self.regularSeconds = 0   # -hci, for the tasks without a measured growth
+        self.ceilings = {}        # task --> -ol limit
+        self.labels = {}          # key and database (instrumentation.context) --> SID, key and database of the running iterations
+        self.lock = threading.Lock()
+        self.nextRuns = {}        # (SID, key, database, task) --> time when the task is due again
+        self.previous = {}        # (SID, key, database, task) --> [time, number of entries or files left after the previous run]
+        self.cycleStart = 0       # the next runs are counted from the start of the cycle, so that the tasks of one cycle are due together in the next
+    def configure(self, minHours, maxHours, regularSeconds, limits):
+        self.enabled = True
+        self.minSeconds = minHours*3600
+        self.maxSeconds = maxHours*3600
+        self.regularSeconds = regularSeconds
+        self.ceilings = dict(zip([artefact[0] for artefact in RunHistory.artefacts], limits))
+    def new_cycle(self):
+        self.cycleStart = time.time()
+    def start(self, SID, dbuserkey, DATABASE):
+        self.labels[instrumentation.context] = (SID, dbuserkey, DATABASE)
+    def due(self, task):
+        return not self.enabled or time.time() >= self.nextRuns.get(self.labels.get(instrumentation.context, ()) + (task,), 0)
+    def next_run(self, task):
+        return datetime.fromtimestamp(self.nextRuns[self.labels[instrumentation.context] + (task,)]).strftime("%Y-%m-%d %H:%M:%S")
+    def task_done(self, labels, task, before, removed):
+        if not self.enabled:
+            return
+        now = time.time()
+        key = tuple(labels) + (task,)
+        interval = self.regularSeconds
+        with self.lock:
+            if task in self.ceilings and before is not None:
+                left = before - (removed or 0)
+                if key in self.previous and now > self.previous[key][0]:
+                    perSecond = (before - self.previous[key][1]) / (now - self.previous[key][0])   # growth since the previous run
+                    interval = (self.ceilings[task] - left) / perSecond if perSecond > 0 else self.maxSeconds
+                interval = min(max(interval, self.minSeconds), self.maxSeconds)
+                self.previous[key] = [now, left]
+            self.nextRuns[key] = (self.cycleStart or now) + interval
+    def sleep_seconds(self):   # until the next task is due, but at least -hci or the min interval, whichever is shorter, e.g. if no task ran
+        with self.lock:
+            nextRun = min(self.nextRuns.values()) if self.nextRuns else 0
+        return max(nextRun - time.time(), min(self.regularSeconds, self.minSeconds))
+
+intervals = AdaptiveIntervals()
+
+class Profiler:   # -pr: cProfile per house keeping task (.pstats) and a sampling profiler over the whole run (collapsed stacks, for flame graphs)
+    def __init__(self):
+        self.enabled = False
+        self.directory = "."
+        self.prefix = ""
+        self.lock = threading.Lock()
+        self.stacks = {}   # "thread;outermost;...;innermost" --> number of samples
+        self.profileLock = threading.Lock()   # only one cProfile can be active at a time, tasks running beside it (-tl) are only in the sampled stacks
+    def start(self, directory, prefix, interval = 0.01):
+        self.enabled = True
+        self.directory = directory if directory else "."
+        self.prefix = prefix
+        sampler = threading.Thread(target = self.sample, args = (interval,), daemon = True)
+        sampler.start()
+    def sample(self, interval):   # samples all threads, also the ones waiting for hdbsql, cProfile only sees the thread it was started in
+        own = threading.get_ident()
+        while True:
+            names = dict([(thread.ident, thread.name) for thread in threading.enumerate()])
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame.f_code.co_name+" ("+os.path.basename(frame.f_code.co_filename)+":"+str(frame.f_code.co_firstlineno)+")")
+                    frame = frame.f_back
+                key = ";".join([names.get(ident, str(ident))] + stack[::-1])
+                with self.lock:
+                    self.stacks[key] = self.stacks.get(key, 0) + 1
+            time.sleep(interval)
+    def run_task(self, name, function, *args, **kwargs):
+        if not self.enabled or not self.profileLock.acquire(False):
+            return function(*args, **kwargs)
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profile.disable()
+            self.profileLock.release()
+            context = instrumentation.context.replace(" ", "_")
+            profile.dump_stats(self.directory+"/hanacleaner_profile_"+self.prefix+(context+"_" if context else "")+name+"_"+datetime.now().strftime("%Y-%m-%d_%H-%M-%S")+".pstats")
+    def write_collapsed(self):   # at the end of each cycle, e.g. flamegraph.pl hanacleaner_profile_<time>.collapsed > flame.svg
+        fileName = self.directory+"/hanacleaner_profile_"+self.prefix+datetime.now().strftime("%Y-%m-%d_%H-%M-%S")+".collapsed"
+        with self.lock:
+            stacks = self.stacks
+            self.stacks = {}
+        with open(fileName, 'w') as f:
+            for stack in sorted(stacks):
+                f.write(stack+" "+str(stacks[stack])+"\n")
+        return fileName
+
+profiler = Profiler()
+
+def instrumented_task(function):   # house keeping tasks are timed by instrumentation if -it is used, profiled if -pr is used, and their results are exported if -md or -mp is used and stored if -oh is used
+    def timed_task(*args, **kwargs):
+        start = time.time()
+        try:
+            result = instrumentation.run_task(function.__name__, profiler.run_task, function.__name__, function, *args, **kwargs)
+        except Exception:
+            metrics.task_done(function.__name__, args, None, time.time() - start, True)
+            history.task_done(function.__name__, None, time.time() - start, True)
+            raise
+        metrics.task_done(function.__name__, args, result, time.time() - start, False)
+        history.task_done(function.__name__, result, time.time() - start, False)
+        return result
+    return timed_task
+
 
 ######################## FUNCTION DEFINITIONS ################################
 
 def run_command(cmd, check = True):
-    if sys.version_info[0] == 2:  # stop supporting Python 2 as soon as SPS05 is not supported
-        out = subprocess.check_output(cmd, shell=True).strip("\n")
-    elif sys.version_info[0] == 3:
-        if check:
-            out = ''
-            try:
-                out = subprocess.run(cmd, shell=True, capture_output=True, text=True, check=True).stdout.strip("\n")
-            except subprocess.CalledProcessError as e:
-                print("ERROR: Could not run\n\t"+cmd+"\nERROR MESSAGE:\n"+e.stderr)
-        else:
-            out = subprocess.run(cmd, shell=True, capture_output=True, text=True).stdout.strip("\n")
+    start = time.time()
+    if check:
+        out = ''
+        try:
+            out = subprocess.run(cmd, shell=True, capture_output=True, text=True, check=True).stdout.strip("\n")
+        except subprocess.CalledProcessError as e:
+            print("ERROR: Could not run\n\t"+cmd+"\nERROR MESSAGE:\n"+e.stderr)
     else:
-        print("ERROR: Wrong Python version")
-        os._exit(1)
+        out = subprocess.run(cmd, shell=True, capture_output=True, text=True).stdout.strip("\n")
+    instrumentation.record(cmd, time.time() - start, out)
     return out
 
 def get_sid():
+    if instrumentation.context in fleet.sids:   # the SID of the key that is cleaned in this thread (-kp)
+        return fleet.sids[instrumentation.context]
     SID = run_command('echo $SAPSYSTEMNAME').upper()
     return SID
 
@@ -426,15 +1259,23 @@ def is_integer(s):
     except ValueError:
         return False
 
+def is_number(s):
+    try:
+        float(s)
+        return True
+    except ValueError:
+        return False
+
 def log(message, logmanager, send_email = False):
-    if logmanager.print_to_std:
-        print(message)
-    if logmanager.path:
-        file_name = "hanacleanerlog"
-        logfile = open(logmanager.path+"/"+file_name+"_"+logmanager.out_prefix+datetime.now().strftime("%Y-%m-%d"+".txt").replace(" ", "_"), "a")
-        logfile.write(message+"\n")   
-        logfile.flush()
-        logfile.close()
+    with logmanager.lock:
+        if logmanager.print_to_std:
+            print(message)
+        if logmanager.path:
+            file_name = "hanacleanerlog"
+            logfile = open(logmanager.path+"/"+file_name+"_"+logmanager.out_prefix+datetime.now().strftime("%Y-%m-%d"+".txt").replace(" ", "_"), "a")
+            logfile.write(message+"\n")   
+            logfile.flush()
+            logfile.close()
     if send_email and logmanager.emailSender:  #sends email IF this call of log() wants it AND IF -en flag has been specified with email(s)
         sendEmail(message, logmanager)
 
@@ -455,14 +1296,24 @@ def try_execute_sql(sql, errorlog, sqlman, logman, exit_on_fail = True, always_e
         if sqlman.log:
             log(sql, logman)
         if sqlman.execute or always_execute:
-            sql = sqlman.hdbsql_jAaxU + " \""+sql+"\""
-            out = subprocess.run(sql, shell=True, capture_output=True, text=True, check=True).stdout.strip("\n")
+            statement = sql
+            for attempt in range(failures.retries + 1):
+                watchdog.prepare()
+                sql = sqlman.hdbsql_jAaxU + " \""+statement+"\""
+                start = time.time()
+                try:
+                    out = watchdog.run(sql, statement, sqlman, logman).stdout.strip("\n")
+                    break
+                except subprocess.CalledProcessError as e:
+                    if not failures.retry(attempt, e.stderr, statement, logman):
+                        raise
+            instrumentation.record(sql, time.time() - start, out)
     except subprocess.CalledProcessError as e:
         errorMessage = "ERROR: Could not execute\n\t"+sql+"\nERROR MESSAGE:\n"+e.stderr+"\n"+errorlog
         succeeded = False
         if exit_on_fail:
             log(errorMessage, logman, True)
-            os._exit(1)
+            task_failed(errorMessage)
         else:
             log(errorMessage, logman)
     return [out, succeeded]
@@ -509,51 +1360,69 @@ def get_key_info(dbuserkey, local_host, logman):
         os._exit(1)
     return  [key_hosts, ENV, DATABASE]
 
-def sql_for_backup_id_for_min_retained_days(minRetainedDays):
-    oldestDayForKeepingBackup = datetime.now() + timedelta(days = -int(minRetainedDays))
-    return "SELECT TOP 1 ENTRY_ID, SYS_START_TIME from sys.m_backup_catalog where (ENTRY_TYPE_NAME = 'complete data backup' or ENTRY_TYPE_NAME = 'data snapshot') and STATE_NAME = 'successful' and SYS_START_TIME < '" + oldestDayForKeepingBackup.strftime('%Y-%m-%d')+" 00:00:00' order by SYS_START_TIME desc"
-
-
-def sql_for_backup_id_for_min_retained_backups(minRetainedBackups):
-    return "SELECT ENTRY_ID, SYS_START_TIME from (SELECT ENTRY_ID, SYS_START_TIME, ROW_NUMBER() OVER(ORDER BY SYS_START_TIME desc) as NUM from sys.m_backup_catalog where (ENTRY_TYPE_NAME = 'complete data backup' or ENTRY_TYPE_NAME = 'data snapshot') and STATE_NAME = 'successful' order by SYS_START_TIME desc) as B where B.NUM = "+str(minRetainedBackups)
+def sql_for_backup_boundary(minRetainedBackups, minRetainedDays):   # the older of the -be:th newest successful data backup and the newest successful data backup older than -bd days
+    conditions = []
+    if minRetainedBackups >= 0:
+        conditions.append("B.NUM >= "+str(minRetainedBackups))
+    if minRetainedDays >= 0:
+        oldestDayForKeepingBackup = datetime.now() + timedelta(days = -int(minRetainedDays))
+        conditions.append("B.SYS_START_TIME < '" + oldestDayForKeepingBackup.strftime('%Y-%m-%d')+" 00:00:00'")
+    return "SELECT TOP 1 ENTRY_ID from (SELECT ENTRY_ID, SYS_START_TIME, ROW_NUMBER() OVER(ORDER BY SYS_START_TIME desc) as NUM from sys.m_backup_catalog where (ENTRY_TYPE_NAME = 'complete data backup' or ENTRY_TYPE_NAME = 'data snapshot') and STATE_NAME = 'successful') as B where "+" and ".join(conditions)+" order by B.NUM"
 
-def online_and_master_tests(online_test_interval, local_dbinstance, local_host, cockpit, logman):
+def online_and_master_tests(online_test_interval, local_dbinstance, local_host, cockpit, sapcontrolUrl, probecache, sqlman, logman):
     if online_test_interval < 0: #then dont test
         return True
     else:
-        if is_online(cockpit, local_dbinstance, logman) and not is_secondary(logman): 
-            return is_master(local_dbinstance, local_host, logman)  #HANACleaner should only run on the Master Node
+        if probecache.get(('online', local_dbinstance), lambda: is_online(cockpit, local_dbinstance, sapcontrolUrl, logman)) and not probecache.get(('secondary', sqlman.key, sqlman.db), lambda: is_secondary(sqlman, logman)): 
+            return probecache.get(('master', sqlman.key, sqlman.db), lambda: is_master(local_dbinstance, local_host, sqlman, logman))  #HANACleaner should only run on the Master Node
         else:
             return False
 
-def is_master(local_dbinstance, local_host, logman):
-    process = subprocess.Popen(['python', cdalias('cdpy', local_dbinstance)+"/landscapeHostConfiguration.py"], stdout=subprocess.PIPE)
-    out, err = process.communicate()
-    out = out.decode()
-    out_lines = out.splitlines(1)
-    host_line = [line for line in out_lines if local_host in line or local_host.upper() in line or local_host.lower() in line]  #have not tested this with virtual and -vlh yet
-    if len(host_line) != 1:
-        print_out = "ERROR: Something went wrong. It found more than one (or none) host line" + " \n ".join(host_line)
-        log(print_out, logman, True)
-        os._exit(1)
-    nameserver_actual_role = host_line[0].strip('\n').split('|')[11].strip(' ')
-    test_ok = (str(err) == "None")
+def is_master(local_dbinstance, local_host, sqlman, logman):
+    # if there is a connection the role is read from SQL, no need to start a new python for landscapeHostConfiguration.py
+    nameserver_actual_role = run_command(sqlman.hdbsql_jAQaxU + " \"select NAMESERVER_ACTUAL_ROLE from SYS.M_LANDSCAPE_HOST_CONFIGURATION where LOWER(HOST) = '"+local_host.lower()+"'\"", False).strip(' ')
+    test_ok = True
+    if not nameserver_actual_role:
+        process = subprocess.Popen(['python', cdalias('cdpy', local_dbinstance)+"/landscapeHostConfiguration.py"], stdout=subprocess.PIPE)
+        out, err = process.communicate()
+        out = out.decode()
+        out_lines = out.splitlines(1)
+        host_line = [line for line in out_lines if local_host in line or local_host.upper() in line or local_host.lower() in line]  #have not tested this with virtual and -vlh yet
+        if len(host_line) != 1:
+            print_out = "ERROR: Something went wrong. It found more than one (or none) host line" + " \n ".join(host_line)
+            log(print_out, logman, True)
+            os._exit(1)
+        nameserver_actual_role = host_line[0].strip('\n').split('|')[11].strip(' ')
+        test_ok = (str(err) == "None")
     result = nameserver_actual_role == 'master'
     printout = "Master Check      , "+datetime.now().strftime("%Y-%m-%d %H:%M:%S")+"    ,     -            , "+str(test_ok)+"         , "+str(result)+"       , Nameserver actual role = "+nameserver_actual_role
     log(printout, logman)
     return result
 
-def is_online(cockpit, dbinstance, logman): #Checks if all services are GREEN and if there exists an indexserver (if not this is a Stand-By) 
-    process = subprocess.Popen(['sapcontrol', '-nr', dbinstance, '-function', 'GetProcessList'], stdout=subprocess.PIPE)
-    out, err = process.communicate()
-    out = out.decode()
+def sapcontrol_process_list(dbinstance, sapcontrolUrl):   # GetProcessList directly from the SOAP endpoint of sapstartsrv, if not reachable from the sapcontrol executable
+    url = sapcontrolUrl if sapcontrolUrl else "http://localhost:5"+dbinstance+"13"
+    envelope = '<?xml version="1.0" encoding="UTF-8"?><SOAP-ENV:Envelope xmlns:SOAP-ENV="http://schemas.xmlsoap.org/soap/envelope/" xmlns:ns="urn:SAPControl"><SOAP-ENV:Body><ns:GetProcessList/></SOAP-ENV:Body></SOAP-ENV:Envelope>'
+    try:
+        request = urllib.request.Request(url, data = envelope.encode(), headers = {'Content-Type': 'text/xml; charset=utf-8', 'SOAPAction': '""'})
+        response = ElementTree.fromstring(urllib.request.urlopen(request, timeout = 10).read())
+        processes = []
+        for item in [elem for elem in response.iter() if elem.tag.split('}')[-1] == 'item']:
+            fields = dict([(field.tag.split('}')[-1], field.text or '') for field in item])
+            processes.append(", ".join([fields.get('name', ''), fields.get('description', ''), fields.get('dispstatus', '').replace('SAPControl-', '')]))
+        return ["\n".join(processes), True]   # same lines as from sapcontrol -function GetProcessList
+    except Exception:
+        process = subprocess.Popen(['sapcontrol', '-nr', dbinstance, '-function', 'GetProcessList'], stdout=subprocess.PIPE)
+        out, err = process.communicate()
+        return [out.decode(), str(err) == "None"]
+
+def is_online(cockpit, dbinstance, sapcontrolUrl, logman): #Checks if all services are GREEN and if there exists an indexserver (if not this is a Stand-By) 
+    [out, test_ok] = sapcontrol_process_list(dbinstance, sapcontrolUrl)
     number_services = out.count(" HDB ") + out.count(" Local Secure Store")   
     number_running_services = out.count("GREEN")
     if cockpit:
         number_importantservers = int(out.count("hdbnameserver"))
     else:
         number_importantservers = int(out.count("hdbindexserver")) # if not indexserver this is Stand-By
-    test_ok = (str(err) == "None")
     result = (number_running_services == number_services) and (number_importantservers != 0)
     if cockpit:
         printout = "Online Check      , "+datetime.now().strftime("%Y-%m-%d %H:%M:%S")+"    ,     -            , "+str(test_ok)+"         , "+str(result)+"       , # name services: "+str(number_importantservers)+", # running services: "+str(number_running_services)+" out of "+str(number_services)
@@ -562,12 +1431,18 @@ def is_online(cockpit, dbinstance, logman): #Checks if all services are GREEN an
     log(printout, logman)
     return result
     
-def is_secondary(logman):
-    process = subprocess.Popen(['hdbnsutil', '-sr_state'], stdout=subprocess.PIPE)
-    out, err = process.communicate() 
-    out = out.decode()
-    test_ok = (str(err) == "None")
-    result = "active primary site" in out   # then it is secondary!
+def is_secondary(sqlman, logman):
+    # if there is a connection the replication mode is read from SQL, hdbnsutil -sr_state is slow
+    mode = run_command(sqlman.hdbsql_jAQaxU + " \"select VALUE from SYS.M_SYSTEM_OVERVIEW where SECTION = 'System Replication' and NAME = 'Mode'\"", False).strip(' ')
+    if mode:
+        test_ok = True
+        result = not mode.upper() in ['PRIMARY', 'NONE']
+    else:
+        process = subprocess.Popen(['hdbnsutil', '-sr_state'], stdout=subprocess.PIPE)
+        out, err = process.communicate() 
+        out = out.decode()
+        test_ok = (str(err) == "None")
+        result = "active primary site" in out   # then it is secondary!
     printout = "Primary Check     , "+datetime.now().strftime("%Y-%m-%d %H:%M:%S")+"    ,     -            , "+str(test_ok)+"         , "+str(not result)+"       , " 
     log(printout, logman)
     return result 
@@ -589,7 +1464,7 @@ def get_all_databases(execute_sql, hdbsql_string, dbuserkey, local_host, out_sql
     return all_databases
 
 def checkIfAcceptedFlag(word):
-    if not word in ["-h", "--help", "-d", "--disclaimer", "-ff", "-be", "-bd", "-bb", "-bo", "-br", "-bn", "-tc", "-tb", "-te", "-tcb", "-tbd", "-tmo", "-tf", "-ti", "-to", "-td", "-dr", "-hr", "-gr", "-gd", "-gw", "-gm", "-zb", "-zp", "-zl", "-zo", "-zk", "-ar", "-kr", "-ao", "-ad", "-om", "-oo", "-lr", "-eh", "-eu", "-ur", "-pe", "-fl", "-fo", "-lobf", "-lobp", "-lobs", "-lobn", "-lobw", "-lobl", "-rc", "-ro", "-cc", "-ce", "-cr", "-cs", "-cd", "-cq", "-cu", "-cb", "-cp", "-cm", "-co", "-vs", "-vm", "-vt", "-vn", "-vtt", "-vto", "-vr", "-vnr", "-dsr", "-vtr", "-vts", "-vta", "-vtp", "-ipt", "-ips", "-ipn", "-vl", "-ir", "-es", "-os", "-op", "-of", "-or", "-oc", "-oi", "-hc", "-fs", "-if", "-df", "-hci", "-so", "-ssl", "-vlh", "-k", "-dbs", "-en", "-et", "-ena", "-enc", "-ens", "-enm"]:
+    if not word in ["-h", "--help", "-d", "--disclaimer", "-ff", "-be", "-bd", "-bb", "-bo", "-br", "-bz", "-bn", "-tc", "-tb", "-te", "-tcb", "-tbd", "-tmo", "-tz", "-tf", "-ti", "-to", "-td", "-dr", "-hr", "-gr", "-gd", "-gw", "-gm", "-zb", "-zp", "-zl", "-zo", "-zk", "-ar", "-kr", "-ao", "-ad", "-om", "-oo", "-lr", "-eh", "-eu", "-ur", "-pe", "-fl", "-fo", "-fn", "-ft", "-lobf", "-lobp", "-lobs", "-lobn", "-lobw", "-lobl", "-lobc", "-lobt", "-rc", "-ro", "-cc", "-ce", "-cr", "-cs", "-cd", "-cq", "-cu", "-cb", "-cp", "-cm", "-co", "-cn", "-cl", "-cg", "-ct", "-vs", "-vm", "-vt", "-vn", "-vtt", "-vto", "-vr", "-vnr", "-dsr", "-vtr", "-vts", "-vta", "-vtp", "-ipt", "-ips", "-ipn", "-vl", "-ir", "-es", "-tl", "-wc", "-st", "-tt", "-rt", "-fc", "-os", "-op", "-of", "-or", "-oc", "-it", "-ij", "-md", "-mp", "-ma", "-pr", "-oh", "-ol", "-oi", "-ou", "-ot", "-hc", "-fs", "-if", "-df", "-hci", "-hcc", "-hca", "-so", "-ssl", "-hx", "-vlh", "-ha", "-k", "-kp", "-dbs", "-en", "-et", "-ena", "-enc", "-ens", "-enm"]:
         print("INPUT ERROR: ", word, " is not one of the accepted input flags. Please see --help for more information.")
         os._exit(1)
 
@@ -618,54 +1493,18 @@ def getParameterListFromCommandLine(sysargv, flag_string, flag_log, parameter):
         flag_log[flag_string] = [','.join(parameter), "command line"]
     return parameter
    
-def backup_id(minRetainedBackups, minRetainedDays, sqlman):
-    if minRetainedDays >= 0:
-        results = run_command(sqlman.hdbsql_jAQaxU + " \"" + sql_for_backup_id_for_min_retained_days(minRetainedDays) + "\"").splitlines(1)
-        [backupIdForMinRetainedDays, startTimeForMinRetainedDays] = results if results else ['', '']
-        if not backupIdForMinRetainedDays:
-            backupIdForMinRetainedDays = '-1'
-            startTimeForMinRetainedDays = '1000-01-01 08:00:00'
-        else:
-            backupIdForMinRetainedDays = backupIdForMinRetainedDays.strip('\n').strip(' ')
-            startTimeForMinRetainedDays = startTimeForMinRetainedDays.strip('\n').strip(' ').split('.')[0]  #removing milliseconds
-    if minRetainedBackups >= 0:
-        results = run_command(sqlman.hdbsql_jAQaxU + " \"" + sql_for_backup_id_for_min_retained_backups(minRetainedBackups) + "\"").splitlines(1)
-        [backupIdForMinRetainedBackups, startTimeForMinRetainedBackups] = results if results else ['', '']
-        if not backupIdForMinRetainedBackups:
-            backupIdForMinRetainedBackups = '-1'
-            startTimeForMinRetainedBackups = '1000-01-01 08:00:00'
-        else:
-            backupIdForMinRetainedBackups = backupIdForMinRetainedBackups.strip('\n').strip(' ')
-            startTimeForMinRetainedBackups = startTimeForMinRetainedBackups.strip('\n').strip(' ').split('.')[0]  #removing milliseconds
-    if minRetainedDays >= 0 and minRetainedBackups >= 0:    
-        backupId = backupIdForMinRetainedDays if datetime.strptime(startTimeForMinRetainedDays, '%Y-%m-%d %H:%M:%S')  < datetime.strptime(startTimeForMinRetainedBackups, '%Y-%m-%d %H:%M:%S') else backupIdForMinRetainedBackups
-    elif minRetainedDays >= 0:
-        backupId = backupIdForMinRetainedDays
-    elif minRetainedBackups >= 0:
-        backupId = backupIdForMinRetainedBackups
-    else:
-        backupId = ""
-    return backupId
+def backup_id(minRetainedBackups, minRetainedDays, sqlman):   # ID of the retention boundary, with one round trip, empty if not enough backups are retained yet
+    if minRetainedDays < 0 and minRetainedBackups < 0:
+        return ""
+    return run_command(sqlman.hdbsql_jAQaxU + " \"" + sql_for_backup_boundary(minRetainedBackups, minRetainedDays) + "\"").strip('\n').strip(' ')
 
 def sqls_for_backup_catalog_cleanup(minRetainedBackups, minRetainedDays, deleteBackups, sqlman):
     sqls = []
     backupId = backup_id(minRetainedBackups, minRetainedDays, sqlman)
-    if backupId:
-        backupType = run_command(sqlman.hdbsql_jAQaxU + " \"select ENTRY_TYPE_NAME from sys.m_backup_catalog where backup_id = '"+backupId+"'\"").strip(' ')
-        if backupType == "complete data backup" or backupType == "data snapshot":
-            sqls = ["BACKUP CATALOG DELETE ALL BEFORE BACKUP_ID " + backupId]
-            if deleteBackups:
-                sqls = ["BACKUP CATALOG DELETE ALL BEFORE BACKUP_ID " + backupId + " COMPLETE"]
-        #If it will ever be possible to do    BACKUP CATALOG DELETE BACKUP_ID <log backup id>    then this will be useful:
-        else:
-            backupIdStartTime = run_command(sqlman.hdbsql_jAQaxU + " \"select SYS_START_TIME from sys.m_backup_catalog where backup_id = '"+backupId+"'\"").strip(' ')         
-            olderBackupIds = run_command(sqlman.hdbsql_jAQaxU + " \"select BACKUP_ID from sys.m_backup_catalog where SYS_START_TIME < '"+backupIdStartTime+"'\"").splitlines()
-            olderBackupIds = [x.strip('\n').strip(' ') for x in olderBackupIds if x]
-            for oldID in olderBackupIds:
-                sql = "BACKUP CATALOG DELETE BACKUP_ID " + oldID
-                if deleteBackups:
-                    sql += " COMPLETE"
-                sqls.append(sql)
+    if backupId:   # the boundary is always a successful data backup or snapshot, single log backups can not be deleted with BACKUP CATALOG DELETE BACKUP_ID
+        sqls = ["BACKUP CATALOG DELETE ALL BEFORE BACKUP_ID " + backupId]
+        if deleteBackups:
+            sqls = ["BACKUP CATALOG DELETE ALL BEFORE BACKUP_ID " + backupId + " COMPLETE"]
     return sqls
         
 def print_removed_entries(before, after, logman):
@@ -697,25 +1536,92 @@ def print_table(header_list, values_lists):
         string_out += row_format.format(*row)+"\n"
     return string_out
 
-def clean_backup_catalog(minRetainedBackups, minRetainedDays, deleteBackups, outputCatalog, outputDeletedCatalog, outputNDeletedLBEntries, sqlman, logman):  
-    if outputCatalog or outputDeletedCatalog:
-        nCatalogEntries = int(run_command(sqlman.hdbsql_jAQaxU + " \"select count(*) from sys.m_backup_catalog\"").strip(' '))
-        if nCatalogEntries > 100000:
-            log("INPUT ERROR: Please do not use -br true or -bo true if your backup catalog is larger than 100000 entries!", logman, True)
-            os._exit(1)
+def catalog_rows(sqlman, logman):   # streams the backup catalog from hdbsql, ordered by ENTRY_ID, one row at a time
+    sql = sqlman.hdbsql_jAaxU + " \"select ENTRY_ID, ENTRY_TYPE_NAME, BACKUP_ID, SYS_START_TIME from sys.m_backup_catalog order by ENTRY_ID\""
+    start = time.time()
+    [nRows, nBytes] = [0, 0]
+    with tempfile.TemporaryFile(mode = 'w+') as stderr:   # not a pipe, a long error must not block hdbsql while the rows are read
+        process = subprocess.Popen(sql, shell=True, stdout=subprocess.PIPE, stderr=stderr, text=True)
+        for line in process.stdout:
+            [nRows, nBytes] = [nRows + 1, nBytes + len(line)]
+            row = [elem.strip(' ') for elem in line.strip('\n').strip('|').split('|')]
+            if len(row) == 4 and is_integer(row[0]):
+                yield row
+        if process.wait() != 0:   # a partial snapshot would show the rest of the catalog as removed
+            stderr.seek(0)
+            errorMessage = "ERROR: Could not run\n\t"+sql+"\nERROR MESSAGE:\n"+stderr.read()+"\nThe backup catalog listing (-bo, -br) stopped after "+str(nRows)+" rows."
+            log(errorMessage, logman, True)
+            task_failed(errorMessage)
+    instrumentation.record_counts(sql, time.time() - start, nRows, nBytes)
+
+def open_compressed(fileName, mode, compression):   # compression 'gzip' or 'zstd', mode e.g. 'wt' or 'rb'
+    if compression == 'zstd':
+        import zstandard   # only needed for -bz zstd and -tz zstd, checked at input
+        return zstandard.open(fileName, mode)
+    return gzip.open(fileName, mode, compresslevel = 6)   # as gzip on the command line, 9 is much slower for little gain
+
+def open_catalog_file(fileName, mode, catalogCompression):   # mode 'w' or 'r', text
+    return open_compressed(fileName, mode+'t', catalogCompression)
+
+def export_catalog(fileName, catalogCompression, sqlman, logman):   # writes a snapshot of the backup catalog, constant memory, returns the number of entries
+    nEntries = 0
+    try:
+        with open_catalog_file(fileName, 'w', catalogCompression) as f:
+            f.write("ENTRY_ID | ENTRY_TYPE_NAME | BACKUP_ID | SYS_START_TIME\n")
+            for row in catalog_rows(sqlman, logman):
+                f.write(" | ".join(row)+"\n")
+                nEntries += 1
+    except TaskFailure:   # no partial snapshot is left behind for a later comparison
+        os.remove(fileName)
+        raise
+    return nEntries
+
+def read_catalog(fileName, catalogCompression):
+    with open_catalog_file(fileName, 'r', catalogCompression) as f:
+        next(f, None)   # header
+        for line in f:
+            yield line.strip('\n').split(' | ')
+
+def removed_catalog_entries(before, after):   # sorted merge on ENTRY_ID of two catalog snapshots
+    afterRow = next(after, None)
+    for beforeRow in before:
+        while afterRow is not None and int(afterRow[0]) < int(beforeRow[0]):
+            afterRow = next(after, None)
+        if afterRow is None or afterRow[0] != beforeRow[0]:
+            yield beforeRow
+
+def log_catalog(title, rows, logman):   # logs 1000 rows at a time, never the whole catalog at once
+    log(title+"\nENTRY_ID | ENTRY_TYPE_NAME | BACKUP_ID | SYS_START_TIME", logman)
+    chunk = []
+    for row in rows:
+        chunk.append(" | ".join(row))
+        if len(chunk) == 1000:
+            log("\n".join(chunk), logman)
+            chunk = []
+    if chunk:
+        log("\n".join(chunk), logman)
+    log("\n", logman)
+
+@instrumented_task
+def clean_backup_catalog(minRetainedBackups, minRetainedDays, deleteBackups, outputCatalog, outputDeletedCatalog, outputNDeletedLBEntries, catalogCompression, sqlman, logman):  
     nDataBackupCatalogEntriesBefore = int(run_command(sqlman.hdbsql_jAQaxU + " \"SELECT COUNT(*) FROM sys.m_backup_catalog where entry_type_name != 'log backup'\"").strip(' '))
     nLogBackupCatalogEntriesBefore = 0
     if outputNDeletedLBEntries:
         nLogBackupCatalogEntriesBefore = int(run_command(sqlman.hdbsql_jAQaxU + " \"SELECT COUNT(*) FROM sys.m_backup_catalog where entry_type_name = 'log backup'\"").strip(' '))
+    history.observe(nDataBackupCatalogEntriesBefore + nLogBackupCatalogEntriesBefore)
     if nDataBackupCatalogEntriesBefore == 0:
         return [0,0]
     sqls_for_cleanup = sqls_for_backup_catalog_cleanup(minRetainedBackups, minRetainedDays, deleteBackups, sqlman)
     if sqls_for_cleanup:
-        sql_for_catalog = "select ENTRY_ID, ENTRY_TYPE_NAME, BACKUP_ID, SYS_START_TIME from sys.m_backup_catalog"
-        if outputCatalog or outputDeletedCatalog:
-            beforeCatalog = run_command(sqlman.hdbsql_jAxU + " \"" + sql_for_catalog + "\"")
+        if outputCatalog or outputDeletedCatalog:   # the snapshots are kept in the -op directory, otherwise only for this run
+            catalogDirectory = logman.path if logman.path else tempfile.mkdtemp(prefix = "hanacleaner_")
+            beforeFile = catalogDirectory+"/hanacleaner_catalog_before_"+logman.out_prefix+datetime.now().strftime("%Y-%m-%d_%H-%M-%S")+(".txt.zst" if catalogCompression == 'zstd' else ".txt.gz")
+            nBefore = export_catalog(beforeFile, catalogCompression, sqlman, logman)
         if outputCatalog:
-            log("\nBEFORE:\n"+beforeCatalog, logman)
+            if logman.path:
+                log("\nBEFORE: The backup catalog, "+str(nBefore)+" entries, was written to "+beforeFile, logman)
+            else:
+                log_catalog("\nBEFORE:", read_catalog(beforeFile, catalogCompression), logman)
         for sql_for_cleanup in sqls_for_cleanup:
             errorlog = "\nERROR: The user represented by the key "+sqlman.key+" could not clean backup catalog. \nOne possible reason for this is insufficient privilege, \ne.g. lack of the system privilege BACKUP ADMIN.\n"
             errorlog += "If there is another error (i.e. not insufficient privilege) then please try to execute \n"+sql_for_cleanup+"\nin e.g. the SQL editor in SAP HANA Studio. If you get the same error then this has nothing to do with hanacleaner"
@@ -725,11 +1631,20 @@ def clean_backup_catalog(minRetainedBackups, minRetainedDays, deleteBackups, out
         if outputNDeletedLBEntries:
             nLogBackupCatalogEntriesAfter = int(run_command(sqlman.hdbsql_jAQaxU + " \"SELECT COUNT(*) FROM sys.m_backup_catalog where entry_type_name = 'log backup'\"").strip(' '))
         if outputCatalog or outputDeletedCatalog:
-            afterCatalog = run_command(sqlman.hdbsql_jAxU + " \"" + sql_for_catalog + "\"")
+            afterFile = beforeFile.replace("_catalog_before_", "_catalog_after_")
+            nAfter = export_catalog(afterFile, catalogCompression, sqlman, logman)
         if outputCatalog:
-            log("\nAFTER:\n"+afterCatalog, logman)
+            if logman.path:
+                log("\nAFTER: The backup catalog, "+str(nAfter)+" entries, was written to "+afterFile, logman)
+            else:
+                log_catalog("\nAFTER:", read_catalog(afterFile, catalogCompression), logman)
         if outputDeletedCatalog:
-            print_removed_entries(beforeCatalog, afterCatalog, logman)
+            log_catalog("\nREMOVED:", removed_catalog_entries(read_catalog(beforeFile, catalogCompression), read_catalog(afterFile, catalogCompression)), logman)
+        if (outputCatalog or outputDeletedCatalog) and not logman.path:
+            shutil.rmtree(catalogDirectory)
+        elif outputDeletedCatalog and not outputCatalog:   # only -bo asks to keep the snapshots in -op, -br only wants the removed entries
+            os.remove(beforeFile)
+            os.remove(afterFile)
         return [nDataBackupCatalogEntriesBefore - nDataBackupCatalogEntriesAfter, max(nLogBackupCatalogEntriesBefore - nLogBackupCatalogEntriesAfter,0)] #if a logbackup was done during run
     else:
         return [0,0]
@@ -743,8 +1658,10 @@ def clear_traces(trace_list, oldestRetainedTraceContentDate, backupTraceContent,
     errorlog += "If there is another error (i.e. not insufficient privilege) then please try to execute \n"+sql+"\nin e.g. the SQL editor in SAP HANA Studio. If you get the same error then this has nothing to do with hanacleaner"
     try_execute_sql(sql, errorlog, sqlman, logman)    
      
-def clean_trace_files(retainedTraceContentDays, retainedBacklogDays, retainedExpensiveTraceContentDays, backupTraceContent, backupTraceDirectory, timeOutForMove, retainedTraceFilesDays, ignoreTraceFiles, outputTraces, outputRemovedTraces, SID, DATABASE, local_dbinstance, hosts, sqlman, logman):
+@instrumented_task
+def clean_trace_files(retainedTraceContentDays, retainedBacklogDays, retainedExpensiveTraceContentDays, backupTraceContent, backupTraceDirectory, timeOutForMove, retainedTraceFilesDays, ignoreTraceFiles, traceCompression, outputTraces, outputRemovedTraces, SID, DATABASE, local_dbinstance, hosts, sqlman, logman):
     nbrTracesBefore = int(run_command(sqlman.hdbsql_jAQaxU + " \"SELECT COUNT(*) FROM sys.m_tracefiles\"").strip(' '))
+    history.observe(nbrTracesBefore)
     if nbrTracesBefore == 0:
         log("\nIt appears there are no trace files. Is this correct, or is your HANACleaner user missing TRACEADMIN?\n", logman)
         return 0  
@@ -768,7 +1685,7 @@ def clean_trace_files(retainedTraceContentDays, retainedBacklogDays, retainedExp
             if not DATABASE:
                 log("INPUT ERROR: If -tbd is used, either DATABASE must be specified in the key (see the manual of hdbuserstore), or -dbs must be specifed.", logman)
                 log("NOTE: -tbd is not supported for none MDC systems", logman, True)
-                os._exit(1)
+                task_failed()
             if not os.path.exists(backupTraceDirectory):
                 os.makedirs(backupTraceDirectory)
             fileNameEndingsToBeMoved = ['_'+timeStamp+'.gz' for timeStamp in timeStampsForClearTraces]
@@ -788,14 +1705,10 @@ def clean_trace_files(retainedTraceContentDays, retainedBacklogDays, retainedExp
                 filesToBeMoved = run_command(sqlman.hdbsql_jAQaxU + " \"" + sql + "\"").splitlines(1)
                 filesToBeMoved = [file.strip('\n').strip(' ') for file in filesToBeMoved]
                 filesToBeMoved = [file for file in filesToBeMoved if file]
-                for host in hosts:
-                    path = cdalias('cdhdb', local_dbinstance)+"/"+host 
-                    for filename in filesToBeMoved:
-                        fullFileName = run_command("find "+path+" -name "+filename).strip('\n').strip(' ')
-                        if fullFileName and ((DATABASE == 'SYSTEMDB' and 'DB_' in fullFileName) or (DATABASE != 'SYSTEMDB' and not 'DB_'+DATABASE in fullFileName)):
-                            fullFileName = ''
-                        if fullFileName:
-                            dummyout = run_command("mv "+fullFileName+" "+backupTraceDirectory+"/")
+                if agents.enabled():   # each host moves the files from its own trace directory
+                    agents.everywhere("move_archived_traces", lambda host: [filesToBeMoved, backupTraceDirectory, DATABASE, local_dbinstance, [host]], lambda: hosts, sqlman, logman)
+                else:
+                    move_archived_traces(filesToBeMoved, backupTraceDirectory, DATABASE, local_dbinstance, hosts, sqlman, logman)
                 if outputRemovedTraces and filesToBeMoved:
                     log("\nARCHIVED ("+str(len(filesToBeMoved))+"):", logman)
                     for filename in filesToBeMoved:
@@ -814,11 +1727,19 @@ def clean_trace_files(retainedTraceContentDays, retainedBacklogDays, retainedExp
         filesToBeRemoved = [file for file in filesToBeRemoved if not any(fnmatch.fnmatch(file, x) for x in ignoreTraceFiles)]
         # Make sure we only delete files with known extensions (we dont delete .sem or .status files). Added two files without extensions that we want to delete. To delete files like dev_icm_sec one have to run HANACleaner as dev_icm_sec from SYSTEMDB, otherwise they are not in m_tracefiles
         filesToBeRemoved = [file for file in filesToBeRemoved if any(x in file for x in [".trc", ".log", ".stat", ".py", ".tpt", ".gz", ".zip", ".old", ".xml", ".txt", ".docs", ".cfg", ".dmp", ".cockpit", ".xs", "dev_icm_sec", "wdisp_icm_log", ".output"])] 
+        if filesToBeRemoved and traceCompression:   # -tz: a file is only removed from the hosts where it was compressed into -tbd and verified
+            archived = dict((host, set(files or [])) for host, files in agents.results("archive_trace_files", lambda host: [filesToBeRemoved, backupTraceDirectory, traceCompression, DATABASE, local_dbinstance], lambda: hosts, sqlman, logman))
+            notArchived = [host for host in hosts if not host in archived]
+            if notArchived:
+                log("The trace files on "+", ".join(notArchived)+" were not removed, since they could only be compressed into -tbd by a host agent there (-ha)", logman)
         if filesToBeRemoved:  # otherwise no file to remove
             filesToBeRemoved = [filesToBeRemoved[i:i + 100] for i in range(0, len(filesToBeRemoved), 100)]  #make sure we do not send too long statement, it could cause an error
             for files in filesToBeRemoved:
-                filesToBeRemovedString = "'"+"', '".join(files)+"'"
                 for host in hosts:
+                    hostFiles = [file for file in files if file in archived.get(host, set())] if traceCompression else files
+                    if not hostFiles:
+                        continue
+                    filesToBeRemovedString = "'"+"', '".join(hostFiles)+"'"
                     sql = "ALTER SYSTEM REMOVE TRACES (" +"'"+host+"', "+filesToBeRemovedString+ ")"
                     errorlog = "\nERROR: The user represented by the key "+sqlman.key+" could not remove traces. \nOne possible reason for this is insufficient privilege, \ne.g. lack of the system privilege TRACE ADMIN.\n"
                     errorlog += "If there is another error (i.e. not insufficient privilege) then please try to execute \n"+sql+"\nin e.g. the SQL editor in SAP HANA Studio. If you get the same error then this has nothing to do with hanacleaner"
@@ -833,34 +1754,101 @@ def clean_trace_files(retainedTraceContentDays, retainedBacklogDays, retainedExp
         output_removed_trace_files(beforeTraceFiles, afterTraceFiles, logman)
     return nbrRemovedTraceFiles
 
+def move_archived_traces(filesToBeMoved, backupTraceDirectory, DATABASE, local_dbinstance, hosts, sqlman, logman):   # to -tbd, also run by the host agents (-ha)
+    if not os.path.exists(backupTraceDirectory):
+        os.makedirs(backupTraceDirectory)
+    nMoved = 0
+    for host in hosts:
+        path = cdalias('cdhdb', local_dbinstance)+"/"+host 
+        for filename in filesToBeMoved:
+            fullFileName = run_command("find "+shlex.quote(path)+" -name "+shlex.quote(filename)).strip('\n').strip(' ')
+            if fullFileName and ((DATABASE == 'SYSTEMDB' and 'DB_' in fullFileName) or (DATABASE != 'SYSTEMDB' and not 'DB_'+DATABASE in fullFileName)):
+                fullFileName = ''
+            if fullFileName:
+                dummyout = run_command("mv "+shlex.quote(fullFileName)+" "+shlex.quote(backupTraceDirectory+"/"))
+                nMoved += 1
+    return nMoved
+
+def compress_trace_file(source, target, traceCompression):   # in a process of archive_trace_files, streams source into target and checks that it decompresses to the same SHA-256, returns [checksum, error]
+    chunkSize = 1024*1024
+    checksum = hashlib.sha256()
+    verified = hashlib.sha256()
+    try:
+        with open(source, 'rb') as fin, open_compressed(target+".tmp", 'wb', traceCompression) as fout:
+            for chunk in iter(lambda: fin.read(chunkSize), b""):
+                checksum.update(chunk)
+                fout.write(chunk)
+        with open_compressed(target+".tmp", 'rb', traceCompression) as fin:
+            for chunk in iter(lambda: fin.read(chunkSize), b""):
+                verified.update(chunk)
+        if verified.hexdigest() != checksum.hexdigest():
+            os.remove(target+".tmp")
+            return [checksum.hexdigest(), "it does not decompress to the same SHA-256"]
+        os.rename(target+".tmp", target)
+        return [checksum.hexdigest(), ""]
+    except Exception as e:
+        if os.path.exists(target+".tmp"):
+            os.remove(target+".tmp")
+        return ["", str(e)]
+
+def archive_trace_files(files, backupTraceDirectory, traceCompression, DATABASE, local_dbinstance, sqlman, logman):   # -tz: the files of this host into -tbd, one process per core, returns the files that were compressed and verified, also run by the host agents (-ha)
+    path = (cdalias('cdtrace', local_dbinstance)).replace("\n","").replace("'", "") #RHEL put in line endings and strange '
+    if DATABASE and not DATABASE == 'SYSTEMDB':
+        path += '/DB_'+DATABASE
+    sources = [file for file in files if os.path.isfile(os.path.join(path, file))]
+    if not sources or not sqlman.execute:
+        return sources
+    if not os.path.exists(backupTraceDirectory):
+        os.makedirs(backupTraceDirectory)
+    extension = ".zst" if traceCompression == 'zstd' else ".gz"
+    targets = [os.path.join(backupTraceDirectory, file.replace('/', '_')+extension) for file in sources]
+    targets = [target[:-len(extension)]+"_"+datetime.now().strftime("%Y-%m-%d_%H-%M-%S")+extension if os.path.exists(target) else target for target in targets]   # e.g. the same file name on another host
+    start = time.time()
+    nProcesses = min(os.cpu_count() or 1, len(sources))
+    with ProcessPoolExecutor(max_workers = nProcesses, mp_context = multiprocessing.get_context("spawn")) as executor:   # no fork of a process with threads
+        results = list(executor.map(compress_trace_file, [os.path.join(path, file) for file in sources], targets, [traceCompression]*len(sources)))
+    instrumentation.record_counts("compress "+str(len(sources))+" trace files into "+backupTraceDirectory, time.time() - start, len(sources), sum(os.path.getsize(target) for target, [checksum, error] in zip(targets, results) if not error))
+    archived = []
+    for file, target, [checksum, error] in zip(sources, targets, results):
+        if error:
+            log("WARNING: The trace file "+file+" could not be compressed into "+target+" (-tz), so it is not removed: "+error, logman)
+        else:
+            archived.append(file)
+            if sqlman.log:
+                log("sha256 "+checksum+"  "+file+" --> "+target, logman)
+    log(str(len(archived))+" trace files were compressed into "+backupTraceDirectory+" with "+traceCompression+" by "+str(nProcesses)+" processes in "+str(round(time.time() - start, 1))+" seconds (-tz)", logman)
+    return archived
+
+@instrumented_task
 def clean_dumps(retainedDumpDays, local_dbinstance, sqlman, logman):
     path = (cdalias('cdglo', local_dbinstance)+"/sapcontrol/snapshots/").replace("\n","").replace("'", "") #RHEL put in line endings and strange '
     if ' ' in path:
         print("ERROR: The path should not contain a empty space! path = \n", path)
-        os._exit(1)
-    nbrDumpsBefore = int(run_command("ls "+path+"fullsysteminfodump* | wc -l", True).strip(' ')) #this might be a problem ... from https://docs.python.org/3/library/subprocess.html#subprocess.getoutput : 
+        task_failed()
+    nbrDumpsBefore = int(run_command("ls "+shlex.quote(path)+"fullsysteminfodump* | wc -l", True).strip(' ')) #this might be a problem ... from https://docs.python.org/3/library/subprocess.html#subprocess.getoutput : 
     #The stdout and stderr arguments may not be supplied at the same time as capture_output. If you wish to capture and combine both streams into one, use stdout=PIPE and stderr=STDOUT instead of capture_output.
     if not nbrDumpsBefore:
         return 0
     if sqlman.log:
-        log("find "+path+"fullsysteminfodump* -mtime +"+retainedDumpDays+" -delete", logman)
+        log("find "+shlex.quote(path)+"fullsysteminfodump* -mtime +"+str(int(retainedDumpDays))+" -delete", logman)
     if sqlman.execute:
-        dummyout = run_command("find "+path+"fullsysteminfodump* -mtime +"+retainedDumpDays+" -delete")
-    nbrDumpsAfter = int(run_command("ls "+path+"fullsysteminfodump* | wc -l").strip(' ')) 
+        dummyout = run_command("find "+shlex.quote(path)+"fullsysteminfodump* -mtime +"+str(int(retainedDumpDays))+" -delete")
+    nbrDumpsAfter = int(run_command("ls "+shlex.quote(path)+"fullsysteminfodump* | wc -l").strip(' ')) 
     return nbrDumpsBefore - nbrDumpsAfter
            
+@instrumented_task
 def clean_hdbcons(retainedHDBCONSDays, local_dbinstance, DATABASE, sqlman, logman):
     path = (cdalias('cdtrace', local_dbinstance)).replace("\n","").replace("'", "") #RHEL put in line endings and strange '
     if ' ' in path:
         print("ERROR: The path should not contain a empty space! path = \n", path)
-        os._exit(1)
+        task_failed()
     if not DATABASE:
         log("INPUT ERROR: If -hr is used, either DATABASE must be specified in the key (see the manual of hdbuserstore), or -dbs must be specifed.", logman)
         log("NOTE: -hr is not supported for none MDC systems", logman, True)
-        os._exit(1)
+        task_failed()
     if not DATABASE == 'SYSTEMDB':
         path += '/DB_'+DATABASE
-    hdbconsfiles = run_command("ls "+path+"/*hdbcons.trc").splitlines(1)
+    hdbconsfiles = run_command("ls "+shlex.quote(path)+"/*hdbcons.trc").splitlines(1)
     oldestDayForKeepingLine = str(datetime.now() + timedelta(days = -int(retainedHDBCONSDays))).split(' ')[0].replace('-', '')
     nRowsCleaned = 0
     for hdbconsfile in hdbconsfiles:   # from Pike's rules, there is no reason to read in chunks of the file: http://users.ece.utexas.edu/~adnan/pike.html
@@ -930,12 +1918,14 @@ def output_removed_trace_files(before, after, logman):
                 log(beforeFile, logman)
         log("\n", logman)
 
+@instrumented_task
 def clean_alerts(minRetainedAlertDays, outputAlerts, outputDeletedAlerts, sqlman, logman):
     try:
         nbrAlertsBefore = int(run_command(sqlman.hdbsql_jAQaxU + " \"SELECT COUNT(*) FROM _sys_statistics.statistics_alerts_base\"").strip(' '))
     except: 
         log("\nERROR: The user represented by the key "+sqlman.key+" could not find amount of alerts. \nOne possible reason for this is insufficient privilege, \ne.g. lack of the object privilege SELECT on the table _sys_statistics.statistics_alerts_base.\n", logman, True)
-        os._exit(1)
+        task_failed()
+    history.observe(nbrAlertsBefore)
     if nbrAlertsBefore > 10000 and (outputAlerts or outputDeletedAlerts):
         outputAlerts = False
         outputDeletedAlerts = False
@@ -957,20 +1947,21 @@ def clean_alerts(minRetainedAlertDays, outputAlerts, outputDeletedAlerts, sqlman
         print_removed_entries(beforeAlerts, afterAlerts, logman)
     return nbrAlertsBefore - nbrAlertsAfter
     
+@instrumented_task
 def clean_ini(minRetainedIniDays, version, revision, mrevision, sqlman, logman):
     if version < 2 or revision < 30:
         log("\nERROR: the -ir flag is only supported starting with SAP HANA 2.0 SPS03. You run on SAP HANA "+str(version)+" revision "+str(revision)+" maintenance revision "+str(mrevision), logman, True)
-        os._exit(1)
+        task_failed()
     if version > 4:
         log("\nERROR: the -ir flag is not supported any more with SAP HANA 2.0 SPS05. You run on SAP HANA "+str(version)+" revision "+str(revision)+" maintenance revision "+str(mrevision), logman, True)
         # compare https://help.sap.com/viewer/4fe29514fd584807ac9f2a04f6754767/2.0.05/en-US/fb097f2620c645d18064ce6b93c24a1e.html
         # with https://help.sap.com/viewer/4fe29514fd584807ac9f2a04f6754767/2.0.04/en-US/fb097f2620c645d18064ce6b93c24a1e.html 
-        os._exit(1)
+        task_failed()
     try:
         nbrIniHistBefore = int(run_command(sqlman.hdbsql_jAQaxU + " \"SELECT COUNT(*) FROM SYS.M_INIFILE_CONTENT_HISTORY\"").strip(' '))
     except: 
         log("\nERROR: The user represented by the key "+sqlman.key+" could not find amount of inifile history. \nOne possible reason for this is insufficient privilege, \ne.g. lack of the object privilege SELECT on the view SYS.M_INIFILE_CONTENT_HISTORY.\n", logman, True)
-        os._exit(1)
+        task_failed()
     d = datetime.today() - timedelta(days=minRetainedIniDays)
     sql = "ALTER SYSTEM CLEAR INIFILE CONTENT HISTORY UNTIL '"+str(d)+"'"
     errorlog = "\nERROR: The user represented by the key "+sqlman.key+" could not delete inifile history. \nOne possible reason for this is insufficient privilege.\n"
@@ -979,6 +1970,7 @@ def clean_ini(minRetainedIniDays, version, revision, mrevision, sqlman, logman):
     nbrIniHistAfter = int(run_command(sqlman.hdbsql_jAQaxU + " \"SELECT COUNT(*) FROM SYS.M_INIFILE_CONTENT_HISTORY\"").strip(' '))
     return nbrIniHistBefore - nbrIniHistAfter
 
+@instrumented_task
 def clean_objlock(minRetainedObjLockDays, sqlman, logman):
     try:
         sql = "select count(*) FROM _SYS_STATISTICS.HOST_OBJECT_LOCK_STATISTICS_BASE WHERE OBJECT_NAME = '(unknown)'"
@@ -994,12 +1986,13 @@ def clean_objlock(minRetainedObjLockDays, sqlman, logman):
     nbrObjLockAfter = int(run_command(sqlman.hdbsql_jAQaxU + " \"select count(*) FROM _SYS_STATISTICS.HOST_OBJECT_LOCK_STATISTICS_BASE WHERE OBJECT_NAME = '(unknown)'\"").strip(' '))
     return nbrObjLockBefore - nbrObjLockAfter
 
+@instrumented_task
 def clean_objhist(objHistMaxSize, outputObjHist, sqlman, logman):
     try:
         objHistSizeBefore = int(run_command(sqlman.hdbsql_jAQaxU + " \"select disk_size from SYS.M_TABLE_PERSISTENCE_LOCATION_STATISTICS where table_name = 'OBJECT_HISTORY'\"").strip(' '))
     except: 
         log("\nERROR: The user represented by the key "+sqlman.key+" could not find size of object history. \nOne possible reason for this is insufficient privilege, \ne.g. lack of the object privilege SELECT on the table SYS.M_TABLE_PERSISTENCE_LOCATION_STATISTICS.\n", logman, True)
-        os._exit(1)  
+        task_failed()  
     if objHistSizeBefore > objHistMaxSize*1000000:   #mb --> b 
         sql = "DELETE FROM _SYS_REPO.OBJECT_HISTORY WHERE (package_id, object_name, object_suffix, version_id) NOT IN (SELECT package_id, object_name, object_suffix, MAX(version_id) AS maxvid from _SYS_REPO.OBJECT_HISTORY GROUP BY package_id, object_name, object_suffix ORDER BY package_id, object_name, object_suffix)"
         errorlog = "\nERROR: The user represented by the key "+sqlman.key+" could not clean the object history. \nOne possible reason for this is insufficient privilege, \ne.g. lack of the object privilege DELETE on the table _SYS_REPO.OBJECT_HISTORY.\n"
@@ -1046,8 +2039,28 @@ def getNbrRows(schema, table, sqlman):
 def getAdapterName(schema, table, sqlman):
     return run_command(sqlman.hdbsql_jAQaxU + " \"SELECT R.ADAPTER_NAME FROM SYS.REMOTE_SOURCES R JOIN SYS.VIRTUAL_TABLES V ON R.REMOTE_SOURCE_NAME = V.REMOTE_SOURCE_NAME WHERE V.SCHEMA_NAME = '"+schema+"' and TABLE_NAME = '"+table+"'\"").strip(' ')
 
-def getTableType(schema, table, sqlman):
-    return run_command(sqlman.hdbsql_jAQaxU + " \"SELECT TABLE_TYPE from SYS.TABLES where SCHEMA_NAME = '"+schema+"' and TABLE_NAME = '"+table+"'\"").strip(' ')
+def run_parallel(items, worker, nParallel, may_start = None):   # runs worker(item) for all items, at most nParallel at the same time, no new item is started if may_start() returns False
+    executor = ThreadPoolExecutor(max_workers = nParallel)
+    started = []
+    running = set()
+    for item in items:
+        if len(running) >= nParallel:   # wait for a free slot
+            running = wait(running, return_when = FIRST_COMPLETED)[1]
+        if may_start and not may_start():
+            break
+        future = executor.submit(instrumentation.bind(worker), item)
+        running.add(future)
+        started.append([item, future])
+    wait(running)
+    executor.shutdown()
+    return [[item, future.result()] for item, future in started]   # in the order they were started
+
+def next_clock_time(clock):   # e.g. '05:30' --> the next time it will be 05:30
+    now = datetime.now()
+    nextTime = now.replace(hour = int(clock.split(':')[0]), minute = int(clock.split(':')[1]), second = 0, microsecond = 0)
+    if nextTime <= now:
+        nextTime += timedelta(days = 1)
+    return nextTime
 
 def cdalias(alias, local_dbinstance):   # alias e.g. cdtrace, cdhdb, ...
     su_cmd = ''
@@ -1067,29 +2080,39 @@ def cdalias(alias, local_dbinstance):   # alias e.g. cdtrace, cdhdb, ...
     path = path.replace("[0-9][0-9]", local_dbinstance) # if /bin/bash shows strange HDB[0-9][0-9] we force correct instance on it
     return path
 
+def free_logsegments_per_service(sqlman, logman):   # [host, port, number of free log segments, size of free log segments [B]] per service, with one GROUP BY instead of one COUNT per port
+    freeLogsegments = run_command(sqlman.hdbsql_jAaxU + " \"SELECT HOST, PORT, SUM(CASE WHEN STATE = 'Free' THEN 1 ELSE 0 END), SUM(CASE WHEN STATE = 'Free' THEN TOTAL_SIZE ELSE 0 END) FROM SYS.M_LOG_SEGMENTS GROUP BY HOST, PORT\"").splitlines(1)
+    freeLogsegments = [service.strip('\n').strip('|').split('|') for service in freeLogsegments]
+    freeLogsegments = [[elem.strip(' ') for elem in service] for service in freeLogsegments]
+    return [service[0:2]+[int(service[2]), int(service[3])] for service in freeLogsegments if len(service) == 4 and is_integer(service[2]) and is_integer(service[3])]
+
+@instrumented_task
 def reclaim_logsegments(maxFreeLogsegments, sqlman, logman):
-    nTotFreeLogsegmentsBefore = int(run_command(sqlman.hdbsql_jAQaxU + " \"SELECT COUNT(*) FROM SYS.M_LOG_SEGMENTS WHERE STATE = 'Free'\"").strip(' ')) #this might be a problem ... from https://docs.python.org/3/library/subprocess.html#subprocess.getoutput : 
-    #The stdout and stderr arguments may not be supplied at the same time as capture_output. If you wish to capture and combine both streams into one, use stdout=PIPE and stderr=STDOUT instead of capture_output.
-    if nTotFreeLogsegmentsBefore == 0:
-        return 0 
-    listOfPorts = run_command(sqlman.hdbsql_jAaxU + " \"SELECT DISTINCT PORT FROM SYS.M_LOG_SEGMENTS\"").splitlines(1)
-    listOfPorts = [port.strip('\n').strip('|').strip(' ') for port in listOfPorts]
-    nFreeLogsegmentsPerServices = []
-    for port in listOfPorts:
-        nFreeLogs = int(run_command(sqlman.hdbsql_jAQaxU + " \"SELECT COUNT(*) FROM SYS.M_LOG_SEGMENTS WHERE STATE = 'Free' AND PORT = '"+port+"'\"").strip(' '))
-        nFreeLogsegmentsPerServices.append(nFreeLogs)
-    if max(nFreeLogsegmentsPerServices) > maxFreeLogsegments:
-        sql = "ALTER SYSTEM RECLAIM LOG"
-        errorlog = "\nERROR: The user represented by the key "+sqlman.key+" could not reclaim logs. \nOne possible reason for this is insufficient privilege, \ne.g. lack of the privilege LOG ADMIN.\n"
-        errorlog += "If there is another error (i.e. not insufficient privilege) then please try to execute \n"+sql+"\nin e.g. the SQL editor in SAP HANA Studio. If you get the same error then this has nothing to do with hanacleaner"
-        try_execute_sql(sql, errorlog, sqlman, logman)     
-    nTotFreeLogsegmentsAfter = int(run_command(sqlman.hdbsql_jAQaxU + " \"SELECT COUNT(*) FROM SYS.M_LOG_SEGMENTS WHERE STATE = 'Free'\"").strip(' '))
-    return nTotFreeLogsegmentsBefore - nTotFreeLogsegmentsAfter
+    freeLogsegmentsBefore = free_logsegments_per_service(sqlman, logman)
+    servicesToReclaim = [service for service in freeLogsegmentsBefore if service[2] > maxFreeLogsegments]
+    if not servicesToReclaim:
+        return 0
+    for service in servicesToReclaim:
+        log("Host "+service[0]+" and Port "+service[1]+" has "+str(service[2])+" free log segments ("+str(service[3])+" B), more than "+str(maxFreeLogsegments)+" (-lr)", logman)
+    sql = "ALTER SYSTEM RECLAIM LOG"
+    errorlog = "\nERROR: The user represented by the key "+sqlman.key+" could not reclaim logs. \nOne possible reason for this is insufficient privilege, \ne.g. lack of the privilege LOG ADMIN.\n"
+    errorlog += "If there is another error (i.e. not insufficient privilege) then please try to execute \n"+sql+"\nin e.g. the SQL editor in SAP HANA Studio. If you get the same error then this has nothing to do with hanacleaner"
+    try_execute_sql(sql, errorlog, sqlman, logman)     
+    freeLogsegmentsAfter = dict([((service[0], service[1]), service) for service in free_logsegments_per_service(sqlman, logman)])
+    nReclaimed = 0
+    for service in freeLogsegmentsBefore:   # the log volume of every service is reclaimed by ALTER SYSTEM RECLAIM LOG, not only of those above -lr
+        after = freeLogsegmentsAfter.get((service[0], service[1]), service)
+        if service[2] > after[2]:
+            log("For Host "+service[0]+" and Port "+service[1]+" "+str(service[2] - after[2])+" log segments were reclaimed, "+str(service[3] - after[3])+" B were freed", logman)
+        nReclaimed += service[2] - after[2]
+    return nReclaimed
     
     
+@instrumented_task
 def clean_events(minRetainedDaysForHandledEvents, minRetainedDaysForEvents, sqlman, logman):                                                #ignoring INFO events, due to bug in HANA (fixed be rev. ???)
     nHandledEventsBefore = int(run_command(sqlman.hdbsql_jAQaxU + " \"SELECT COUNT(*) FROM SYS.M_EVENTS WHERE STATE = 'HANDLED' and TYPE != 'INFO'\"").strip(' '))
     nEventsBefore = int(run_command(sqlman.hdbsql_jAQaxU + " \"SELECT COUNT(*) FROM SYS.M_EVENTS \"").strip(' '))
+    history.observe(nEventsBefore)
     if nEventsBefore == 0:
         return [0,0,0,0]    
     oldestDayForKeepingHandledEvent = datetime.now() + timedelta(days = -int(minRetainedDaysForHandledEvents))
@@ -1129,6 +2152,7 @@ def clean_events(minRetainedDaysForHandledEvents, minRetainedDaysForEvents, sqlm
     return [nHandledEventsBefore - nHandledEventsAfter, nEventsBefore - nEventsAfter, nEventsAfter, nHandledEventsAfter]
 
 
+@instrumented_task
 def clean_audit_logs(retainedAuditLogDays, sqlman, logman):  # for this, both Audit Admin and Audit Operator is needed
     nbrLogsBefore = int(run_command(sqlman.hdbsql_jAQaxU + " \"SELECT COUNT(*) FROM sys.audit_log\"").strip(' '))
     if nbrLogsBefore == 0:
@@ -1142,12 +2166,13 @@ def clean_audit_logs(retainedAuditLogDays, sqlman, logman):  # for this, both Au
     return nbrLogsBefore - nbrLogsAfter    
         
 
+@instrumented_task
 def clean_pending_emails(pendingEmailsDays, sqlman, logman):
     try:
         nbrEmailsBefore = int(run_command(sqlman.hdbsql_jAQaxU + " \"SELECT COUNT(*) FROM _SYS_STATISTICS.STATISTICS_EMAIL_PROCESSING\"").strip(' '))
     except:
         log("\nERROR: Something went wrong. Probably the hanacleaner user is missing SELECT on _SYS_STATISTICS.STATISTICS_EMAIL_PROCESSING.", logman, True)
-        os._exit(1)
+        task_failed()
     if nbrEmailsBefore == 0:
         return 0
     sql = "DELETE FROM _SYS_STATISTICS.STATISTICS_EMAIL_PROCESSING WHERE SECONDS_BETWEEN(SNAPSHOT_ID, CURRENT_TIMESTAMP) > "+pendingEmailsDays+" * 86400"
@@ -1158,34 +2183,34 @@ def clean_pending_emails(pendingEmailsDays, sqlman, logman):
     return nbrEmailsBefore - nbrEmailsAfter    
           
 
-def defragment(fragmentationLimit, outputFragmentation, sqlman, logman):
-    fragPerPortBefore = run_command(sqlman.hdbsql_jAaxU + " \"SELECT HOST, PORT, USED_SIZE, TOTAL_SIZE from SYS.M_VOLUME_FILES WHERE FILE_TYPE = 'DATA'\" ").splitlines(1)
-    fragPerPortBefore = [port.strip('\n').strip('|').split('|') for port in fragPerPortBefore]    
-    fragPerPortBefore = [[elem.strip(' ') for elem in port] for port in fragPerPortBefore]    
-    fragPerPortBefore = [port+[round(((float(port[3])-float(port[2]))/float(port[3])),2)*100] for port in fragPerPortBefore]  
+def volume_fragmentation(sqlman, logman):   # [host, port, used size, total size, fragmentation, storage path] per data volume
+    fragPerPort = run_command(sqlman.hdbsql_jAaxU + " \"SELECT HOST, PORT, USED_SIZE, TOTAL_SIZE, FILE_NAME from SYS.M_VOLUME_FILES WHERE FILE_TYPE = 'DATA'\" ").splitlines(1)
+    fragPerPort = [port.strip('\n').strip('|').split('|') for port in fragPerPort]    
+    fragPerPort = [[elem.strip(' ') for elem in port] for port in fragPerPort]    
+    return [port[0:4]+[round(((float(port[3])-float(port[2]))/float(port[3])),2)*100, os.path.dirname(os.path.dirname(port[4]))] for port in fragPerPort if len(port) == 5]  # e.g. /hana/data/<SID>/mnt00001/hdb00003.00003/datavolume_0000.dat --> /hana/data/<SID>/mnt00001
+
+@instrumented_task
+def defragment(fragmentationLimit, outputFragmentation, defragParallel, defragBudget, sqlman, logman):
+    fragPerPortBefore = volume_fragmentation(sqlman, logman)
     if outputFragmentation:
         log("\nBEFORE FRAGMENTATION:", logman)
         log("Host                Port                Used Space [B]                Total Space [B]               Fragmentation [%]", logman)
         for port in fragPerPortBefore:
             log(port[0]+" "*(20-len(port[0]))+port[1]+" "*(20-len(port[1]))+port[2]+" "*(30-len(port[2]))+port[3]+" "*(30-len(port[3]))+str(port[4]), logman)
         log("\n", logman)
-    for port in fragPerPortBefore:
-        if port[4] > fragmentationLimit:
-            sql = "ALTER SYSTEM RECLAIM DATAVOLUME '"+port[0]+":"+port[1]+"' 120 DEFRAGMENT"
-            errorlog = "\nERROR: The user represented by the key "+sqlman.key+" could not defragment the data volumes. \nOne possible reason for this is insufficient privilege, \ne.g. lack of the privilege RESOURCE ADMIN.\n"
-            errorlog += "If there is another error (i.e. not insufficient privilege) then please try to execute \n"+sql+"\nin e.g. the SQL editor in SAP HANA Studio. If you get the same error then this has nothing to do with hanacleaner"
-            errorlog += "Note: If you use System Replication see Q19 in SAP Note 1999880"
-            try_execute_sql(sql, errorlog, sqlman, logman)             
-    fragPerPortAfter = run_command(sqlman.hdbsql_jAaxU + " \"SELECT HOST, PORT, USED_SIZE, TOTAL_SIZE from SYS.M_VOLUME_FILES WHERE FILE_TYPE = 'DATA'\" ").splitlines(1)
-    fragPerPortAfter = [port.strip('\n').strip('|').split('|') for port in fragPerPortAfter]    
-    fragPerPortAfter = [[elem.strip(' ') for elem in port] for port in fragPerPortAfter]    
-    fragPerPortAfter = [port+[round(((float(port[3])-float(port[2]))/float(port[3])),2)*100] for port in fragPerPortAfter]        
+    portsToDefrag = [port for port in fragPerPortBefore if port[4] > fragmentationLimit]
+    portsToDefrag.sort(key = lambda port: port[4], reverse = True)   # the most fragmented first, in case the time budget (-ft) runs out
+    defragDeadline = None
+    if defragBudget >= 0:
+        defragDeadline = datetime.now() + timedelta(minutes = defragBudget)
+    defragmented = schedule_reclaims(portsToDefrag, defragParallel, defragDeadline, outputFragmentation, sqlman, logman)
+    if len(defragmented) < len(portsToDefrag):
+        log("WARNING: The defragmentation time budget (-ft) of "+str(defragBudget)+" minutes was used up, so "+str(len(portsToDefrag) - len(defragmented))+" of "+str(len(portsToDefrag))+" data volumes were not defragmented.", logman)
+    fragPerPortAfter = volume_fragmentation(sqlman, logman)
+    fragAfter = dict([((port[0], port[1]), port[4]) for port in fragPerPortAfter])
     fragChange = []
-    for i in range(len(fragPerPortBefore)):
-        if fragPerPortBefore[i][4] > fragPerPortAfter[i][4]:
-            fragChange.append([fragPerPortBefore[i][0], fragPerPortBefore[i][1], fragPerPortBefore[i][4] - fragPerPortAfter[i][4]])
-        elif fragPerPortBefore[i][4] > fragmentationLimit:
-            fragChange.append([fragPerPortBefore[i][0], fragPerPortBefore[i][1], 0])
+    for port in defragmented:   # the fragmentation gained per data volume
+        fragChange.append([port[0], port[1], max(port[4] - fragAfter.get((port[0], port[1]), port[4]), 0)])
     if outputFragmentation and fragChange:
         log("\nAFTER FRAGMENTATION:", logman)
         log("Host                Port                Used Space [B]                Total Space [B]               Fragmentation [%]", logman)
@@ -1193,56 +2218,124 @@ def defragment(fragmentationLimit, outputFragmentation, sqlman, logman):
             log(port[0]+" "*(20-len(port[0]))+port[1]+" "*(20-len(port[1]))+port[2]+" "*(30-len(port[2]))+port[3]+" "*(30-len(port[3]))+str(port[4]), logman)
         log("\n", logman)    
     return fragChange
-    
-def lob_reorg_frag(lobFragMax, lobFragPacked, lobPrint, lobSchemasSQL, sqlman, logman): #M0372: lobFragMax: max frag pct allowed, if the lob column's fragmentation is relatively larger the reorg will be done,
-    sql_packed = ""  # also include packed
-    if not lobFragPacked:   # dont include packed (default)
-        sql_packed = " and LOB_STORAGE_TYPE != 'PACKED'"
-    sql_select_lobs = "select SCHEMA_NAME, TABLE_NAME, COLUMN_NAME, LOB_STORAGE_TYPE, FRAG_PCT from (select SCHEMA_NAME, TABLE_NAME, COLUMN_NAME, LOB_STORAGE_TYPE, TO_DECIMAL((PHYS_SIZE_MB-BIN_SIZE_MB)/PHYS_SIZE_MB*100, 3, 3) FRAG_PCT from (select SCHEMA_NAME, TABLE_NAME, COLUMN_NAME, LOB_STORAGE_TYPE, DISK_SIZE/1024/1024 PHYS_SIZE_MB, BINARY_SIZE/1024/1024 BIN_SIZE_MB from SYS.M_TABLE_LOB_STATISTICS where DISK_SIZE > 0 "+sql_packed+" "+lobSchemasSQL+")) where FRAG_PCT > "+lobFragMax
-    criteria_description = "LOB Columns With Too High Fragmentation"
-    print_header = ["Schema", "Table", "Column", "Lob_Storage_Type", "Fragmentation [%]"]
-    return lob_reorg(sql_select_lobs, criteria_description, lobPrint, print_header, sqlman, logman)
-
-def lob_reorg_small(lobFragSmall, lobPrint, lobSchemasSQL, sqlman, logman): #M0373: lobFragSmall: lob columns with too many small (binary size less than 4 kb) file lobs (M0373: 10 millions)
-    sql_select_lobs = "select SCHEMA_NAME, TABLE_NAME, COLUMN_NAME, LOB_STORAGE_TYPE, BINARY_SIZE/1024 BIN_SIZE_KB, LOB_COUNT from SYS.M_TABLE_LOB_STATISTICS where LOB_STORAGE_TYPE = 'FILE' and BINARY_SIZE/1024 < 4 and LOB_COUNT > "+lobFragSmall+"000000"+lobSchemasSQL 
-    criteria_description = "LOB Columns With Too Many Small File LOBs"
-    print_header = ["Schema", "Table", "Column", "Lob_Storage_Type", "Binary Size [KB]", "Number of LOBs"]
-    return lob_reorg(sql_select_lobs, criteria_description, lobPrint, print_header, sqlman, logman)
-
-def lob_reorg_num(lobFragNum, lobPrint, lobSchemasSQL, sqlman, logman): #M0374: lobFragNum: too many lobs (M0374: 50 millions)
-    sql_select_lobs = "select SCHEMA_NAME, TABLE_NAME, COLUMN_NAME, LOB_STORAGE_TYPE, LOB_COUNT from SYS.M_TABLE_LOB_STATISTICS where LOB_COUNT > "+lobFragNum+"000000"+lobSchemasSQL
-    criteria_description = "LOB Columns With Too Many File LOBs"
-    print_header = ["Schema", "Table", "Column", "Lob_Storage_Type", "Number of LOBs"]
-    return lob_reorg(sql_select_lobs, criteria_description, lobPrint, print_header, sqlman, logman)
-
-def lob_reorg(sql_select_lobs, criteria_description, lobPrint, print_header, sqlman, logman): 
+
+def schedule_reclaims(portsToDefrag, defragParallel, defragDeadline, outputFragmentation, sqlman, logman):   # at most defragParallel reclaims at the same time, but never two on the same host or on the same storage path
+    executor = ThreadPoolExecutor(max_workers = defragParallel)
+    pending = list(portsToDefrag)
+    running = {}   # future --> port
+    started = []
+    while pending or running:
+        if defragDeadline and datetime.now() >= defragDeadline:
+            pending = []   # no new reclaims, the running ones are allowed to finish
+        busy = [running[future][0] for future in running] + [running[future][5] for future in running]
+        for port in list(pending):
+            if len(running) < defragParallel and not port[0] in busy and not port[5] in busy:
+                running[executor.submit(instrumentation.bind(reclaim_datavolume), port[0], port[1], sqlman, logman)] = port
+                busy += [port[0], port[5]]
+                started.append(port)
+                pending.remove(port)
+        if not running:
+            break
+        done = wait(list(running), timeout = 60, return_when = FIRST_COMPLETED)[0]
+        if not done and outputFragmentation:
+            log_reclaim_progress(sqlman, logman)
+        for future in done:
+            del running[future]
+    executor.shutdown()
+    return started
+
+def reclaim_datavolume(host, port, sqlman, logman):
+    sql = "ALTER SYSTEM RECLAIM DATAVOLUME '"+host+":"+port+"' 120 DEFRAGMENT"
+    errorlog = "\nERROR: The user represented by the key "+sqlman.key+" could not defragment the data volumes. \nOne possible reason for this is insufficient privilege, \ne.g. lack of the privilege RESOURCE ADMIN.\n"
+    errorlog += "If there is another error (i.e. not insufficient privilege) then please try to execute \n"+sql+"\nin e.g. the SQL editor in SAP HANA Studio. If you get the same error then this has nothing to do with hanacleaner"
+    errorlog += "Note: If you use System Replication see Q19 in SAP Note 1999880"
+    return try_execute_sql(sql, errorlog, sqlman, logman)[1]
+
+def log_reclaim_progress(sqlman, logman):
+    [progress, succeeded] = try_execute_sql("SELECT HOST, PORT, CURRENT_PROGRESS, MAX_PROGRESS from SYS.M_JOB_PROGRESS WHERE UPPER(JOB_NAME) LIKE '%RECLAIM%'", "", sqlman, logman, exit_on_fail = False, always_execute = True)
+    if succeeded:
+        progress = [job.strip('\n').strip('|').split('|') for job in progress.splitlines(1)]
+        for job in [[elem.strip(' ') for elem in job] for job in progress if len(job) == 4]:
+            log("Defragmentation of Host "+job[0]+" and Port "+job[1]+" is at "+job[2]+" of "+job[3], logman)
+
+def lob_schemas_sql(lobSchemas, alias):   # the -lobl filter on the schema column of the given table alias
+    return " and (" + " or ".join(alias+".SCHEMA_NAME = '"+schema+"'" for schema in lobSchemas) + ")"
+
+@instrumented_task
+def lob_reorg(lobFragMax, lobFragPacked, lobFragSmall, lobFragNum, lobPrint, lobSchemas, lobParallel, lobDeadline, sqlman, logman):   # one scan of SYS.M_TABLE_LOB_STATISTICS for all three criteria, -lobf, -lobs and -lobn
+    criteria = []
+    if lobFragMax != "-1":    #M0372: lobFragMax: max frag pct allowed, if the lob column's fragmentation is relatively larger the reorg will be done,
+        sql_packed = ""  # also include packed
+        if not lobFragPacked:   # dont include packed (default)
+            sql_packed = " and L.LOB_STORAGE_TYPE != 'PACKED'"
+        criteria.append(["LOB Columns With Too High Fragmentation", ["Schema", "Table", "Column", "Lob_Storage_Type", "Fragmentation [%]", "Table_Type"], "(L.DISK_SIZE > 0"+sql_packed+" and (L.DISK_SIZE - L.BINARY_SIZE) * 100 > "+lobFragMax+" * L.DISK_SIZE)",
+                         lambda lob: lob[4] > 0 and (lobFragPacked or lob[3] != 'PACKED') and (lob[4] - lob[5]) * 100 > int(lobFragMax) * lob[4],
+                         lambda lob: lob[0:4] + [round(100.0 * (lob[4] - lob[5]) / lob[4], 3) if lob[4] else 0, lob[7]]])
+    if lobFragSmall != "-1":  #M0373: lobFragSmall: lob columns with too many small (binary size less than 4 kb) file lobs (M0373: 10 millions)
+        criteria.append(["LOB Columns With Too Many Small File LOBs", ["Schema", "Table", "Column", "Lob_Storage_Type", "Binary Size [KB]", "Number of LOBs", "Table_Type"], "(L.LOB_STORAGE_TYPE = 'FILE' and L.BINARY_SIZE < 4 * 1024 and L.LOB_COUNT > "+lobFragSmall+"000000)",
+                         lambda lob: lob[3] == 'FILE' and lob[5] < 4 * 1024 and lob[6] > int(lobFragSmall) * 1000000,
+                         lambda lob: lob[0:4] + [lob[5] // 1024, lob[6], lob[7]]])
+    if lobFragNum != "-1":    #M0374: lobFragNum: too many lobs (M0374: 50 millions)
+        criteria.append(["LOB Columns With Too Many File LOBs", ["Schema", "Table", "Column", "Lob_Storage_Type", "Number of LOBs", "Table_Type"], "(L.LOB_COUNT > "+lobFragNum+"000000)",
+                         lambda lob: lob[6] > int(lobFragNum) * 1000000,
+                         lambda lob: lob[0:4] + [lob[6], lob[7]]])
+    if not criteria:
+        return []
+    sql_select_lobs = "select L.SCHEMA_NAME, L.TABLE_NAME, L.COLUMN_NAME, L.LOB_STORAGE_TYPE, L.DISK_SIZE, L.BINARY_SIZE, L.LOB_COUNT, IFNULL(T.TABLE_TYPE, '?') from SYS.M_TABLE_LOB_STATISTICS L left outer join SYS.TABLES T on L.SCHEMA_NAME = T.SCHEMA_NAME and L.TABLE_NAME = T.TABLE_NAME"  # the table type comes with the candidates, no extra query per column
+    lobsBefore = select_lobs(sql_select_lobs+" where ("+" or ".join(criterion[2] for criterion in criteria)+")"+lob_schemas_sql(lobSchemas, "L"), sqlman, logman)
+    if lobsBefore is None:
+        return [0]*len(criteria)
+    if lobPrint:
+        for criterion in criteria:
+            print("\n"+criterion[0]+" BEFORE:")
+            print(print_table(criterion[1], [criterion[4](lob) for lob in lobsBefore if criterion[3](lob)]))
+    tablesToReorg = []
+    lobColumnsPerTable = {}   # all LOB columns of one table are reorganized with one statement
+    for lob in lobsBefore:
+        if lob[7] == "COLUMN" and any(criterion[3](lob) for criterion in criteria): # Martin F.: "This automatization should only be done on COLUMN store tables"
+            table = (lob[0], lob[1])
+            if not table in lobColumnsPerTable:
+                lobColumnsPerTable[table] = []
+                tablesToReorg.append(table)
+            lobColumnsPerTable[table].append(lob[2])
+    withinWindow = None
+    if lobDeadline:
+        withinWindow = lambda: datetime.now() < lobDeadline
+    reorganized = run_parallel(tablesToReorg, lambda table: lob_reorg_table(table[0], table[1], lobColumnsPerTable[table], sqlman, logman), lobParallel, withinWindow)
+    if len(reorganized) < len(tablesToReorg):
+        log("WARNING: The maintenance window (-lobt) ended at "+lobDeadline.strftime("%Y-%m-%d %H:%M")+", so "+str(len(tablesToReorg) - len(reorganized))+" of "+str(len(tablesToReorg))+" tables were not lob-reorganized.", logman)
+    # only the reorganized columns can have changed, so only those are looked up again
+    reorganizedTables = [result[0] for result in reorganized]
+    lobsAfter = [lob for lob in lobsBefore if not (lob[0], lob[1]) in lobColumnsPerTable or not (lob[0], lob[1]) in reorganizedTables]
+    for chunk in [reorganizedTables[i:i + 100] for i in range(0, len(reorganizedTables), 100)]:  #make sure we do not send too long statement, it could cause an error
+        keys = " or ".join("(L.SCHEMA_NAME = '"+table[0]+"' and L.TABLE_NAME = '"+table[1]+"' and L.COLUMN_NAME in ('"+"', '".join(lobColumnsPerTable[table])+"'))" for table in chunk)
+        lookedUp = select_lobs(sql_select_lobs+" where "+keys, sqlman, logman)
+        lobsAfter += lookedUp if lookedUp is not None else [lob for lob in lobsBefore if (lob[0], lob[1]) in chunk]
+    if lobPrint:
+        for criterion in criteria:
+            print("\n"+criterion[0]+" AFTER (Note: the ROW store tables were excluded from the reorg):")
+            print(print_table(criterion[1], [criterion[4](lob) for lob in lobsAfter if criterion[3](lob)]))
+    return [len([lob for lob in lobsBefore if criterion[3](lob)]) - len([lob for lob in lobsAfter if criterion[3](lob)]) for criterion in criteria]
+
+def select_lobs(sql_select_lobs, sqlman, logman):
     error_select = "ERROR LOG: lob_reorg could not select on the SYS.M_TABLE_LOB_STATISTICS table"
     [lob_columns, succeeded_select] = try_execute_sql(sql_select_lobs, error_select, sqlman, logman, always_execute = True)
-    lob_columns = lob_columns.splitlines(1)
-    nIssueLobsBefore = len(lob_columns)
-    lob_columns = [lob_column.strip('\n').strip('|').split('|') for lob_column in lob_columns]   
-    lob_columns = [[elem.strip(' ') for elem in lob_column] for lob_column in lob_columns] 
-    if succeeded_select and lobPrint:
-        print("\n"+criteria_description+" BEFORE:")
-        print(print_table(print_header, lob_columns))
-    for lob_column in lob_columns:
-        if getTableType(lob_column[0], lob_column[1], sqlman) == "COLUMN": # Martin F.: "This automatization should only be done on COLUMN store tables"
-            sql_online = "ONLINE"
-            sql = 'ALTER TABLE \\\"'+lob_column[0]+'\\\".\\\"'+lob_column[1]+'\\\" LOB REORGANIZE (\\\"'+lob_column[2]+'\\\") '+sql_online
-            error = "\nERROR: The user represented by the key "+sqlman.key+" could not lob-reorganize the table "+lob_column[0]+"."+lob_column[1]+". \nOne possible reason for this is insufficient privilege, \ne.g. lack of ALTER privilege on the schema "+lob_column[0]+".\n"
-            error += "From security point of view, there is unfortunately NO nice way to give privileges to the DB User to be allowed to do this.\nEither you can run hanacleaner as a user with ALTER on the schema (NOT recommended) or grant DATA ADMIN to the user (NOT recommended).\n"               
-            error += "If there is another error (i.e. not insufficient privilege) then please try to execute \n"+sql+"\nin e.g. the SQL editor in SAP HANA Studio. If you get the same error then this has nothing to do with hanacleaner"
-            [dummy_out, succeeded_frag] = try_execute_sql(sql, error, sqlman, logman)     
-    [lob_columns, succeeded_select] = try_execute_sql(sql_select_lobs, error_select, sqlman, logman, always_execute = True)
-    lob_columns = lob_columns.splitlines(1)
-    nIssueLobsAfter = len(lob_columns)
-    lob_columns = [lob_column.strip('\n').strip('|').split('|') for lob_column in lob_columns]   
-    lob_columns = [[elem.strip(' ') for elem in lob_column] for lob_column in lob_columns] 
-    if succeeded_select and lobPrint:
-        print("\n"+criteria_description+" AFTER (Note: the ROW store tables were excluded from the reorg):")
-        print(print_table(print_header, lob_columns)) 
-    return nIssueLobsBefore - nIssueLobsAfter
-
+    if not succeeded_select:
+        return None
+    lob_columns = [lob_column.strip('\n').strip('|').split('|') for lob_column in lob_columns.splitlines(1)]
+    lob_columns = [[elem.strip(' ') for elem in lob_column] for lob_column in lob_columns]
+    return [lob[0:4] + [int(elem) for elem in lob[4:7]] + [lob[7]] for lob in lob_columns if len(lob) == 8 and all(is_integer(elem) for elem in lob[4:7])]
+
+def lob_reorg_table(schema, table, columns, sqlman, logman):
+    sql_online = "ONLINE"
+    sql = 'ALTER TABLE \\\"'+schema+'\\\".\\\"'+table+'\\\" LOB REORGANIZE (\\\"'+'\\\", \\\"'.join(columns)+'\\\") '+sql_online
+    error = "\nERROR: The user represented by the key "+sqlman.key+" could not lob-reorganize the table "+schema+"."+table+". \nOne possible reason for this is insufficient privilege, \ne.g. lack of ALTER privilege on the schema "+schema+".\n"
+    error += "From security point of view, there is unfortunately NO nice way to give privileges to the DB User to be allowed to do this.\nEither you can run hanacleaner as a user with ALTER on the schema (NOT recommended) or grant DATA ADMIN to the user (NOT recommended).\n"               
+    error += "If there is another error (i.e. not insufficient privilege) then please try to execute \n"+sql+"\nin e.g. the SQL editor in SAP HANA Studio. If you get the same error then this has nothing to do with hanacleaner"
+    [dummy_out, succeeded_frag] = try_execute_sql(sql, error, sqlman, logman)
+    return succeeded_frag
+
+@instrumented_task
 def reclaim_rs_containers(outputRcContainers, sqlman, logman):
     nTablesWithMultipleRSContainersBefore = int(run_command(sqlman.hdbsql_jAQaxU + " \"SELECT COUNT(TABLE_NAME) FROM SYS.M_RS_TABLES WHERE CONTAINER_COUNT > 1\"").strip(' '))
     nContCount = int(run_command(sqlman.hdbsql_jAQaxU + " \"SELECT COUNT(CONTAINER_COUNT) FROM SYS.M_RS_TABLES WHERE CONTAINER_COUNT > 1\"").strip(' '))    
@@ -1262,10 +2355,11 @@ def reclaim_rs_containers(outputRcContainers, sqlman, logman):
     nTablesWithMultipleRSContainersAfter = int(run_command(sqlman.hdbsql_jAQaxU + " \"SELECT COUNT(TABLE_NAME) FROM SYS.M_RS_TABLES WHERE CONTAINER_COUNT > 1\"").strip(' '))
     if nTablesWithMultipleRSContainersAfter != 0:
         log("\nERROR: Something went wrong. After reclaim of multiple row store table containers we still have "+str(nTablesWithMultipleRSContainersAfter)+" tables with multiple row store containers. Please investigate.", logman, True)
-        os._exit(1)
+        task_failed()
     return [str(nTablesWithMultipleRSContainersBefore), str(nUnnecessaryRSContainersBefore)]
 
-def force_compression(maxRawComp, maxEstComp, maxRowComp, maxMemComp, minDistComp, maxQuotaComp, maxUDIVComp, maxBLOCKComp, partComp, mergeBeforeComp, version, revision, mrevision, outComp, sqlman, logman):
+@instrumented_task
+def force_compression(maxRawComp, maxEstComp, maxRowComp, maxMemComp, minDistComp, maxQuotaComp, maxUDIVComp, maxBLOCKComp, partComp, mergeBeforeComp, parallelComp, loadLimitComp, minGainComp, budgetComp, version, revision, mrevision, outComp, sqlman, logman):
     #CREATE SQLS
     if not partComp:
         #Tables with no compression
@@ -1318,59 +2412,88 @@ def force_compression(maxRawComp, maxEstComp, maxRowComp, maxMemComp, minDistCom
         sql_int = """select schema_name, table_name, column_name, sum(count) as count_all_partitions from SYS.M_CS_COLUMNS where index_type = 'BLOCK' and """+comp+""" group by schema_name, table_name, column_name"""
         sql_block = """select distinct schema_name, table_name from ( """+sql_int+""") where count_all_partitions > """+str(maxBLOCKComp)      
     #FIND TABLES TO COMPRESS
-    #Tables with no compression
-    tablesToCompress = []
-    if all(c > -1 for c in [maxRawComp, maxEstComp]):
-        tablesToCompress = run_command(sqlman.hdbsql_jAaxU + " \""+sql_nocomp+"\" ").splitlines(1)
-        tablesToCompress = [table.strip('\n').strip('|').split('|') for table in tablesToCompress]    
-        tablesToCompress = [[elem.strip(' ') for elem in table] for table in tablesToCompress]
-    #Columns with default compression
-    moreTablesToCompress = []
-    if all(c > -1 for c in [maxRowComp, maxMemComp, minDistComp]):  
-        moreTablesToCompress = run_command(sqlman.hdbsql_jAaxU + " \""+sql_default+"\" ").splitlines(1)
-        moreTablesToCompress = [table.strip('\n').strip('|').split('|') for table in moreTablesToCompress]    
-        moreTablesToCompress = [[elem.strip(' ') for elem in table] for table in moreTablesToCompress]
-        for newtab in moreTablesToCompress:   
-            if not newtab in tablesToCompress:
-                tablesToCompress.append(newtab)
-    #Tables with too much UDIVs
-    moreTablesToCompress = []
-    if all(c > -1 for c in [maxQuotaComp, maxUDIVComp]):        
-        moreTablesToCompress = run_command(sqlman.hdbsql_jAaxU + " \""+sql_udivs+"\" ").splitlines(1)
-        moreTablesToCompress = [table.strip('\n').strip('|').split('|') for table in moreTablesToCompress]    
-        moreTablesToCompress = [[elem.strip(' ') for elem in table] for table in moreTablesToCompress]
-        for newtab in moreTablesToCompress:   
-            if not newtab in tablesToCompress:
-                tablesToCompress.append(newtab)
-    #Columns with SPARE or PREFIXED
-    moreTablesToCompress = []
-    if maxBLOCKComp > -1:        
-        moreTablesToCompress = run_command(sqlman.hdbsql_jAaxU + " \""+sql_block+"\" ").splitlines(1)
-        moreTablesToCompress = [table.strip('\n').strip('|').split('|') for table in moreTablesToCompress]    
-        moreTablesToCompress = [[elem.strip(' ') for elem in table] for table in moreTablesToCompress]
-        for newtab in moreTablesToCompress:   
-            if not newtab in tablesToCompress:
-                tablesToCompress.append(newtab)
+    candidateSqls = []
+    if all(c > -1 for c in [maxRawComp, maxEstComp]):               #Tables with no compression
+        candidateSqls.append(sql_nocomp)
+    if all(c > -1 for c in [maxRowComp, maxMemComp, minDistComp]):  #Columns with default compression
+        candidateSqls.append(sql_default)
+    if all(c > -1 for c in [maxQuotaComp, maxUDIVComp]):            #Tables with too much UDIVs
+        candidateSqls.append(sql_udivs)
+    if maxBLOCKComp > -1:                                           #Columns with SPARE or PREFIXED
+        candidateSqls.append(sql_block)
+    if not candidateSqls:
+        return [0, 0]
+    #PLAN: COLLECT SIZES AND COMPRESSION TYPES OF ALL CANDIDATES IN ONE QUERY AND ESTIMATE THE EXPECTED SAVING
+    plan = compression_plan(candidateSqls, minGainComp, budgetComp, sqlman, logman)
+    if not sqlman.execute or outComp:
+        log("\n  COMPRESSION RE-OPTIMIZATION PLAN (ranked by expected memory saving):", logman)
+        log(print_table(["Rank", "Schema", "Table", "Memory [MB]", "Est. Max Memory [MB]", "Records", "UDIV Quota [%]", "# DEFAULT Columns", "# BLOCK SPARSE/PREFIXED Columns", "Expected Saving [MB]", "Decision"], [[i + 1] + row for i, row in enumerate(plan)]), logman)
+    tablesToCompress = [row[0:2] for row in plan if row[-1] == 'compress']
     #COMPRESS (AND MERGE) TABLES
-    failed = 0
-    for tab in tablesToCompress:
-        sql_merge = 'MERGE DELTA OF \\"'+tab[0]+'\\".\\"'+tab[1]+'\\"'     # necessary for tables starting with /
-        errorlog_merge = "Failed to merge the table "+tab[0]+"."+tab[1]
-        sql = """UPDATE \\\""""+tab[0]+"""\\\".\\\""""+tab[1]+"""\\\" WITH PARAMETERS ('OPTIMIZE_COMPRESSION' = 'FORCE')"""  # necessary for tables starting with /
-        errorlog = "Failed to re-optimize the compression of the table "+tab[0]+"."+tab[1]
-        succeeded_merge = True  # in case we will not merge before compression, we define merge to be success
-        if mergeBeforeComp:
-            [dummyout, succeeded_merge] = try_execute_sql(sql_merge, errorlog_merge, sqlman, logman, exit_on_fail = False)
-        [dummyout, succeeded] = try_execute_sql(sql, errorlog, sqlman, logman, exit_on_fail = False)
-        if not succeeded_merge or not succeeded:
-            failed += 1
+    [nAttempted, failed] = schedule_compressions(tablesToCompress, mergeBeforeComp, parallelComp, loadLimitComp, sqlman, logman)
     if outComp:
         log("\n  ATTEMPTED COMPRESSION RE-OPTIMIZATION ON FOLLOWING TABLES:", logman)
-        for tab in tablesToCompress:
+        for tab in tablesToCompress[:nAttempted]:
             log("    "+tab[0]+"."+tab[1], logman)
         log("\n", logman)
-    return [len(tablesToCompress), failed]
-
+    return [nAttempted, failed]
+
+def compression_plan(candidateSqls, minGainComp, budgetComp, sqlman, logman):   # returns ranked [schema, table, mem, est. max mem, records, udiv quota, #default, #block, expected saving, decision]
+    candidates = " union ".join(candidateSqls)
+    tables = "select schema_name, table_name, sum(memory_size_in_total) as MEM, sum(estimated_max_memory_size_in_total) as EST_MEM, sum(record_count) as RECORDS, sum(max_udiv) as UDIVS, sum(raw_record_count_in_main + raw_record_count_in_delta) as RAW_RECORDS from sys.m_cs_tables group by schema_name, table_name"
+    columns = "select schema_name, table_name, sum(case when compression_type = 'DEFAULT' then 1 else 0 end) as N_DEFAULT, sum(case when compression_type = 'DEFAULT' and count > 0 then memory_size_in_total * (1 - distinct_count / count) / 2 else 0 end) as DEFAULT_SAVING, "
+    columns += "sum(case when index_type = 'BLOCK' and compression_type in ('SPARSE', 'PREFIXED') then 1 else 0 end) as N_BLOCK, sum(case when index_type = 'BLOCK' and compression_type in ('SPARSE', 'PREFIXED') then memory_size_in_total else 0 end) as BLOCK_MEM from SYS.M_CS_ALL_COLUMNS group by schema_name, table_name"
+    sql = "select T.schema_name, T.table_name, T.MEM, T.EST_MEM, T.RECORDS, T.UDIVS, T.RAW_RECORDS, IFNULL(C.N_DEFAULT, 0), TO_BIGINT(IFNULL(C.DEFAULT_SAVING, 0)), IFNULL(C.N_BLOCK, 0), IFNULL(C.BLOCK_MEM, 0) from ("+tables+") T left outer join ("+columns+") C on T.schema_name = C.schema_name and T.table_name = C.table_name where (T.schema_name, T.table_name) in ("+candidates+")"
+    errorlog = "\nERROR: The user represented by the key "+sqlman.key+" could not select the compression re-optimization candidates. \nOne possible reason for this is insufficient privilege, \ne.g. lack of the system privilege CATALOG READ.\n"
+    errorlog += "If there is another error (i.e. not insufficient privilege) then please try to execute \n"+sql+"\nin e.g. the SQL editor in SAP HANA Studio. If you get the same error then this has nothing to do with hanacleaner"
+    [out, succeeded] = try_execute_sql(sql, errorlog, sqlman, logman, exit_on_fail = False, always_execute = True)
+    rows = [row.strip('\n').strip('|').split('|') for row in out.splitlines(1)]
+    rows = [[elem.strip(' ') for elem in row] for row in rows]
+    plan = []
+    foundTables = set()   # a table can be found by more than one of the criteria, but should only be compressed once
+    for row in rows:
+        if len(row) != 11 or not all(is_integer(elem) for elem in row[2:]) or (row[0], row[1]) in foundTables:
+            continue
+        foundTables.add((row[0], row[1]))
+        [mem, estMem, records, udivs, rawRecords, nDefault, defaultSaving, nBlock, blockMem] = [int(elem) for elem in row[2:]]
+        udivQuota = 100.0 * udivs / max(rawRecords, 1)
+        # rough estimate: columns with DEFAULT compression shrink with their share of duplicates, SPARSE/PREFIXED with BLOCK index
+        # shrink about half, and the part of the table that is only kept for obsolete UDIVs is freed
+        udivSaving = mem * (udivs - rawRecords) / float(udivs) if udivs > rawRecords else 0
+        saving = min(mem, defaultSaving + blockMem / 2 + udivSaving)
+        plan.append([row[0], row[1], round(mem / 1048576.0, 1), round(estMem / 1048576.0, 1), records, round(udivQuota, 1), nDefault, nBlock, round(saving / 1048576.0, 1), estMem])
+    plan.sort(key = lambda row: [row[8], row[3], row[5]], reverse = True)
+    usedBudget = 0    # the effort of a re-optimization grows with the size of the table, so the budget is counted in estimated max memory
+    for row in plan:
+        estMem = row.pop()
+        if minGainComp >= 0 and row[8] < minGainComp:
+            row.append('skip (-cg)')
+        elif budgetComp >= 0 and usedBudget + estMem > budgetComp * 1073741824:
+            row.append('skip (-ct)')
+        else:
+            usedBudget += estMem
+            row.append('compress')
+    return plan
+
+def compress_table(tab, mergeBeforeComp, sqlman, logman):
+    sql_merge = 'MERGE DELTA OF \\"'+tab[0]+'\\".\\"'+tab[1]+'\\"'     # necessary for tables starting with /
+    errorlog_merge = "Failed to merge the table "+tab[0]+"."+tab[1]
+    sql = """UPDATE \\\""""+tab[0]+"""\\\".\\\""""+tab[1]+"""\\\" WITH PARAMETERS ('OPTIMIZE_COMPRESSION' = 'FORCE')"""  # necessary for tables starting with /
+    errorlog = "Failed to re-optimize the compression of the table "+tab[0]+"."+tab[1]
+    succeeded_merge = True  # in case we will not merge before compression, we define merge to be success
+    if mergeBeforeComp:
+        [dummyout, succeeded_merge] = try_execute_sql(sql_merge, errorlog_merge, sqlman, logman, exit_on_fail = False)
+    [dummyout, succeeded] = try_execute_sql(sql, errorlog, sqlman, logman, exit_on_fail = False)
+    return succeeded_merge and succeeded
+
+def schedule_compressions(tablesToCompress, mergeBeforeComp, parallelComp, loadLimitComp, sqlman, logman):
+    loadGuard = LoadGuard(loadLimitComp, sqlman, logman)
+    results = run_parallel(tablesToCompress, lambda tab: compress_table(tab, mergeBeforeComp, sqlman, logman), parallelComp, loadGuard.wait_for_headroom)
+    if len(results) < len(tablesToCompress):
+        log("WARNING: The system stayed busy (-cl), so compression re-optimization was stopped after "+str(len(results))+" of "+str(len(tablesToCompress))+" tables.", logman)
+    return [len(results), len([result for result in results if not result[1]])]
+
+@instrumented_task
 def create_vt_statistics(vtSchemas, maxColumnsOfVT, defaultVTStatType, maxRowsForDefaultVT, largeVTStatType, otherDBVTStatType, ignore2ndMon, sqlman, logman):  #SAP Note 1872652: Creating statistics on a virtual table can be an expensive operation. 
     #Default statistics type: HISTOGRAM --> Creates a data statistics object that helps the query optimizer estimate the data distribution in a single-column data source
     nVTs = int(run_command(sqlman.hdbsql_jAQaxU + " \"select count(*) from SYS.VIRTUAL_TABLES\"").strip(' '))
@@ -1402,6 +2525,7 @@ def create_vt_statistics(vtSchemas, maxColumnsOfVT, defaultVTStatType, maxRowsFo
     nVTsWithoutStatAfter = int(run_command(sqlman.hdbsql_jAQaxU + " \"select COUNT(*) from SYS.VIRTUAL_TABLES where TABLE_NAME NOT IN (select distinct DATA_SOURCE_OBJECT_NAME from SYS.DATA_STATISTICS)\"").strip(' '))
     return [nVTs, nVTsWithoutStatBefore - nVTsWithoutStatAfter]
 
+@instrumented_task
 def refresh_statistics(vtSchemas, refreshAge, ignore2ndMon, sqlman, logman):
     nDSs = int(run_command(sqlman.hdbsql_jAQaxU + " \"SELECT COUNT(*) FROM SYS.DATA_STATISTICS\"").strip(' '))
     nDSToRefresh_before = int(run_command(sqlman.hdbsql_jAQaxU + " \"SELECT COUNT(*) FROM SYS.DATA_STATISTICS WHERE LAST_REFRESH_TIME < ADD_DAYS(CURRENT_TIMESTAMP, -"+str(refreshAge)+")\"").strip(' '))
@@ -1422,6 +2546,7 @@ def refresh_statistics(vtSchemas, refreshAge, ignore2ndMon, sqlman, logman):
     nDSToRefresh_after = int(run_command(sqlman.hdbsql_jAQaxU + " \"SELECT COUNT(*) FROM SYS.DATA_STATISTICS WHERE LAST_REFRESH_TIME < ADD_DAYS(CURRENT_TIMESTAMP, -"+str(refreshAge)+")\"").strip(' '))
     return [nDSs, nDSToRefresh_after - nDSToRefresh_before]
 
+@instrumented_task
 def refresh_data_statistics(refreshAgeDS, sqlman, logman):    #Note: this is the same as refresh_statistics but without the -vl and -vr
     nDSs = int(run_command(sqlman.hdbsql_jAQaxU + " \"SELECT COUNT(*) FROM SYS.DATA_STATISTICS\"").strip(' '))
     nDSToRefresh_before = int(run_command(sqlman.hdbsql_jAQaxU + " \"SELECT COUNT(*) FROM SYS.DATA_STATISTICS WHERE LAST_REFRESH_TIME < ADD_DAYS(CURRENT_TIMESTAMP, -"+str(refreshAgeDS)+")\"").strip(' '))
@@ -1440,6 +2565,7 @@ def refresh_data_statistics(refreshAgeDS, sqlman, logman):    #Note: this is the
     nDSToRefresh_after = int(run_command(sqlman.hdbsql_jAQaxU + " \"SELECT COUNT(*) FROM SYS.DATA_STATISTICS WHERE LAST_REFRESH_TIME < ADD_DAYS(CURRENT_TIMESTAMP, -"+str(refreshAgeDS)+")\"").strip(' '))
     return [nDSs, nDSToRefresh_after - nDSToRefresh_before]
 
+@instrumented_task
 def refresh_virtual_tables(refreshVTs, refreshVTsSchema, refreshVTsTable, printVTChecks, sqlman, logman):
     schema_filter = "'"+refreshVTsSchema+"'" if refreshVTsSchema else "NULL"
     table_filter = "'"+refreshVTsTable+"'" if refreshVTsTable else "NULL"
@@ -1482,6 +2608,7 @@ def refresh_virtual_tables(refreshVTs, refreshVTsSchema, refreshVTsTable, printV
     nMismatchesAfter = len(listOfMismatches)
     return nMismatchesBefore - nMismatchesAfter
 
+@instrumented_task
 def refresh_ip_block(refreshIPBlockTable, refreshIPBlockSchema, refreshIPBlockNbr, sqlman, logman):
     nUpdatedIPs = 0
     tableExists = int(run_command(sqlman.hdbsql_jAQaxU + " \"select count(*) from SYS.TABLES where TABLE_NAME = '"+refreshIPBlockTable+"' and SCHEMA_NAME = '"+refreshIPBlockSchema+"'\"").strip(' ')) > 0
@@ -1519,36 +2646,38 @@ def refresh_ip_block(refreshIPBlockTable, refreshIPBlockSchema, refreshIPBlockNb
     dummyout = run_command("rm -R "+downloadpath)
     return [nUpdatedIPs]
 
+@instrumented_task
 def clean_output(minRetainedOutputDays, sqlman, logman):
     path = logman.path
     nFilesBefore = len([name for name in os.listdir(path) if os.path.isfile(os.path.join(path, name))])
+    findCommand = "find "+path+" -maxdepth 1 -type f \\( -name 'hanacleanerlog*' -o -name 'hanacleaner_catalog_*' -o -name 'hanacleaner_profile_*' \\) -mtime +"+str(minRetainedOutputDays)+" -delete"
     if sqlman.log:
-        log("find "+path+"/hanacleanerlog* -mtime +"+str(minRetainedOutputDays)+" -delete", logman)
+        log(findCommand, logman)
     if sqlman.execute:
-        dummyout = run_command("find "+path+"/hanacleanerlog* -mtime +"+str(minRetainedOutputDays)+" -delete")
+        dummyout = run_command(findCommand)
     nFilesAfter = len([name for name in os.listdir(path) if os.path.isfile(os.path.join(path, name))])
     return nFilesBefore - nFilesAfter  
     
+@instrumented_task
 def clean_anyfile(retainedAnyFileDays, anyFilePaths, anyFileWords, anyFileMaxDepth, sqlman, logman):
     removedFiles = 0
     path_level = 0
     retainedAnyFileDaysString = []
     for path, word in zip(anyFilePaths, anyFileWords):
-        nFilesBefore = int(run_command("find "+path+" -maxdepth "+str(anyFileMaxDepth)+" -type f | wc -l").strip(' '))
+        nFilesBefore = int(run_command("find "+shlex.quote(path)+" -maxdepth "+str(int(anyFileMaxDepth))+" -type f | wc -l").strip(' '))
         if str(retainedAnyFileDays[path_level]) == "0": #then dont use -mtime, dont work
             retainedAnyFileDaysString.append("")
         else:
-            retainedAnyFileDaysString.append("-mtime +"+str(retainedAnyFileDays[path_level]))
-        with open(os.devnull, 'w') as devnull:  #not needed anymore.. build in inside run_command, but only needed for python 2.7 ... remove this! 
-            if sqlman.log:
-                log("find "+path+" -maxdepth "+str(anyFileMaxDepth)+" -name '*"+word+"*' -type f "+retainedAnyFileDaysString[path_level]+" -delete", logman)
-            if sqlman.execute:
-                try:
-                    dummyout = run_command("find "+path+" -maxdepth "+str(anyFileMaxDepth)+" -name '*"+word+"*' -type f "+retainedAnyFileDaysString[path_level]+" -delete")   #this might be a problem ... from https://docs.python.org/3/library/subprocess.html#subprocess.getoutput : 
-                    #The stdout and stderr arguments may not be supplied at the same time as capture_output. If you wish to capture and combine both streams into one, use stdout=PIPE and stderr=STDOUT instead of capture_output.
-                except:
-                    pass   #File not  found, but no need to warn about that
-        nFilesAfter = int(run_command("find "+path+" -maxdepth "+str(anyFileMaxDepth)+" -type f | wc -l").strip(' '))
+            retainedAnyFileDaysString.append("-mtime +"+str(int(retainedAnyFileDays[path_level])))
+        if sqlman.log:
+            log("find "+shlex.quote(path)+" -maxdepth "+str(int(anyFileMaxDepth))+" -name "+shlex.quote("*"+word+"*")+" -type f "+retainedAnyFileDaysString[path_level]+" -delete", logman)
+        if sqlman.execute:
+            try:
+                dummyout = run_command("find "+shlex.quote(path)+" -maxdepth "+str(int(anyFileMaxDepth))+" -name "+shlex.quote("*"+word+"*")+" -type f "+retainedAnyFileDaysString[path_level]+" -delete")   #this might be a problem ... from https://docs.python.org/3/library/subprocess.html#subprocess.getoutput : 
+                #The stdout and stderr arguments may not be supplied at the same time as capture_output. If you wish to capture and combine both streams into one, use stdout=PIPE and stderr=STDOUT instead of capture_output.
+            except:
+                pass   #File not  found, but no need to warn about that
+        nFilesAfter = int(run_command("find "+shlex.quote(path)+" -maxdepth "+str(int(anyFileMaxDepth))+" -type f | wc -l").strip(' '))
         path_level += 1
         removedFiles += nFilesBefore - nFilesAfter
     return removedFiles  
@@ -1567,8 +2696,8 @@ def checkAndConvertBooleanFlag(boolean, flagstring, logman = ''):
 def main():
 
     #####################  CHECK PYTHON VERSION ###########
-    if sys.version_info[0] != 2 and sys.version_info[0] != 3:
-        print("VERSION ERROR: hanacleaner is only supported for Python 2.7.x (for HANA 2 SPS05 and lower) and for Python 3.7.x (for HANA 2 SPS06 and higher). Did you maybe forget to log in as <sid>adm before executing this?")
+    if sys.version_info < (3, 7):   # Python 2.7 (HANA 2 SPS05 and lower) cannot even read this file, it stops with a SyntaxError before this check
+        print("VERSION ERROR: hanacleaner requires Python 3.7 or higher (HANA 2 SPS06 and higher). Did you maybe forget to log in as <sid>adm before executing this?")
         os._exit(1)
  
     #####################   DEFAULTS   ####################
@@ -1577,9 +2706,11 @@ def main():
     deleteBackups = "false"
     outputCatalog = "false"
     outputDeletedCatalog = "false"
+    catalogCompression = "gzip"
     outputNDeletedLBEntries = "true"
     backupTraceContent = "false"
     backupTraceDirectory = ""
+    traceCompression = ""
     timeOutForMove = "30"
     outputTraces = "false"
     outputRemovedTraces = "false"
@@ -1594,6 +2725,7 @@ def main():
                                #     ENV : mo-fc8d991e0:30015
                                #     USER: SYSTEM
     dbases = ['']
+    keyParallel = "1"
     receiver_emails = None
     email_timeout = "-1"
     sendEmailSummary = "false" 
@@ -1624,13 +2756,19 @@ def main():
     pendingEmailsDays = "-1"
     fragmentationLimit = "-1" # percent
     outputFragmentation = "false"
+    defragParallel = "1"
+    defragBudget = "-1" # minutes
     lobFragMax = "-1"   # M0372
     lobFragPacked = "false"
     lobFragSmall = '-1' # M0373   (10 millions)
     lobFragNum = '-1' # M0374     (50 millions) 
     lobPrint = "false"
     lobSchemas = [""]
+    lobParallel = "1"
+    lobWindowEnd = ""
     hanacleaner_interval = "-1"
+    metadataCacheDays = "-1"
+    adaptiveIntervals = [""]
     rcContainers = "false"
     outputRcContainers = "false"
     maxRawComp = '-1'  #number raw rows, e.g. 10000000
@@ -1644,6 +2782,10 @@ def main():
     partComp = 'false' 
     mergeBeforeComp = 'false'
     outComp = 'false'
+    parallelComp = '1'
+    loadLimitComp = '-1'  #%, e.g. 80
+    minGainComp = '-1'  #MB, e.g. 100
+    budgetComp = '-1'  #GB, e.g. 500
     createVTStat = 'false'
     maxColumnsOfVT = '1000'
     defaultVTStatType = 'HISTOGRAM'
@@ -1666,20 +2808,44 @@ def main():
     flag_files = []    #default: no configuration input file
     ignore_filesystems = ""
     execute_sql = 'true'
+    taskLimits = [""]
+    workloadClasses = [""]
+    statementTimeout = "-1"
+    taskTimeout = "-1"
+    retries = "0"
+    failureContinue = "false"
     out_sql = 'false'
     out_path = ""
+    runHistory = "false"
+    reportLimits = ["10000", "1000000", "100000", "10000"]
     out_prefix = ""
     do_df_check = 'true'
     minRetainedOutputDays = "-1" #days
     out_config = 'false'
+    instrumentTopN = "-1"
+    instrumentJson = "false"
+    metricsDirectory = ""
+    metricsPort = "-1"
+    metricsAddress = "127.0.0.1"
+    profiling = "false"
     online_test_interval = "-1" #seconds
+    sapcontrolUrl = ""
+    onlineCacheSeconds = "-1"
     cockpit = "false" 
     std_out = "true" #print to std out
     virtual_local_host = "" #default: assume physical local host
+    hostAgents = ""
     ssl = "false"
+    toolsPath = ""
     
     #####################  CHECK INPUT ARGUMENTS #################
-    if len(sys.argv) == 1:
+    if '--agent' in sys.argv:   # this is a host agent (-ha) on another host of a scale-out system, it gets its flags from the master
+        agents.serve()
+        return
+    report = '--report' in sys.argv   # only print the growth forecast from the -oh history, no house keeping
+    if report:
+        sys.argv.remove('--report')
+    if len(sys.argv) == 1 and not report:
         print("INPUT ERROR: hanacleaner needs input arguments. Please see --help for more information.")
         os._exit(1) 
     if len(sys.argv) != 2 and len(sys.argv) % 2 == 0:
@@ -1718,6 +2884,7 @@ def main():
                     deleteBackups                     = getParameterFromFile(firstWord, '-bb', flagValue, flag_file, flag_log, deleteBackups)
                     outputCatalog                     = getParameterFromFile(firstWord, '-bo', flagValue, flag_file, flag_log, outputCatalog)
                     outputDeletedCatalog              = getParameterFromFile(firstWord, '-br', flagValue, flag_file, flag_log, outputDeletedCatalog)
+                    catalogCompression                = getParameterFromFile(firstWord, '-bz', flagValue, flag_file, flag_log, catalogCompression)
                     outputNDeletedLBEntries           = getParameterFromFile(firstWord, '-bn', flagValue, flag_file, flag_log, outputNDeletedLBEntries)
                     retainedTraceContentDays          = getParameterFromFile(firstWord, '-tc', flagValue, flag_file, flag_log, retainedTraceContentDays)
                     retainedBacklogDays               = getParameterFromFile(firstWord, '-tb', flagValue, flag_file, flag_log, retainedBacklogDays)
@@ -1725,6 +2892,7 @@ def main():
                     backupTraceContent                = getParameterFromFile(firstWord, '-tcb', flagValue, flag_file, flag_log, backupTraceContent)
                     backupTraceDirectory              = getParameterFromFile(firstWord, '-tbd', flagValue, flag_file, flag_log, backupTraceDirectory)
                     timeOutForMove                    = getParameterFromFile(firstWord, '-tmo', flagValue, flag_file, flag_log, timeOutForMove)
+                    traceCompression                  = getParameterFromFile(firstWord, '-tz', flagValue, flag_file, flag_log, traceCompression)
                     retainedTraceFilesDays            = getParameterFromFile(firstWord, '-tf', flagValue, flag_file, flag_log, retainedTraceFilesDays)
                     ignoreTraceFiles                  = getParameterListFromFile(firstWord, '-ti', flagValue, flag_file, flag_log, ignoreTraceFiles)
                     outputTraces                      = getParameterFromFile(firstWord, '-to', flagValue, flag_file, flag_log, outputTraces)
@@ -1754,12 +2922,16 @@ def main():
                     pendingEmailsDays                 = getParameterFromFile(firstWord, '-pe', flagValue, flag_file, flag_log, pendingEmailsDays)
                     fragmentationLimit                = getParameterFromFile(firstWord, '-fl', flagValue, flag_file, flag_log, fragmentationLimit)
                     outputFragmentation               = getParameterFromFile(firstWord, '-fo', flagValue, flag_file, flag_log, outputFragmentation)
+                    defragParallel                    = getParameterFromFile(firstWord, '-fn', flagValue, flag_file, flag_log, defragParallel)
+                    defragBudget                      = getParameterFromFile(firstWord, '-ft', flagValue, flag_file, flag_log, defragBudget)
                     lobFragMax                        = getParameterFromFile(firstWord, '-lobf', flagValue, flag_file, flag_log, lobFragMax)
                     lobFragPacked                     = getParameterFromFile(firstWord, '-lobp', flagValue, flag_file, flag_log, lobFragPacked)
                     lobFragSmall                      = getParameterFromFile(firstWord, '-lobs', flagValue, flag_file, flag_log, lobFragSmall)
                     lobFragNum                        = getParameterFromFile(firstWord, '-lobn', flagValue, flag_file, flag_log, lobFragNum)
                     lobPrint                          = getParameterFromFile(firstWord, '-lobw', flagValue, flag_file, flag_log, lobPrint)
                     lobSchemas                        = getParameterListFromFile(firstWord, '-lobl', flagValue, flag_file, flag_log, lobSchemas)
+                    lobParallel                       = getParameterFromFile(firstWord, '-lobc', flagValue, flag_file, flag_log, lobParallel)
+                    lobWindowEnd                      = getParameterFromFile(firstWord, '-lobt', flagValue, flag_file, flag_log, lobWindowEnd)
                     rcContainers                      = getParameterFromFile(firstWord, '-rc', flagValue, flag_file, flag_log, rcContainers)
                     outputRcContainers                = getParameterFromFile(firstWord, '-ro', flagValue, flag_file, flag_log, outputRcContainers)
                     maxRawComp                        = getParameterFromFile(firstWord, '-cc', flagValue, flag_file, flag_log, maxRawComp)
@@ -1773,6 +2945,10 @@ def main():
                     partComp                          = getParameterFromFile(firstWord, '-cp', flagValue, flag_file, flag_log, partComp)
                     mergeBeforeComp                   = getParameterFromFile(firstWord, '-cm', flagValue, flag_file, flag_log, mergeBeforeComp)
                     outComp                           = getParameterFromFile(firstWord, '-co', flagValue, flag_file, flag_log, outComp)
+                    parallelComp                      = getParameterFromFile(firstWord, '-cn', flagValue, flag_file, flag_log, parallelComp)
+                    loadLimitComp                     = getParameterFromFile(firstWord, '-cl', flagValue, flag_file, flag_log, loadLimitComp)
+                    minGainComp                       = getParameterFromFile(firstWord, '-cg', flagValue, flag_file, flag_log, minGainComp)
+                    budgetComp                        = getParameterFromFile(firstWord, '-ct', flagValue, flag_file, flag_log, budgetComp)
                     createVTStat                      = getParameterFromFile(firstWord, '-vs', flagValue, flag_file, flag_log, createVTStat)
                     maxColumnsOfVT                    = getParameterFromFile(firstWord, '-vm', flagValue, flag_file, flag_log, maxColumnsOfVT)
                     defaultVTStatType                 = getParameterFromFile(firstWord, '-vt', flagValue, flag_file, flag_log, defaultVTStatType)
@@ -1792,21 +2968,42 @@ def main():
                     refreshIPBlockNbr                 = getParameterFromFile(firstWord, '-ipn', flagValue, flag_file, flag_log, refreshIPBlockNbr)
                     minRetainedIniDays                = getParameterFromFile(firstWord, '-ir', flagValue, flag_file, flag_log, minRetainedIniDays)
                     execute_sql                       = getParameterFromFile(firstWord, '-es', flagValue, flag_file, flag_log, execute_sql)
+                    taskLimits                        = getParameterListFromFile(firstWord, '-tl', flagValue, flag_file, flag_log, taskLimits)
+                    workloadClasses                   = getParameterListFromFile(firstWord, '-wc', flagValue, flag_file, flag_log, workloadClasses)
+                    statementTimeout                  = getParameterFromFile(firstWord, '-st', flagValue, flag_file, flag_log, statementTimeout)
+                    taskTimeout                       = getParameterFromFile(firstWord, '-tt', flagValue, flag_file, flag_log, taskTimeout)
+                    retries                           = getParameterFromFile(firstWord, '-rt', flagValue, flag_file, flag_log, retries)
+                    failureContinue                   = getParameterFromFile(firstWord, '-fc', flagValue, flag_file, flag_log, failureContinue)
                     out_sql                           = getParameterFromFile(firstWord, '-os', flagValue, flag_file, flag_log, out_sql)
                     out_path                          = getParameterFromFile(firstWord, '-op', flagValue, flag_file, flag_log, out_path)
                     out_prefix                        = getParameterFromFile(firstWord, '-of', flagValue, flag_file, flag_log, out_prefix)
                     minRetainedOutputDays             = getParameterFromFile(firstWord, '-or', flagValue, flag_file, flag_log, minRetainedOutputDays)
                     out_config                        = getParameterFromFile(firstWord, '-oc', flagValue, flag_file, flag_log, out_config)
+                    instrumentTopN                    = getParameterFromFile(firstWord, '-it', flagValue, flag_file, flag_log, instrumentTopN)
+                    instrumentJson                    = getParameterFromFile(firstWord, '-ij', flagValue, flag_file, flag_log, instrumentJson)
+                    metricsDirectory                  = getParameterFromFile(firstWord, '-md', flagValue, flag_file, flag_log, metricsDirectory)
+                    metricsPort                       = getParameterFromFile(firstWord, '-mp', flagValue, flag_file, flag_log, metricsPort)
+                    metricsAddress                    = getParameterFromFile(firstWord, '-ma', flagValue, flag_file, flag_log, metricsAddress)
+                    profiling                         = getParameterFromFile(firstWord, '-pr', flagValue, flag_file, flag_log, profiling)
+                    runHistory                        = getParameterFromFile(firstWord, '-oh', flagValue, flag_file, flag_log, runHistory)
+                    reportLimits                      = getParameterListFromFile(firstWord, '-ol', flagValue, flag_file, flag_log, reportLimits)
                     online_test_interval              = getParameterFromFile(firstWord, '-oi', flagValue, flag_file, flag_log, online_test_interval)
+                    sapcontrolUrl                     = getParameterFromFile(firstWord, '-ou', flagValue, flag_file, flag_log, sapcontrolUrl)
+                    onlineCacheSeconds                = getParameterFromFile(firstWord, '-ot', flagValue, flag_file, flag_log, onlineCacheSeconds)
                     cockpit                           = getParameterFromFile(firstWord, '-hc', flagValue, flag_file, flag_log, cockpit)
                     file_system                       = getParameterFromFile(firstWord, '-fs', flagValue, flag_file, flag_log, file_system)
                     ignore_filesystems                = getParameterListFromFile(firstWord, '-if', flagValue, flag_file, flag_log, ignore_filesystems)
                     do_df_check                       = getParameterFromFile(firstWord, '-df', flagValue, flag_file, flag_log, do_df_check)
                     hanacleaner_interval              = getParameterFromFile(firstWord, '-hci', flagValue, flag_file, flag_log, hanacleaner_interval)
+                    metadataCacheDays                 = getParameterFromFile(firstWord, '-hcc', flagValue, flag_file, flag_log, metadataCacheDays)
+                    adaptiveIntervals                 = getParameterListFromFile(firstWord, '-hca', flagValue, flag_file, flag_log, adaptiveIntervals)
                     std_out                           = getParameterFromFile(firstWord, '-so', flagValue, flag_file, flag_log, std_out)
                     ssl                               = getParameterFromFile(firstWord, '-ssl', flagValue, flag_file, flag_log, ssl)
+                    toolsPath                         = getParameterFromFile(firstWord, '-hx', flagValue, flag_file, flag_log, toolsPath)
                     virtual_local_host                = getParameterFromFile(firstWord, '-vlh', flagValue, flag_file, flag_log, virtual_local_host)
+                    hostAgents                        = getParameterFromFile(firstWord, '-ha', flagValue, flag_file, flag_log, hostAgents)
                     dbuserkeys                        = getParameterListFromFile(firstWord, '-k', flagValue, flag_file, flag_log, dbuserkeys)
+                    keyParallel                       = getParameterFromFile(firstWord, '-kp', flagValue, flag_file, flag_log, keyParallel)
                     dbases                            = getParameterListFromFile(firstWord, '-dbs', flagValue, flag_file, flag_log, dbases)
                     receiver_emails                   = getParameterListFromFile(firstWord, '-en', flagValue, flag_file, flag_log, receiver_emails)
                     email_timeout                     = getParameterFromFile(firstWord, '-et', flagValue, flag_file, flag_log, email_timeout)
@@ -1824,6 +3021,7 @@ def main():
     deleteBackups                     = getParameterFromCommandLine(sys.argv, '-bb', flag_log,  deleteBackups)
     outputCatalog                     = getParameterFromCommandLine(sys.argv, '-bo', flag_log, outputCatalog)
     outputDeletedCatalog              = getParameterFromCommandLine(sys.argv, '-br', flag_log, outputDeletedCatalog)
+    catalogCompression                = getParameterFromCommandLine(sys.argv, '-bz', flag_log, catalogCompression)
     outputNDeletedLBEntries           = getParameterFromCommandLine(sys.argv, '-bn', flag_log, outputNDeletedLBEntries)
     retainedTraceContentDays          = getParameterFromCommandLine(sys.argv, '-tc', flag_log, retainedTraceContentDays)
     retainedBacklogDays               = getParameterFromCommandLine(sys.argv, '-tb', flag_log, retainedBacklogDays)
@@ -1831,6 +3029,7 @@ def main():
     backupTraceContent                = getParameterFromCommandLine(sys.argv, '-tcb', flag_log, backupTraceContent)
     backupTraceDirectory              = getParameterFromCommandLine(sys.argv, '-tbd', flag_log, backupTraceDirectory)
     timeOutForMove                    = getParameterFromCommandLine(sys.argv, '-tmo', flag_log, timeOutForMove)
+    traceCompression                  = getParameterFromCommandLine(sys.argv, '-tz', flag_log, traceCompression)
     retainedTraceFilesDays            = getParameterFromCommandLine(sys.argv, '-tf', flag_log, retainedTraceFilesDays)
     ignoreTraceFiles                  = getParameterListFromCommandLine(sys.argv, '-ti', flag_log, ignoreTraceFiles)
     outputTraces                      = getParameterFromCommandLine(sys.argv, '-to', flag_log, outputTraces)
@@ -1860,12 +3059,16 @@ def main():
     pendingEmailsDays                 = getParameterFromCommandLine(sys.argv, '-pe', flag_log, pendingEmailsDays)
     fragmentationLimit                = getParameterFromCommandLine(sys.argv, '-fl', flag_log, fragmentationLimit)
     outputFragmentation               = getParameterFromCommandLine(sys.argv, '-fo', flag_log, outputFragmentation)
+    defragParallel                    = getParameterFromCommandLine(sys.argv, '-fn', flag_log, defragParallel)
+    defragBudget                      = getParameterFromCommandLine(sys.argv, '-ft', flag_log, defragBudget)
     lobFragMax                        = getParameterFromCommandLine(sys.argv, '-lobf', flag_log, lobFragMax)
     lobFragPacked                     = getParameterFromCommandLine(sys.argv, '-lobp', flag_log, lobFragPacked)
     lobFragSmall                      = getParameterFromCommandLine(sys.argv, '-lobs', flag_log, lobFragSmall)
     lobFragNum                        = getParameterFromCommandLine(sys.argv, '-lobn', flag_log, lobFragNum)
     lobPrint                          = getParameterFromCommandLine(sys.argv, '-lobw', flag_log, lobPrint)
     lobSchemas                        = getParameterListFromCommandLine(sys.argv, '-lobl', flag_log, lobSchemas)
+    lobParallel                       = getParameterFromCommandLine(sys.argv, '-lobc', flag_log, lobParallel)
+    lobWindowEnd                      = getParameterFromCommandLine(sys.argv, '-lobt', flag_log, lobWindowEnd)
     rcContainers                      = getParameterFromCommandLine(sys.argv, '-rc', flag_log, rcContainers)
     outputRcContainers                = getParameterFromCommandLine(sys.argv, '-ro', flag_log, outputRcContainers)
     maxRawComp                        = getParameterFromCommandLine(sys.argv, '-cc', flag_log, maxRawComp)
@@ -1879,6 +3082,10 @@ def main():
     partComp                          = getParameterFromCommandLine(sys.argv, '-cp', flag_log, partComp)
     mergeBeforeComp                   = getParameterFromCommandLine(sys.argv, '-cm', flag_log, mergeBeforeComp)
     outComp                           = getParameterFromCommandLine(sys.argv, '-co', flag_log, outComp)
+    parallelComp                      = getParameterFromCommandLine(sys.argv, '-cn', flag_log, parallelComp)
+    loadLimitComp                     = getParameterFromCommandLine(sys.argv, '-cl', flag_log, loadLimitComp)
+    minGainComp                       = getParameterFromCommandLine(sys.argv, '-cg', flag_log, minGainComp)
+    budgetComp                        = getParameterFromCommandLine(sys.argv, '-ct', flag_log, budgetComp)
     createVTStat                      = getParameterFromCommandLine(sys.argv, '-vs', flag_log, createVTStat)
     maxColumnsOfVT                    = getParameterFromCommandLine(sys.argv, '-vm', flag_log, maxColumnsOfVT)
     defaultVTStatType                 = getParameterFromCommandLine(sys.argv, '-vt', flag_log, defaultVTStatType)
@@ -1898,21 +3105,42 @@ def main():
     refreshIPBlockNbr                 = getParameterFromCommandLine(sys.argv, '-ipn', flag_log, refreshIPBlockNbr)
     minRetainedIniDays                = getParameterFromCommandLine(sys.argv, '-ir', flag_log, minRetainedIniDays)
     execute_sql                       = getParameterFromCommandLine(sys.argv, '-es', flag_log, execute_sql)
+    taskLimits                        = getParameterListFromCommandLine(sys.argv, '-tl', flag_log, taskLimits)
+    workloadClasses                   = getParameterListFromCommandLine(sys.argv, '-wc', flag_log, workloadClasses)
+    statementTimeout                  = getParameterFromCommandLine(sys.argv, '-st', flag_log, statementTimeout)
+    taskTimeout                       = getParameterFromCommandLine(sys.argv, '-tt', flag_log, taskTimeout)
+    retries                           = getParameterFromCommandLine(sys.argv, '-rt', flag_log, retries)
+    failureContinue                   = getParameterFromCommandLine(sys.argv, '-fc', flag_log, failureContinue)
     out_sql                           = getParameterFromCommandLine(sys.argv, '-os', flag_log, out_sql)
     out_path                          = getParameterFromCommandLine(sys.argv, '-op', flag_log, out_path)
     out_prefix                        = getParameterFromCommandLine(sys.argv, '-of', flag_log, out_prefix)
     minRetainedOutputDays             = getParameterFromCommandLine(sys.argv, '-or', flag_log, minRetainedOutputDays)
     out_config                        = getParameterFromCommandLine(sys.argv, '-oc', flag_log, out_config)
+    instrumentTopN                    = getParameterFromCommandLine(sys.argv, '-it', flag_log, instrumentTopN)
+    instrumentJson                    = getParameterFromCommandLine(sys.argv, '-ij', flag_log, instrumentJson)
+    metricsDirectory                  = getParameterFromCommandLine(sys.argv, '-md', flag_log, metricsDirectory)
+    metricsPort                       = getParameterFromCommandLine(sys.argv, '-mp', flag_log, metricsPort)
+    metricsAddress                    = getParameterFromCommandLine(sys.argv, '-ma', flag_log, metricsAddress)
+    profiling                         = getParameterFromCommandLine(sys.argv, '-pr', flag_log, profiling)
+    runHistory                        = getParameterFromCommandLine(sys.argv, '-oh', flag_log, runHistory)
+    reportLimits                      = getParameterListFromCommandLine(sys.argv, '-ol', flag_log, reportLimits)
     online_test_interval              = getParameterFromCommandLine(sys.argv, '-oi', flag_log, online_test_interval)
+    sapcontrolUrl                     = getParameterFromCommandLine(sys.argv, '-ou', flag_log, sapcontrolUrl)
+    onlineCacheSeconds                = getParameterFromCommandLine(sys.argv, '-ot', flag_log, onlineCacheSeconds)
     cockpit                           = getParameterFromCommandLine(sys.argv, '-hc', flag_log, cockpit)
     file_system                       = getParameterFromCommandLine(sys.argv, '-fs', flag_log, file_system)
     ignore_filesystems                = getParameterListFromCommandLine(sys.argv, '-if', flag_log, ignore_filesystems)
     do_df_check                       = getParameterFromCommandLine(sys.argv, '-df', flag_log, do_df_check)
     hanacleaner_interval              = getParameterFromCommandLine(sys.argv, '-hci', flag_log, hanacleaner_interval)
+    metadataCacheDays                 = getParameterFromCommandLine(sys.argv, '-hcc', flag_log, metadataCacheDays)
+    adaptiveIntervals                 = getParameterListFromCommandLine(sys.argv, '-hca', flag_log, adaptiveIntervals)
     std_out                           = getParameterFromCommandLine(sys.argv, '-so', flag_log, std_out)
     ssl                               = getParameterFromCommandLine(sys.argv, '-ssl', flag_log, ssl)
+    toolsPath                         = getParameterFromCommandLine(sys.argv, '-hx', flag_log, toolsPath)
     virtual_local_host                = getParameterFromCommandLine(sys.argv, '-vlh', flag_log, virtual_local_host)
+    hostAgents                        = getParameterFromCommandLine(sys.argv, '-ha', flag_log, hostAgents)
     dbuserkeys                        = getParameterListFromCommandLine(sys.argv, '-k', flag_log, dbuserkeys)
+    keyParallel                       = getParameterFromCommandLine(sys.argv, '-kp', flag_log, keyParallel)
     dbases                            = getParameterListFromCommandLine(sys.argv, '-dbs', flag_log, dbases)
     receiver_emails                   = getParameterListFromCommandLine(sys.argv, '-en', flag_log, receiver_emails)
     email_timeout                     = getParameterFromCommandLine(sys.argv, '-et', flag_log, email_timeout)
@@ -1998,6 +3226,12 @@ def main():
     hdbsql_string = "hdbsql "
     if ssl:
         hdbsql_string = "hdbsql -e -ssltrustcert -sslcreatecert "        
+    ### toolsPath, -hx
+    if toolsPath:
+        if not os.path.isdir(toolsPath):
+            log("INPUT ERROR: The tools path, -hx, "+toolsPath+" does not exist. Please see --help for more information.", logman, True)
+            os._exit(1)
+        os.environ["PATH"] = toolsPath + os.pathsep + os.environ.get("PATH", "")   # hdbsql, hdbuserstore, sapcontrol and hdbnsutil are looked up here first
     ### minRetainedBackups, -be 
     if not is_integer(minRetainedBackups):
         log("INPUT ERROR: -be must be an integer. Please see --help for more information.", logman)
@@ -2022,6 +3256,16 @@ def main():
     outputCatalog = checkAndConvertBooleanFlag(outputCatalog, "-bo", logman)
     ### outputDeletedCatalog, -br
     outputDeletedCatalog = checkAndConvertBooleanFlag(outputDeletedCatalog, "-br", logman)
+    ### catalogCompression, -bz
+    if not catalogCompression in ['gzip', 'zstd']:
+        log("INPUT ERROR: -bz must be either gzip or zstd. Please see --help for more information.", logman, True)
+        os._exit(1)
+    if catalogCompression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            log("INPUT ERROR: -bz zstd requires the python module zstandard, e.g. pip install zstandard. Please see --help for more information.", logman, True)
+            os._exit(1)
     ### outputNDeletedLBEntries, -bn
     outputNDeletedLBEntries = checkAndConvertBooleanFlag(outputNDeletedLBEntries, "-bn", logman)
     ### outputTraces, -to
@@ -2046,8 +3290,8 @@ def main():
         log("INPUT ERROR: -tcb is specified although -tc, -tb and -te are not. This makes no sense. Please see --help for more information.", logman, True)
         os._exit(1)
     ### backupTraceDirectory, -tbd
-    if backupTraceDirectory and not backupTraceContent:
-        log("INPUT ERROR: -tbd is specified although -tcb is not. This makes no sense. Please see --help for more information.", logman, True)
+    if backupTraceDirectory and not backupTraceContent and not traceCompression:
+        log("INPUT ERROR: -tbd is specified although -tcb and -tz are not. This makes no sense. Please see --help for more information.", logman, True)
         os._exit(1)
     ### timeOutForMove, -tmo
     if not is_integer(timeOutForMove):
@@ -2063,6 +3307,20 @@ def main():
             log("INPUT ERROR: -td is true allthough -tc, -tb, -te and -tf are all -1. This makes no sense. Please see --help for more information.", logman, True)
             os._exit(1)
     ### ignoreTraceFiles, -ti
+    ### traceCompression, -tz
+    if traceCompression:
+        if not traceCompression in ['gzip', 'zstd']:
+            log("INPUT ERROR: -tz must be either gzip or zstd. Please see --help for more information.", logman, True)
+            os._exit(1)
+        if retainedTraceFilesDays == "-1" or not backupTraceDirectory:
+            log("INPUT ERROR: -tz requires -tf and -tbd. Please see --help for more information.", logman, True)
+            os._exit(1)
+        if traceCompression == 'zstd':
+            try:
+                import zstandard
+            except ImportError:
+                log("INPUT ERROR: -tz zstd requires the python module zstandard, e.g. pip install zstandard. Please see --help for more information.", logman, True)
+                os._exit(1)
     # nothing to check
     ### retainedDumpDays, -dr
     if not is_integer(retainedDumpDays):
@@ -2178,6 +3436,19 @@ def main():
     fragmentationLimit = int(fragmentationLimit)
     ### outputFragmentation, -fo
     outputFragmentation = checkAndConvertBooleanFlag(outputFragmentation, "-fo", logman)
+    ### defragParallel, -fn
+    if not is_integer(defragParallel):
+        log("INPUT ERROR: -fn must be an integer. Please see --help for more information.", logman, True)
+        os._exit(1)
+    defragParallel = int(defragParallel)
+    if defragParallel < 1:
+        log("INPUT ERROR: -fn must be at least 1. Please see --help for more information.", logman, True)
+        os._exit(1)
+    ### defragBudget, -ft
+    if not is_integer(defragBudget):
+        log("INPUT ERROR: -ft must be an integer. Please see --help for more information.", logman, True)
+        os._exit(1)
+    defragBudget = int(defragBudget)
     ### lobFragMax, -lobf
     if not is_integer(lobFragMax):
         log("INPUT ERROR: -lobf must be an integer. Please see --help for more information.", logman, True)
@@ -2198,7 +3469,18 @@ def main():
     if (lobFragMax != "-1" or lobFragSmall != "-1" or lobFragNum != "-1") and lobSchemas == [""]:
         log("INPUT ERROR: -lobl must be provided if -lobf, -lobs, or -lobn are used. Please see --help for more information.", logman, True)
         os._exit(1)
-    lobSchemasSQL = " and (SCHEMA_NAME = '" + "' or SCHEMA_NAME = '".join(lobSchemas) + "')"
+    ### lobParallel, -lobc
+    if not is_integer(lobParallel):
+        log("INPUT ERROR: -lobc must be an integer. Please see --help for more information.", logman, True)
+        os._exit(1)
+    lobParallel = int(lobParallel)
+    if lobParallel < 1:
+        log("INPUT ERROR: -lobc must be at least 1. Please see --help for more information.", logman, True)
+        os._exit(1)
+    ### lobWindowEnd, -lobt
+    if lobWindowEnd and not (re.match(r'^[0-9]{1,2}:[0-9]{2}$', lobWindowEnd) and int(lobWindowEnd.split(':')[0]) < 24 and int(lobWindowEnd.split(':')[1]) < 60):
+        log("INPUT ERROR: -lobt must be a time of the day, HH:MM. Please see --help for more information.", logman, True)
+        os._exit(1)
     ### rcContainers, -rc
     rcContainers = checkAndConvertBooleanFlag(rcContainers, "-rc", logman)
     ### outputRcContainers, -ro
@@ -2249,6 +3531,29 @@ def main():
     mergeBeforeComp = checkAndConvertBooleanFlag(mergeBeforeComp, "-cm", logman)
     ### outComp, -co
     outComp = checkAndConvertBooleanFlag(outComp, "-co", logman)
+    ### parallelComp, -cn
+    if not is_integer(parallelComp):
+        log("INPUT ERROR: -cn must be an integer. Please see --help for more information.", logman, True)
+        os._exit(1)
+    parallelComp = int(parallelComp)
+    if parallelComp < 1:
+        log("INPUT ERROR: -cn must be at least 1. Please see --help for more information.", logman, True)
+        os._exit(1)
+    ### loadLimitComp, -cl
+    if not is_integer(loadLimitComp):
+        log("INPUT ERROR: -cl must be an integer. Please see --help for more information.", logman, True)
+        os._exit(1)
+    loadLimitComp = int(loadLimitComp)
+    ### minGainComp, -cg
+    if not is_integer(minGainComp):
+        log("INPUT ERROR: -cg must be an integer. Please see --help for more information.", logman, True)
+        os._exit(1)
+    minGainComp = int(minGainComp)
+    ### budgetComp, -ct
+    if not is_integer(budgetComp):
+        log("INPUT ERROR: -ct must be an integer. Please see --help for more information.", logman, True)
+        os._exit(1)
+    budgetComp = int(budgetComp)
     ### createVTStat, -vs
     createVTStat = checkAndConvertBooleanFlag(createVTStat, "-vs", logman)
     ### maxColumnsOfVT, -vm
@@ -2329,8 +3634,47 @@ def main():
         log("INPUT ERROR: -hci must be an integer. Please see --help for more information.", logman, True)
         os._exit(1)
     hanacleaner_interval = int(hanacleaner_interval)*24*3600  # days to seconds
+    ### metadataCacheDays, -hcc
+    if not is_integer(metadataCacheDays):
+        log("INPUT ERROR: -hcc must be an integer. Please see --help for more information.", logman, True)
+        os._exit(1)
+    metacache = MetadataCache(int(metadataCacheDays)*24*3600)  # days to seconds
     ### execute_sql, -es
     execute_sql = checkAndConvertBooleanFlag(execute_sql, "-es", logman)
+    ### taskLimits, -tl
+    if taskLimits[0]:
+        if not (len(taskLimits) == 3 and all(is_integer(limit) for limit in taskLimits)):
+            log("INPUT ERROR: -tl must be three integers, for sql light, sql heavy and filesystem tasks. Please see --help for more information.", logman, True)
+            os._exit(1)
+        taskLimits = [int(limit) for limit in taskLimits]
+        if min(taskLimits) < 1:
+            log("INPUT ERROR: -tl must be at least 1 for each resource class. Please see --help for more information.", logman, True)
+            os._exit(1)
+    else:
+        taskLimits = []   # one task at a time, in the order of this help
+    ### workloadClasses, -wc
+    if workloadClasses[0]:
+        if not (len(workloadClasses) == 3 and all(re.match(r"^[A-Za-z_][A-Za-z0-9_]*$", workloadClass) for workloadClass in workloadClasses)):
+            log("INPUT ERROR: -wc must be three workload class names, for sql light, sql heavy and filesystem tasks. Please see --help for more information.", logman, True)
+            os._exit(1)
+        workloads.configure(workloadClasses)
+    ### statementTimeout, -st
+    if not is_integer(statementTimeout):
+        log("INPUT ERROR: -st must be an integer. Please see --help for more information.", logman, True)
+        os._exit(1)
+    watchdog.statementTimeout = int(statementTimeout)
+    ### taskTimeout, -tt
+    if not is_integer(taskTimeout):
+        log("INPUT ERROR: -tt must be an integer. Please see --help for more information.", logman, True)
+        os._exit(1)
+    watchdog.taskTimeout = int(taskTimeout)*60 if int(taskTimeout) >= 0 else -1   # minutes to seconds
+    ### retries, -rt
+    if not is_integer(retries) or int(retries) < 0:
+        log("INPUT ERROR: -rt must be an integer, at least 0. Please see --help for more information.", logman, True)
+        os._exit(1)
+    failures.retries = int(retries)
+    ### failureContinue, -fc
+    failures.isolate = checkAndConvertBooleanFlag(failureContinue, "-fc", logman)
     ### out_sql, -os
     out_sql = checkAndConvertBooleanFlag(out_sql, "-os", logman)
     ### minRetainedOutputDays, -or
@@ -2343,11 +3687,65 @@ def main():
         os._exit(1)
     ### out_config, -oc
     out_config = checkAndConvertBooleanFlag(out_config, "-oc", logman)
+    ### instrumentTopN, -it
+    if not is_integer(instrumentTopN):
+        log("INPUT ERROR: -it must be an integer. Please see --help for more information.", logman, True)
+        os._exit(1)
+    instrumentTopN = int(instrumentTopN)
+    instrumentation.enabled = instrumentTopN >= 0
+    ### instrumentJson, -ij
+    instrumentJson = checkAndConvertBooleanFlag(instrumentJson, "-ij", logman)
+    if instrumentJson and instrumentTopN < 0:
+        log("INPUT ERROR: -ij requires -it. Please see --help for more information.", logman, True)
+        os._exit(1)
+    ### metricsDirectory, -md and metricsPort, -mp
+    if not is_integer(metricsPort):
+        log("INPUT ERROR: -mp must be an integer. Please see --help for more information.", logman, True)
+        os._exit(1)
+    metricsPort = int(metricsPort)
+    if metricsDirectory and not os.path.isdir(metricsDirectory):
+        log("INPUT ERROR: The metrics directory, -md, "+metricsDirectory+" does not exist. Please see --help for more information.", logman, True)
+        os._exit(1)
+    metrics.configure(metricsDirectory, metricsPort, metricsAddress)
+    ### profiling, -pr
+    profiling = checkAndConvertBooleanFlag(profiling, "-pr", logman)
+    if profiling:
+        profiler.start(logman.path, logman.out_prefix)
+    ### runHistory, -oh
+    history.enabled = checkAndConvertBooleanFlag(runHistory, "-oh", logman)
+    if history.enabled or report:
+        history.configure(logman.path)
+    ### reportLimits, -ol
+    if not (len(reportLimits) == 4 and all(is_integer(limit) for limit in reportLimits)):
+        log("INPUT ERROR: -ol must be four integers, for trace files, alerts, backup catalog entries and events. Please see --help for more information.", logman, True)
+        os._exit(1)
+    reportLimits = [int(limit) for limit in reportLimits]
+    if report:
+        log(history.report(reportLimits), logman)
+        sys.exit()
+    ### adaptiveIntervals, -hca
+    if adaptiveIntervals[0]:
+        if not (len(adaptiveIntervals) == 2 and all(is_integer(hours) for hours in adaptiveIntervals)):
+            log("INPUT ERROR: -hca must be two integers, the min and max hours between two runs of a task. Please see --help for more information.", logman, True)
+            os._exit(1)
+        [minHours, maxHours] = [int(hours) for hours in adaptiveIntervals]
+        if minHours < 1 or maxHours < minHours:
+            log("INPUT ERROR: -hca must be at least 1 hour and the max must not be less than the min. Please see --help for more information.", logman, True)
+            os._exit(1)
+        if hanacleaner_interval < 0:
+            log("INPUT ERROR: -hca requires -hci. Please see --help for more information.", logman, True)
+            os._exit(1)
+        intervals.configure(minHours, maxHours, hanacleaner_interval, reportLimits)
     ### online_test_interval, -oi
     if not is_integer(online_test_interval):
         log("INPUT ERROR: -oi must be an integer. Please see --help for more information.", logman, True)
         os._exit(1)
     online_test_interval = int(online_test_interval)
+    ### onlineCacheSeconds, -ot
+    if not is_integer(onlineCacheSeconds):
+        log("INPUT ERROR: -ot must be an integer. Please see --help for more information.", logman, True)
+        os._exit(1)
+    probecache = MetadataCache(int(onlineCacheSeconds))
     # cockpit, -hc
     cockpit = checkAndConvertBooleanFlag(cockpit, "-hc", logman) 
     if cockpit and online_test_interval < 0:
@@ -2361,273 +3759,332 @@ def main():
     if len(dbases) == 1 and len(dbuserkeys) == 1 and 'all' in dbases:
         dbuserkey = dbuserkeys[0]
         dbases = get_all_databases(execute_sql, hdbsql_string, dbuserkey, local_host, out_sql, logman)   
+    ### keyParallel, -kp
+    if not is_integer(keyParallel):
+        log("INPUT ERROR: -kp must be an integer. Please see --help for more information.", logman, True)
+        os._exit(1)
+    keyParallel = int(keyParallel)
+    if keyParallel < 1:
+        log("INPUT ERROR: -kp must be at least 1. Please see --help for more information.", logman, True)
+        os._exit(1)
+    fleet.configure(min(keyParallel, len(dbuserkeys)), taskLimits)
+    ### hostAgents, -ha
+    if hostAgents and not "%HOST" in hostAgents:
+        log("INPUT ERROR: -ha must be a command with %HOST, e.g. \"ssh %HOST python /hana/shared/hanacleaner.py --agent\". Please see --help for more information.", logman, True)
+        os._exit(1)
+    agents.configure(hostAgents, local_host)
 
     ################ START #################
-    while True: # hanacleaner intervall loop
-        for dbuserkey in dbuserkeys:
-            ################ SET TIMEOUT ALARM #############
-            def timeout_handler(signum, frame):
-                log('Warning: HANACleaner has been running longer than '+str(email_timeout)+' seconds.', logman, True)
+    def clean_key(dbuserkey, logman):   # all databases of one key, with -kp at the same time as the other keys
+        keyZipLimit = zipBackupLogsSizeLimit   # -zb of this key, with -kp other keys run on other HANA versions at the same time
+        ################ SET TIMEOUT ALARM #############
+        def timeout_handler(signum, frame):
+            log('Warning: HANACleaner has been running longer than '+str(email_timeout)+' seconds'+(' with the key '+dbuserkey if fleet.parallelKeys > 1 else '')+'.', logman, True)
+        alarm = None
+        if fleet.parallelKeys <= 1:
             signal.signal(signal.SIGALRM, timeout_handler)
             signal.alarm(email_timeout)
-            ############ GET LOCAL INSTANCE and SID ##########
-            [key_hosts, ENV, DATABASE] = get_key_info(dbuserkey, local_host, logman)
-            local_host_index = key_hosts.index(local_host)
-            key_sqlports = [env.split(':')[1] for env in ENV]        
-            dbinstances = [port[1:3] for port in key_sqlports]
-            if not all(x == dbinstances[0] for x in dbinstances):
-                print("ERROR: The hosts provided with the user key, "+dbuserkey+", does not all have the same instance number")
-                os._exit(1)
-            local_dbinstance = dbinstances[local_host_index]
-            ############# MULTIPLE DATABASES #######
-            for dbase in dbases:   #if -dbs = dbases are specified, this overwrites DATABASE (that could come from the key)
-                if dbase:
-                    DATABASE = dbase
-                emailmessage = ""
-                ############# SQL MANAGER ##############
-                sqlman = SQLManager(execute_sql, hdbsql_string, dbuserkey, DATABASE, out_sql)
-                db_string = ''
-                if DATABASE:
-                    db_string = 'on DB '+DATABASE
-                whoami = run_command('whoami').replace('\n','')
-                parameter_string = ""
-                if out_config:
-                    parameter_string = "\n".join("{}\t{}".format(k, "= "+v[0]+" from "+v[1]) for k, v in flag_log.items())
-                if sqlman.execute:
-                    startstring = "*********************************************************************************************************\n"+datetime.now().strftime("%Y-%m-%d %H:%M:%S")+"\nhanacleaner as "+whoami+" by "+dbuserkey+" on "+SID+"("+local_dbinstance+") "+db_string+" with \n"+" ".join(sys.argv)+"\nCleanup Statements will be executed (-es is default true)\n"+parameter_string+"\n ANY USAGE OF HANACLEANER ASSUMES THAT YOU HAVE READ AND UNDERSTOOD THE DISCLAIMER!\n    python hanacleaner.py --disclaimer\n\n*********************************************************************************************************" 
+        elif email_timeout > 0:   # signals can only be handled in the main thread
+            alarm = threading.Timer(email_timeout, timeout_handler, [None, None])
+            alarm.daemon = True
+            alarm.start()
+        ############ GET LOCAL INSTANCE and SID ##########
+        [key_hosts, ENV, DATABASE] = metacache.get(('key', dbuserkey), lambda: get_key_info(dbuserkey, local_host, logman))
+        local_host_index = key_hosts.index(local_host)
+        key_sqlports = [env.split(':')[1] for env in ENV]        
+        dbinstances = [port[1:3] for port in key_sqlports]
+        if not all(x == dbinstances[0] for x in dbinstances):
+            print("ERROR: The hosts provided with the user key, "+dbuserkey+", does not all have the same instance number")
+            os._exit(1)
+        local_dbinstance = dbinstances[local_host_index]
+        ############# MULTIPLE DATABASES #######
+        for dbase in dbases:   #if -dbs = dbases are specified, this overwrites DATABASE (that could come from the key)
+            if dbase:
+                DATABASE = dbase
+            emailmessage = ""
+            ############# SQL MANAGER ##############
+            sqlman = SQLManager(execute_sql, hdbsql_string, dbuserkey, DATABASE, out_sql)
+            instrumentation.context = dbuserkey+(" "+DATABASE if DATABASE else "")
+            keySID = metacache.get(('sid', dbuserkey, DATABASE), lambda: fleet.system_id(SID, sqlman, logman)) if fleet.parallelKeys > 1 else SID
+            fleet.sids[instrumentation.context] = keySID
+            metrics.start(keySID, dbuserkey, DATABASE)
+            history.start(keySID, dbuserkey, DATABASE)
+            intervals.start(keySID, dbuserkey, DATABASE)
+            db_string = ''
+            if DATABASE:
+                db_string = 'on DB '+DATABASE
+            whoami = metacache.get(('whoami', ''), lambda: run_command('whoami').replace('\n',''))
+            parameter_string = ""
+            if out_config:
+                parameter_string = "\n".join("{}\t{}".format(k, "= "+v[0]+" from "+v[1]) for k, v in flag_log.items())
+            if sqlman.execute:
+                startstring = "*********************************************************************************************************\n"+datetime.now().strftime("%Y-%m-%d %H:%M:%S")+"\nhanacleaner as "+whoami+" by "+dbuserkey+" on "+keySID+"("+local_dbinstance+") "+db_string+" with \n"+" ".join(sys.argv)+"\nCleanup Statements will be executed (-es is default true)\n"+parameter_string+"\n ANY USAGE OF HANACLEANER ASSUMES THAT YOU HAVE READ AND UNDERSTOOD THE DISCLAIMER!\n    python hanacleaner.py --disclaimer\n\n*********************************************************************************************************" 
+            else:
+                startstring = "*******************************************************************************************\n"+datetime.now().strftime("%Y-%m-%d %H:%M:%S")+"\nhanacleaner as "+whoami+" by "+dbuserkey+"\non "+keySID+"("+local_dbinstance+") "+db_string+" with \n"+" ".join(sys.argv)+"\nCleanup Statements will NOT be executed\n"+parameter_string+" \n ANY USAGE OF HANACLEANER ASSUMES THAT YOU HAVE READ AND UNDERSTOOD THE DISCLAIMER!\n    python hanacleaner.py --disclaimer\n\n*******************************************************************************************"
+            log(startstring, logman)
+            emailmessage += startstring+"\n"
+            ############ ONLINE TESTS (OPTIONAL) ##########################
+            while not online_and_master_tests(online_test_interval, local_dbinstance, local_host, cockpit, sapcontrolUrl, probecache, sqlman, logman):  #will check if Online and if Primary and not Stand-By, and then if Master, but only if online_test_interval > -1           
+                log("\nOne of the online checks found out that this HANA instance, "+str(local_dbinstance)+", is not online or not master. ", logman)
+                ############ CLEANUP of OWN LOGS, HANACLEANER MUST DO even though HANA is OFFLINE ##########################
+                if minRetainedOutputDays >= 0:
+                    nCleaned = clean_output(minRetainedOutputDays, sqlman, logman)
+                    logmessage = str(nCleaned)+" hanacleaner daily log files were removed (-or) even though HANA is offline"
+                    log(logmessage, logman)
+                    emailmessage += logmessage+"\n"
                 else:
-                    startstring = "*******************************************************************************************\n"+datetime.now().strftime("%Y-%m-%d %H:%M:%S")+"\nhanacleaner as "+whoami+" by "+dbuserkey+"\non "+SID+"("+local_dbinstance+") "+db_string+" with \n"+" ".join(sys.argv)+"\nCleanup Statements will NOT be executed\n"+parameter_string+" \n ANY USAGE OF HANACLEANER ASSUMES THAT YOU HAVE READ AND UNDERSTOOD THE DISCLAIMER!\n    python hanacleaner.py --disclaimer\n\n*******************************************************************************************"
-                log(startstring, logman)
-                emailmessage += startstring+"\n"
-                ############ ONLINE TESTS (OPTIONAL) ##########################
-                while not online_and_master_tests(online_test_interval, local_dbinstance, local_host, cockpit, logman):  #will check if Online and if Primary and not Stand-By, and then if Master, but only if online_test_interval > -1           
-                    log("\nOne of the online checks found out that this HANA instance, "+str(local_dbinstance)+", is not online or not master. ", logman)
-                    ############ CLEANUP of OWN LOGS, HANACLEANER MUST DO even though HANA is OFFLINE ##########################
-                    if minRetainedOutputDays >= 0:
-                        nCleaned = clean_output(minRetainedOutputDays, sqlman, logman)
-                        logmessage = str(nCleaned)+" hanacleaner daily log files were removed (-or) even though HANA is offline"
-                        log(logmessage, logman)
-                        emailmessage += logmessage+"\n"
-                    else:
-                        log("    (Cleaning of the hanacleaner logs was not done since -or was negative (or not specified))", logman)  
-                    if online_test_interval == 0:
-                        log("HANACleaner will now abort since online_test_interval = 0.", logman, True)
-                        os._exit(1)
-                    else:
-                        log("HANACleaner will now have a "+str(online_test_interval)+" seconds break and check again if this Instance is online, or master, after the break.\n", logman)
-                        time.sleep(float(online_test_interval))  # wait online_test_interval seconds before again checking if HANA is running
-                ############ CHECK THAT USER CAN CONNECT TO HANA ###############  
-                sql = "SELECT * from DUMMY" 
-                errorlog = "USER ERROR: The user represented by the key "+dbuserkey+" cannot connect to the system. Make sure this user is properly saved in hdbuserstore."
-                [dummy_out, succeeded] = try_execute_sql(sql, errorlog, sqlman, logman, True, True) # always check key, even if -es true
-                dummy_out = dummy_out.strip("\n").strip("|").strip(" ") 
-                if dummy_out != 'X' or not succeeded:
-                    log("USER ERROR: The user represented by the key "+dbuserkey+" cannot connect to the system. Make sure this user is properly saved in hdbuserstore. Will now continue with the other keys (if there are any)", logman, True)
+                    log("    (Cleaning of the hanacleaner logs was not done since -or was negative (or not specified))", logman)  
+                if online_test_interval == 0:
+                    log("HANACleaner will now abort since online_test_interval = 0.", logman, True)
+                    os._exit(1)
                 else:
-                    ##### HANA VERSION COMPATABILITY ######    
-                    [version, revision, mrevision] = hana_version_revision_maintenancerevision(sqlman, logman)
-                    if (retainedTraceContentDays != "-1" or retainedBacklogDays != "-1" or retainedExpensiveTraceContentDays != "-1") and (version < 2 and revision < 120):
-                        log("VERSION ERROR: -tc, tb and -te are not supported for SAP HANA rev. < 120. (The UNTIL option is new with SPS12.)", logman, True)
-                        os._exit(1)       
-                    if zipBackupLogsSizeLimit != -1 and (version >= 2 and revision >= 40):
-                        log("VERSION WARNING: -zb is not supported for SAP HANA 2 rev. >= 40. Instead configure size with parameters, see SAP Note 2797078.", logman)
-                        zipBackupLogsSizeLimit = -1     
-                    ###### START ALL HOUSE KEEPING TASKS ########
-                    if minRetainedBackups >= 0 or minRetainedDays >= 0:
-                        [nCleanedData, nCleanedLog] = clean_backup_catalog(minRetainedBackups, minRetainedDays, deleteBackups, outputCatalog, outputDeletedCatalog, outputNDeletedLBEntries, sqlman, logman)
+                    log("HANACleaner will now have a "+str(online_test_interval)+" seconds break and check again if this Instance is online, or master, after the break.\n", logman)
+                    probecache.invalidate(local_dbinstance)   # after the break, check again for real
+                    probecache.invalidate(sqlman.key)
+                    time.sleep(float(online_test_interval))  # wait online_test_interval seconds before again checking if HANA is running
+            ############ CHECK THAT USER CAN CONNECT TO HANA ###############  
+            sql = "SELECT * from DUMMY" 
+            errorlog = "USER ERROR: The user represented by the key "+dbuserkey+" cannot connect to the system. Make sure this user is properly saved in hdbuserstore."
+            [dummy_out, succeeded] = try_execute_sql(sql, errorlog, sqlman, logman, True, True) # always check key, even if -es true
+            dummy_out = dummy_out.strip("\n").strip("|").strip(" ") 
+            if dummy_out != 'X' or not succeeded:
+                log("USER ERROR: The user represented by the key "+dbuserkey+" cannot connect to the system. Make sure this user is properly saved in hdbuserstore. Will now continue with the other keys (if there are any)", logman, True)
+                metacache.invalidate(dbuserkey)
+            else:
+                ##### HANA VERSION COMPATABILITY ######    
+                [version, revision, mrevision] = metacache.get(('version', dbuserkey, DATABASE), lambda: hana_version_revision_maintenancerevision(sqlman, logman), on_change = lambda: metacache.invalidate(dbuserkey, keep = ('version', dbuserkey, DATABASE)))  # e.g. after an upgrade
+                if (retainedTraceContentDays != "-1" or retainedBacklogDays != "-1" or retainedExpensiveTraceContentDays != "-1") and (version < 2 and revision < 120):
+                    log("VERSION ERROR: -tc, tb and -te are not supported for SAP HANA rev. < 120. (The UNTIL option is new with SPS12.)", logman, True)
+                    os._exit(1)       
+                if keyZipLimit != -1 and (version >= 2 and revision >= 40):
+                    log("VERSION WARNING: -zb is not supported for SAP HANA 2 rev. >= 40. Instead configure size with parameters, see SAP Note 2797078.", logman)
+                    keyZipLimit = -1     
+                ###### START ALL HOUSE KEEPING TASKS ########
+                workloads.create_mappings(sqlman, logman)
+                tasks = TaskGraph(taskLimits)   # the summary comes in this order, also if -tl lets independent tasks run at the same time
+                allHosts = lambda: metacache.get(('hosts', dbuserkey, DATABASE), lambda: hosts(sqlman))
+                if minRetainedBackups >= 0 or minRetainedDays >= 0:
+                    def backup_catalog_task():
+                        [nCleanedData, nCleanedLog] = clean_backup_catalog(minRetainedBackups, minRetainedDays, deleteBackups, outputCatalog, outputDeletedCatalog, outputNDeletedLBEntries, catalogCompression, sqlman, logman)
                         logmessage = str(nCleanedData)+" data backup entries and "+str(nCleanedLog)+" log backup entries were removed from the backup catalog (-be and -bd)"
                         if not outputNDeletedLBEntries:
                             logmessage = str(nCleanedData)+" data backup entries were removed from the backup catalog (number removed log backups is unknown since -bn = false)"
-                        log(logmessage, logman)
-                        emailmessage += logmessage+"\n"
-                    else:
-                        log("    (Cleaning of the backup catalog was not done since -be and -bd were both negative (or not specified))", logman)
-                    if retainedTraceContentDays != "-1" or retainedBacklogDays != "-1" or retainedExpensiveTraceContentDays != "-1" or retainedTraceFilesDays != "-1":
-                        nCleaned = clean_trace_files(retainedTraceContentDays, retainedBacklogDays, retainedExpensiveTraceContentDays, backupTraceContent, backupTraceDirectory, timeOutForMove, retainedTraceFilesDays, ignoreTraceFiles, outputTraces, outputRemovedTraces, SID, DATABASE, local_dbinstance, hosts(sqlman), sqlman, logman)
-                        logmessage = str(nCleaned)+" trace files were removed (-tc, -tb, -te and -tf)"
-                        log(logmessage, logman)
-                        emailmessage += logmessage+"\n"
-                    else:
-                        log("    (Cleaning traces was not done since -tc, -tb, -te and -tf were all -1 (or not specified))", logman)
-                    if retainedDumpDays != "-1":
-                        nCleaned = clean_dumps(retainedDumpDays, local_dbinstance, sqlman, logman)
-                        logmessage = str(nCleaned)+" fullsysteminfodump zip files (that can contain both fullsystem dumps and runtime dumps) were removed (-dr)"
-                        log(logmessage, logman)
-                        emailmessage += logmessage+"\n"
-                    else:
-                        log("    (Cleaning dumps was not done since -dr was -1 (or not specified))", logman)
-                    if retainedHDBCONSDays != "-1":
-                        nRowsCleaned = clean_hdbcons(retainedHDBCONSDays, local_dbinstance, DATABASE, sqlman, logman)
-                        logmessage = "In total "+str(nRowsCleaned)+" rows where cleaned from hdbcons.trc files (-hr)"
-                        log(logmessage, logman)
-                        emailmessage += logmessage+"\n"
-                    else:
-                        log("    (Cleaning hdbcons was not done since -hr was -1 (or not specified))", logman)
-                    if retainedAnyFileDays != [""]:
-                        nCleaned = clean_anyfile(retainedAnyFileDays, anyFilePaths, anyFileWords, anyFileMaxDepth, sqlman, logman)
-                        logmessage = str(nCleaned)+" general files were removed (-gr)"
-                        log(logmessage, logman)
-                        emailmessage += logmessage+"\n"
-                    else:
-                        log("    (Cleaning of general files was not done since -gr was -1 (or not specified))", logman)
-                    if minRetainedAlertDays >= 0:
+                        return [[logmessage, True]]
+                    tasks.add("clean_backup_catalog", "sql_heavy", backup_catalog_task)
+                else:
+                    tasks.note("    (Cleaning of the backup catalog was not done since -be and -bd were both negative (or not specified))")
+                if retainedTraceContentDays != "-1" or retainedBacklogDays != "-1" or retainedExpensiveTraceContentDays != "-1" or retainedTraceFilesDays != "-1":
+                    def trace_files_task():
+                        nCleaned = clean_trace_files(retainedTraceContentDays, retainedBacklogDays, retainedExpensiveTraceContentDays, backupTraceContent, backupTraceDirectory, timeOutForMove, retainedTraceFilesDays, ignoreTraceFiles, traceCompression, outputTraces, outputRemovedTraces, keySID, DATABASE, local_dbinstance, allHosts(), sqlman, logman)
+                        return [[str(nCleaned)+" trace files were removed (-tc, -tb, -te and -tf)", True]]
+                    tasks.add("clean_trace_files", "filesystem", trace_files_task)
+                else:
+                    tasks.note("    (Cleaning traces was not done since -tc, -tb, -te and -tf were all -1 (or not specified))")
+                if retainedDumpDays != "-1":
+                    def dumps_task():
+                        [nCleaned, perHost] = agents.everywhere("clean_dumps", lambda host: [retainedDumpDays, local_dbinstance], allHosts, sqlman, logman)
+                        return [[str(nCleaned)+" fullsysteminfodump zip files (that can contain both fullsystem dumps and runtime dumps) were removed"+perHost+" (-dr)", True]]
+                    tasks.add("clean_dumps", "filesystem", dumps_task)
+                else:
+                    tasks.note("    (Cleaning dumps was not done since -dr was -1 (or not specified))")
+                if retainedHDBCONSDays != "-1":
+                    def hdbcons_task():
+                        [nRowsCleaned, perHost] = agents.everywhere("clean_hdbcons", lambda host: [retainedHDBCONSDays, local_dbinstance, DATABASE], allHosts, sqlman, logman)
+                        return [["In total "+str(nRowsCleaned)+" rows where cleaned from hdbcons.trc files"+perHost+" (-hr)", True]]
+                    tasks.add("clean_hdbcons", "filesystem", hdbcons_task, after = ["clean_trace_files"])   # both work in the trace directory
+                else:
+                    tasks.note("    (Cleaning hdbcons was not done since -hr was -1 (or not specified))")
+                if retainedAnyFileDays != [""]:
+                    def anyfile_task():
+                        [nCleaned, perHost] = agents.everywhere("clean_anyfile", lambda host: [retainedAnyFileDays, anyFilePaths, anyFileWords, anyFileMaxDepth], allHosts, sqlman, logman)
+                        return [[str(nCleaned)+" general files were removed"+perHost+" (-gr)", True]]
+                    tasks.add("clean_anyfile", "filesystem", anyfile_task, after = ["clean_trace_files", "clean_dumps", "clean_hdbcons"])   # -gd could point to the same directories
+                else:
+                    tasks.note("    (Cleaning of general files was not done since -gr was -1 (or not specified))")
+                if minRetainedAlertDays >= 0:
+                    def alerts_task():
                         nCleaned = clean_alerts(minRetainedAlertDays, outputAlerts, outputDeletedAlerts, sqlman, logman)
-                        logmessage = str(nCleaned)+" alerts were removed (-ar)"
-                        log(logmessage, logman)
-                        emailmessage += logmessage+"\n"
-                    else:
-                        log("    (Cleaning of the alerts was not done since -ar was negative (or not specified))", logman)
-                    if minRetainedObjLockDays >= 0:
+                        return [[str(nCleaned)+" alerts were removed (-ar)", True]]
+                    alertsProbe = "select count(*) from DUMMY where (select MIN(ALERT_TIMESTAMP) from _SYS_STATISTICS.STATISTICS_ALERTS_BASE) < ADD_DAYS(CURRENT_TIMESTAMP, -"+str(minRetainedAlertDays)+")"
+                    tasks.add("clean_alerts", "sql_heavy", alerts_task, probe = "" if outputAlerts or outputDeletedAlerts else alertsProbe, idle = lambda: [["0 alerts were removed (-ar)", True]])   # with -ao or -ad the alerts are printed anyway
+                else:
+                    tasks.note("    (Cleaning of the alerts was not done since -ar was negative (or not specified))")
+                if minRetainedObjLockDays >= 0:
+                    def objlock_task():
                         nCleaned = clean_objlock(minRetainedObjLockDays, sqlman, logman)
-                        logmessage = str(nCleaned)+" object locks entries with unknown object names were removed (-kr)"
-                        log(logmessage, logman)
-                        emailmessage += logmessage+"\n"
-                    else:
-                        log("    (Cleaning of unknown object locks entries was not done since -kr was negative (or not specified))", logman)
-                    if objHistMaxSize >= 0:
+                        return [[str(nCleaned)+" object locks entries with unknown object names were removed (-kr)", True]]
+                    objlockProbe = "select count(*) from DUMMY where exists (select 1 from _SYS_STATISTICS.HOST_OBJECT_LOCK_STATISTICS_BASE where OBJECT_NAME = '(unknown)' and SERVER_TIMESTAMP < ADD_DAYS(CURRENT_TIMESTAMP, -"+str(minRetainedObjLockDays)+"))"
+                    tasks.add("clean_objlock", "sql_light", objlock_task, probe = objlockProbe, idle = lambda: [["0 object locks entries with unknown object names were removed (-kr)", True]])
+                else:
+                    tasks.note("    (Cleaning of unknown object locks entries was not done since -kr was negative (or not specified))")
+                if objHistMaxSize >= 0:
+                    def objhist_task():
                         memoryCleaned = clean_objhist(objHistMaxSize, outputObjHist, sqlman, logman)
-                        logmessage = str(memoryCleaned)+" mb were cleaned from object history (-om)"
-                        log(logmessage, logman)
-                        emailmessage += logmessage+"\n"
-                    else:
-                        log("    (Cleaning of the object history was not done since -om was negative (or not specified))", logman)
-                    if maxFreeLogsegments >= 0:
+                        return [[str(memoryCleaned)+" mb were cleaned from object history (-om)", True]]
+                    tasks.add("clean_objhist", "sql_heavy", objhist_task)
+                else:
+                    tasks.note("    (Cleaning of the object history was not done since -om was negative (or not specified))")
+                if maxFreeLogsegments >= 0:
+                    def logsegments_task():
                         nReclaimed = reclaim_logsegments(maxFreeLogsegments, sqlman, logman)
-                        logmessage = str(nReclaimed)+" log segments were reclaimed (-lr)"
-                        log(logmessage, logman)
-                        emailmessage += logmessage+"\n"
-                    else:
-                        log("    (Reclaim of free logsements was not done since -lr was negative (or not specified))", logman)
-                    if minRetainedDaysForHandledEvents >= 0 or minRetainedDaysForEvents >= 0:
+                        return [[str(nReclaimed)+" log segments were reclaimed (-lr)", True]]
+                    tasks.add("reclaim_logsegments", "sql_light", logsegments_task)
+                else:
+                    tasks.note("    (Reclaim of free logsements was not done since -lr was negative (or not specified))")
+                if minRetainedDaysForHandledEvents >= 0 or minRetainedDaysForEvents >= 0:
+                    def events_task():
                         nEventsCleaned = clean_events(minRetainedDaysForHandledEvents, minRetainedDaysForEvents, sqlman, logman)
-                        logmessage = str(nEventsCleaned[1])+" events were cleaned, "+str(nEventsCleaned[0])+" of those were handled. There are "+str(nEventsCleaned[2])+" events left, "+str(nEventsCleaned[3])+" of those are handled. (-eh and -eu)" 
-                        log(logmessage, logman)
-                        emailmessage += logmessage+"\n"
-                    else:
-                        log("    (Cleaning of events was not done since -eh and -eu were negative (or not specified))", logman)
-                    if retainedAuditLogDays != "-1":
+                        return [[str(nEventsCleaned[1])+" events were cleaned, "+str(nEventsCleaned[0])+" of those were handled. There are "+str(nEventsCleaned[2])+" events left, "+str(nEventsCleaned[3])+" of those are handled. (-eh and -eu)", True]]
+                    tasks.add("clean_events", "sql_light", events_task)
+                else:
+                    tasks.note("    (Cleaning of events was not done since -eh and -eu were negative (or not specified))")
+                if retainedAuditLogDays != "-1":
+                    def audit_logs_task():
                         nCleaned = clean_audit_logs(retainedAuditLogDays, sqlman, logman)
-                        logmessage = str(nCleaned)+" entries in the audit log table were removed (-ur)"
-                        log(logmessage, logman)
-                        emailmessage += logmessage+"\n"
-                    else:
-                        log("    (Cleaning audit logs was not done since -ur was -1 (or not specified))", logman)  
-                    if pendingEmailsDays != "-1":
+                        return [[str(nCleaned)+" entries in the audit log table were removed (-ur)", True]]
+                    auditProbe = "select count(*) from DUMMY where (select MIN(TIMESTAMP) from SYS.AUDIT_LOG) < ADD_DAYS(CURRENT_TIMESTAMP, -"+retainedAuditLogDays+")"
+                    tasks.add("clean_audit_logs", "sql_heavy", audit_logs_task, probe = auditProbe, idle = lambda: [["0 entries in the audit log table were removed (-ur)", True]])
+                else:
+                    tasks.note("    (Cleaning audit logs was not done since -ur was -1 (or not specified))")
+                if pendingEmailsDays != "-1":
+                    def pending_emails_task():
                         nCleaned = clean_pending_emails(pendingEmailsDays, sqlman, logman)
-                        logmessage = str(nCleaned)+" pending statistics server email notifications were removed (-pe)"
-                        log(logmessage, logman)
-                        emailmessage += logmessage+"\n"
-                    else:
-                        log("    (Cleaning of pending emails was not done since -pe was -1 (or not specified))", logman)  
-                    if fragmentationLimit >= 0:
-                        defragmentedPerPort = defragment(fragmentationLimit, outputFragmentation, sqlman, logman)
-                        if defragmentedPerPort:
-                            for port in defragmentedPerPort:
-                                if port[2] > 0:
-                                    logmessage = "For Host "+str(port[0])+" and Port "+str(port[1])+" defragmentation changed by "+str(port[2])+" % (-fl)"
-                                    log(logmessage, logman)
-                                    emailmessage += logmessage+"\n"
-                                else:
-                                    log("Defragmentation was tried for Host "+str(port[0])+" and Port "+str(port[1])+" but it changed by "+str(port[2])+" %", logman)
+                        return [[str(nCleaned)+" pending statistics server email notifications were removed (-pe)", True]]
+                    pendingEmailsProbe = "select count(*) from DUMMY where SECONDS_BETWEEN((select MIN(SNAPSHOT_ID) from _SYS_STATISTICS.STATISTICS_EMAIL_PROCESSING), CURRENT_TIMESTAMP) > "+pendingEmailsDays+" * 86400"
+                    tasks.add("clean_pending_emails", "sql_light", pending_emails_task, probe = pendingEmailsProbe, idle = lambda: [["0 pending statistics server email notifications were removed (-pe)", True]])
+                else:
+                    tasks.note("    (Cleaning of pending emails was not done since -pe was -1 (or not specified))")
+                if fragmentationLimit >= 0:
+                    def defragment_task():
+                        defragmentedPerPort = defragment(fragmentationLimit, outputFragmentation, defragParallel, defragBudget, sqlman, logman)
+                        if not defragmentedPerPort:
+                            return [["Defragmentation was not done since there was not enough fragmentation for any service", False]]
+                        messages = []
+                        for port in defragmentedPerPort:
+                            if port[2] > 0:
+                                messages.append(["For Host "+str(port[0])+" and Port "+str(port[1])+" defragmentation changed by "+str(port[2])+" % (-fl)", True])
+                            else:
+                                messages.append(["Defragmentation was tried for Host "+str(port[0])+" and Port "+str(port[1])+" but it changed by "+str(port[2])+" %", False])
+                        return messages
+                    tasks.add("defragment", "sql_heavy", defragment_task, after = ["clean_backup_catalog", "clean_alerts", "clean_objhist", "clean_audit_logs", "lob_reorg", "reclaim_rs_containers", "force_compression"])   # reclaim the pages the other tasks freed
+                else:
+                    tasks.note("    (Defragmentation was not done since -fl was negative (or not specified))")
+                if lobFragMax != "-1" or lobFragSmall != "-1" or lobFragNum != "-1":
+                    def lob_reorg_task():
+                        lobDeadline = next_clock_time(lobWindowEnd) if lobWindowEnd else None   # same end of the maintenance window for all LOB reorgs of this cycle
+                        nLobsDiff = lob_reorg(lobFragMax, lobFragPacked, lobFragSmall, lobFragNum, lobPrint, lobSchemas, lobParallel, lobDeadline, sqlman, logman)  # one combined scan for -lobf, -lobs and -lobn
+                        messages = []
+                        if lobFragMax != "-1":
+                            messages.append(["After lob reorg on COLUMN store tables the difference of total number lob columns with too high fragmentation is "+str(nLobsDiff.pop(0))+" (-lobf)", True])
                         else:
-                            log("Defragmentation was not done since there was not enough fragmentation for any service", logman)
-                    else:
-                        log("    (Defragmentation was not done since -fl was negative (or not specified))", logman)
-                    if lobFragMax != "-1":
-                        nLobsWithTooHighFragDiff = lob_reorg_frag(lobFragMax, lobFragPacked, lobPrint, lobSchemasSQL, sqlman, logman)
-                        logmessage = "After lob reorg on COLUMN store tables the difference of total number lob columns with too high fragmentation is "+str(nLobsWithTooHighFragDiff)+" (-lobf)"
-                        log(logmessage, logman)
-                        emailmessage += logmessage+"\n"
-                    else:
-                        log("    (LOB reorg on COLUMN store tables due to fragmentation was not done since -lobf is -1 (or not specified))", logman)  
-                    if lobFragSmall != "-1":
-                        nLobsWithTooManySmallDiff = lob_reorg_small(lobFragSmall, lobPrint, lobSchemasSQL, sqlman, logman)
-                        logmessage = "After lob reorg on COLUMN store tables the difference of total number lob columns with too many small LOBs is "+str(nLobsWithTooManySmallDiff)+" (-lobs)"
-                        log(logmessage, logman)
-                        emailmessage += logmessage+"\n"
-                    else:
-                        log("    (LOB reorg on COLUMN store tables due to too many small LOBs was not done since -lobs is -1 (or not specified))", logman)  
-                    if lobFragNum != "-1":
-                        nLobsWithTooManyDiff = lob_reorg_num(lobFragNum, lobPrint, lobSchemasSQL, sqlman, logman)
-                        logmessage = "After lob reorg on COLUMN store tables the difference of total number lob columns with too many LOBs is "+str(nLobsWithTooManyDiff)+" (-lobn)"
-                        log(logmessage, logman)
-                        emailmessage += logmessage+"\n"
-                    else:
-                        log("    (LOB reorg on COLUMN store tables due to too many LOBs was not done since -lobn is -1 (or not specified))", logman) 
-                    if rcContainers:
+                            messages.append(["    (LOB reorg on COLUMN store tables due to fragmentation was not done since -lobf is -1 (or not specified))", False])
+                        if lobFragSmall != "-1":
+                            messages.append(["After lob reorg on COLUMN store tables the difference of total number lob columns with too many small LOBs is "+str(nLobsDiff.pop(0))+" (-lobs)", True])
+                        else:
+                            messages.append(["    (LOB reorg on COLUMN store tables due to too many small LOBs was not done since -lobs is -1 (or not specified))", False])
+                        if lobFragNum != "-1":
+                            messages.append(["After lob reorg on COLUMN store tables the difference of total number lob columns with too many LOBs is "+str(nLobsDiff.pop(0))+" (-lobn)", True])
+                        else:
+                            messages.append(["    (LOB reorg on COLUMN store tables due to too many LOBs was not done since -lobn is -1 (or not specified))", False])
+                        return messages
+                    tasks.add("lob_reorg", "sql_heavy", lob_reorg_task)
+                else:
+                    tasks.note("    (LOB reorg on COLUMN store tables due to fragmentation was not done since -lobf is -1 (or not specified))")
+                    tasks.note("    (LOB reorg on COLUMN store tables due to too many small LOBs was not done since -lobs is -1 (or not specified))")
+                    tasks.note("    (LOB reorg on COLUMN store tables due to too many LOBs was not done since -lobn is -1 (or not specified))")
+                if rcContainers:
+                    def rs_containers_task():
                         nReclaimedContainers = reclaim_rs_containers(outputRcContainers, sqlman, logman)
-                        logmessage = nReclaimedContainers[1]+" row store containers were reclaimed from "+nReclaimedContainers[0]+" row store tables (-rc)"
-                        log(logmessage, logman)
-                        emailmessage += logmessage+"\n"
-                    else:
-                        log("    (Reclaim of row store containers was not done since -rc was negative (or not specified))", logman)
-                    if all(c > -1 for c in [maxRawComp, maxEstComp]) or all(c > -1 for c in [maxRowComp, maxMemComp, minDistComp]) or all(c > -1 for c in [maxQuotaComp, maxUDIVComp]) or maxBLOCKComp > -1:
-                        nTablesForcedCompression = force_compression(maxRawComp, maxEstComp, maxRowComp, maxMemComp, minDistComp, maxQuotaComp, maxUDIVComp, maxBLOCKComp, partComp, mergeBeforeComp, version, revision, mrevision, outComp, sqlman, logman)
+                        return [[nReclaimedContainers[1]+" row store containers were reclaimed from "+nReclaimedContainers[0]+" row store tables (-rc)", True]]
+                    tasks.add("reclaim_rs_containers", "sql_heavy", rs_containers_task)
+                else:
+                    tasks.note("    (Reclaim of row store containers was not done since -rc was negative (or not specified))")
+                if all(c > -1 for c in [maxRawComp, maxEstComp]) or all(c > -1 for c in [maxRowComp, maxMemComp, minDistComp]) or all(c > -1 for c in [maxQuotaComp, maxUDIVComp]) or maxBLOCKComp > -1:
+                    def compression_task():
+                        nTablesForcedCompression = force_compression(maxRawComp, maxEstComp, maxRowComp, maxMemComp, minDistComp, maxQuotaComp, maxUDIVComp, maxBLOCKComp, partComp, mergeBeforeComp, parallelComp, loadLimitComp, minGainComp, budgetComp, version, revision, mrevision, outComp, sqlman, logman)
                         if nTablesForcedCompression[1]:
-                            log("Tried re-optimize compression on "+str(nTablesForcedCompression[0])+" tables and failed on "+str(nTablesForcedCompression[1])+" (probably due to insufficient privileges)", logman)
-                        else:
-                            logmessage = str(nTablesForcedCompression[0])+" column store tables were compression re-optimized"
-                            log(logmessage, logman)
-                            emailmessage += logmessage+"\n"
-                    else:
-                        log("    (Compression re-optimization was not done since at least one flag in each of the three compression flag groups was negative (or not specified))", logman)
-                    if createVTStat:
+                            return [["Tried re-optimize compression on "+str(nTablesForcedCompression[0])+" tables and failed on "+str(nTablesForcedCompression[1])+" (probably due to insufficient privileges)", False]]
+                        return [[str(nTablesForcedCompression[0])+" column store tables were compression re-optimized", True]]
+                    tasks.add("force_compression", "sql_heavy", compression_task)
+                else:
+                    tasks.note("    (Compression re-optimization was not done since at least one flag in each of the three compression flag groups was negative (or not specified))")
+                if createVTStat:
+                    def vt_statistics_task():
                         [nVTs, nVTsOptimized] = create_vt_statistics(vtSchemas, maxColumnsOfVT, defaultVTStatType, maxRowsForDefaultVT, largeVTStatType, otherDBVTStatType, ignore2ndMon, sqlman, logman)
-                        logmessage = "Optimization statistics was created for "+str(nVTsOptimized)+" virtual tables (in total there are "+str(nVTs)+" virtual tables) (-vs)" 
-                        log(logmessage, logman)
-                        emailmessage += logmessage+"\n"
-                    else:
-                        log("    (Creation of optimization statistics for virtual tables was not done since -vs was false (or not specified))", logman)
-                    if refreshAge > 0:
+                        return [["Optimization statistics was created for "+str(nVTsOptimized)+" virtual tables (in total there are "+str(nVTs)+" virtual tables) (-vs)", True]]
+                    tasks.add("create_vt_statistics", "sql_heavy", vt_statistics_task)
+                else:
+                    tasks.note("    (Creation of optimization statistics for virtual tables was not done since -vs was false (or not specified))")
+                if refreshAge > 0:
+                    def refresh_statistics_task():
                         [nDSs, nDSsRefreshed] = refresh_statistics(vtSchemas, refreshAge, ignore2ndMon, sqlman, logman)
-                        logmessage = "Refresh of VT statistics was done for "+str(nDSsRefreshed)+" data statistics (in total there are "+str(nDSs)+" data statistics) (-vnr)" 
-                        log(logmessage, logman)
-                        emailmessage += logmessage+"\n"
-                    else:
-                        log("    (Refresh of optimization statistics for virtual tables was not done since -vnr was not more than 0 (or not specified))", logman)
-                    if refreshAgeDS > 0:
+                        return [["Refresh of VT statistics was done for "+str(nDSsRefreshed)+" data statistics (in total there are "+str(nDSs)+" data statistics) (-vnr)", True]]
+                    tasks.add("refresh_statistics", "sql_heavy", refresh_statistics_task, after = ["create_vt_statistics"])   # no need to refresh what was just created
+                else:
+                    tasks.note("    (Refresh of optimization statistics for virtual tables was not done since -vnr was not more than 0 (or not specified))")
+                if refreshAgeDS > 0:
+                    def refresh_data_statistics_task():
                         [nDSs, nDSsRefreshed] = refresh_data_statistics(refreshAgeDS, sqlman, logman)
-                        logmessage = "Refresh of data statistics was done for "+str(nDSsRefreshed)+" data statistics (in total there are "+str(nDSs)+" data statistics) (-dsr)" 
-                        log(logmessage, logman)
-                        emailmessage += logmessage+"\n"
-                    else:
-                        log("    (Refresh of data statistics for was not done since -dsr was not more than 0 (or not specified))", logman)
-                    if refreshVTs:
+                        return [["Refresh of data statistics was done for "+str(nDSsRefreshed)+" data statistics (in total there are "+str(nDSs)+" data statistics) (-dsr)", True]]
+                    tasks.add("refresh_data_statistics", "sql_heavy", refresh_data_statistics_task, after = ["refresh_statistics"])
+                else:
+                    tasks.note("    (Refresh of data statistics for was not done since -dsr was not more than 0 (or not specified))")
+                if refreshVTs:
+                    def refresh_virtual_tables_task():
                         nRefreshedVTs = refresh_virtual_tables(refreshVTs, refreshVTsSchema, refreshVTsTable, printVTChecks, sqlman, logman)
-                        logmessage = "Thanks to refresh of virtual tables there are now "+str(nRefreshedVTs)+" less missmatches (-vtr)" 
-                        log(logmessage, logman)
-                        emailmessage += logmessage+"\n"
-                    else:
-                        log("    (Refresh of virtual tables was not done since -vtr was not specified)", logman)
-                    if refreshIPBlockTable:
+                        return [["Thanks to refresh of virtual tables there are now "+str(nRefreshedVTs)+" less missmatches (-vtr)", True]]
+                    tasks.add("refresh_virtual_tables", "sql_light", refresh_virtual_tables_task)
+                else:
+                    tasks.note("    (Refresh of virtual tables was not done since -vtr was not specified)")
+                if refreshIPBlockTable:
+                    def ip_block_task():
                         [nAddedIPs] = refresh_ip_block(refreshIPBlockTable, refreshIPBlockSchema, refreshIPBlockNbr, sqlman, logman)
-                        logmessage = "The ip block table was updated with "+str(nAddedIPs)+" IPs (-ipt)" 
-                        log(logmessage, logman)
-                        emailmessage += logmessage+"\n"
-                    else:
-                        log("    (Refresh of IP blocks was not done since -ipt was not specified)", logman)
-                    if minRetainedIniDays >= 0:
+                        return [["The ip block table was updated with "+str(nAddedIPs)+" IPs (-ipt)", True]]
+                    tasks.add("refresh_ip_block", "sql_light", ip_block_task)
+                else:
+                    tasks.note("    (Refresh of IP blocks was not done since -ipt was not specified)")
+                if minRetainedIniDays >= 0:
+                    def ini_task():
                         nCleaned = clean_ini(minRetainedIniDays, version, revision, mrevision, sqlman, logman)
-                        logmessage = str(nCleaned)+" inifile history contents were removed" 
-                        log(logmessage, logman)
-                        emailmessage += logmessage+"\n"
-                    if minRetainedOutputDays >= 0:
+                        return [[str(nCleaned)+" inifile history contents were removed", True]]
+                    tasks.add("clean_ini", "sql_light", ini_task)
+                if minRetainedOutputDays >= 0:
+                    def output_task():
                         nCleaned = clean_output(minRetainedOutputDays, sqlman, logman)
-                        logmessage = str(nCleaned)+" hanacleaner daily log files were removed (-or)"
-                        log(logmessage, logman)
-                        emailmessage += logmessage+"\n"
-                    else:
-                        log("    (Cleaning of the hanacleaner logs was not done since -or was negative (or not specified))", logman)  
-                    ##### SEND EMAIL SUMMARY #####
-                    if sendEmailSummary:
-                        sendEmail(emailmessage, logman)   
-            ################ DISABLE TIMEOUT ALARM #############
+                        return [[str(nCleaned)+" hanacleaner daily log files were removed (-or)", True]]
+                    tasks.add("clean_output", "filesystem", output_task)
+                else:
+                    tasks.note("    (Cleaning of the hanacleaner logs was not done since -or was negative (or not specified))")
+                emailmessage += tasks.run(sqlman, logman)
+                ##### SEND EMAIL SUMMARY #####
+                if sendEmailSummary:
+                    sendEmail(emailmessage, logman)   
+            metrics.write()
+        ################ DISABLE TIMEOUT ALARM #############
+        if alarm:
+            alarm.cancel()
+        elif fleet.parallelKeys <= 1:
             signal.alarm(0)
 
+    while True: # hanacleaner intervall loop
+        intervals.new_cycle()
+        fleet.run(dbuserkeys, clean_key, logman)
+
+        ##### PROFILING #####
+        if profiling:
+            log("The sampled stacks of this cycle were written to "+profiler.write_collapsed(), logman)
+        ##### INSTRUMENTATION REPORT #####
+        if instrumentTopN >= 0:
+            instrumentation.report(instrumentTopN, logman)
+            if instrumentJson:
+                jsonFile = (logman.path if logman.path else ".")+"/hanacleaner_timing_"+logman.out_prefix+datetime.now().strftime("%Y-%m-%d_%H-%M-%S")+".json"
+                instrumentation.write_json(jsonFile)
+                log("The timings of this cycle were written to "+jsonFile, logman)
+            instrumentation.reset()
         # HANACLEANER INTERVALL
         if hanacleaner_interval < 0: 
-            sys.exit()
-        time.sleep(float(hanacleaner_interval))               
+            sys.exit(failures.exit_code())
+        time.sleep(intervals.sleep_seconds() if intervals.enabled else float(hanacleaner_interval))               
               
               
               